@@ -0,0 +1,105 @@
+"""Model calls and wall-clock time per analyzed workout: single vs batch endpoint.
+
+Against the local fake Gemini (LATENCY per call, plus ITEM_LATENCY per
+extra workout in a batch, since output grows with it), analyzes WORKOUTS
+fresh workouts three ways through the ASGI app:
+
+- single, sequential: one POST /ai/analyze/{id} after another;
+- single, concurrent: all at once (bounded by GEMINI_MAX_CONCURRENCY);
+- batch: one POST /ai/analyze/batch.
+
+Then checks a partially malformed batch response: only the broken item
+is sent again.
+
+Run from the repository root:  python -m backend.benchmarks.bench_ai_batch
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import warnings
+
+import httpx
+
+from .fake_gemini import serve
+
+LATENCY = 0.4
+ITEM_LATENCY = 0.05
+WORKOUTS = 40
+
+
+async def run(app, fake, gemini_service, ids):
+    auth = {"Authorization": "Bearer user-0"}
+    slices = [ids[i * WORKOUTS:(i + 1) * WORKOUTS] for i in range(4)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+
+        async def sequential(batch):
+            for wid in batch:
+                r = await client.post(f"/ai/analyze/{wid}", headers=auth)
+                assert r.status_code == 201, r.text
+
+        async def concurrent(batch):
+            rs = await asyncio.gather(*(client.post(f"/ai/analyze/{wid}", headers=auth) for wid in batch))
+            assert all(r.status_code == 201 for r in rs)
+
+        async def batched(batch):
+            r = await client.post("/ai/analyze/batch", json={"workout_ids": batch}, headers=auth)
+            assert r.status_code == 200 and len(r.json()["analyses"]) == len(batch), r.text
+
+        print(f"{WORKOUTS} workouts, {LATENCY * 1000:.0f} ms per call + {ITEM_LATENCY * 1000:.0f} ms per extra batched workout")
+        print(f"{'path':<20}{'model calls':>12}{'calls/workout':>15}{'wall s':>9}{'ms/workout':>12}")
+        for (name, fn), batch in zip((("single sequential", sequential), ("single concurrent", concurrent), ("batch", batched)), slices):
+            calls = fake.state.calls
+            t0 = time.perf_counter()
+            await fn(batch)
+            wall = time.perf_counter() - t0
+            calls = fake.state.calls - calls
+            print(f"{name:<20}{calls:>12}{calls / WORKOUTS:>15.2f}{wall:>9.2f}{wall / WORKOUTS * 1000:>12.0f}")
+
+        # drop the second workout from the first answer of every chunk
+        generate = gemini_service.generate
+        prompts = []
+
+        async def flaky(prompt, timeout=None):
+            text = await generate(prompt, timeout)
+            prompts.append(prompt.count("\n## w"))
+            if len(prompts) <= -(-WORKOUTS // gemini_service.AI_BATCH_SIZE):
+                data = json.loads(text)
+                data.pop("w2", None)
+                text = json.dumps(data)
+            return text
+
+        gemini_service.generate = flaky
+        try:
+            r = await client.post("/ai/analyze/batch", json={"workout_ids": slices[3]}, headers=auth)
+        finally:
+            gemini_service.generate = generate
+        body = r.json()
+        print(
+            f"partial failure: workouts per model call {prompts}, "
+            f"{len(body['analyses'])} analyses, {len(body['errors'])} errors"
+        )
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    base_url, fake = serve(latency=LATENCY, item_latency=ITEM_LATENCY)
+    for var in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY", "SUPABASE_JWT_SECRET", "SUPABASE_SQLITE_PATH"):
+        os.environ.pop(var, None)
+    os.environ["GEMINI_API_BASE"] = base_url
+    os.environ["AI_RATE_LIMIT"] = "100000/minute"
+    os.environ.setdefault("FRONTEND_URL", "http://localhost")
+
+    from ..main import app
+    from ..services import gemini_service
+    from ..services.supabase_client import supabase
+    from .datasets import seed
+
+    logging.getLogger("fittrack").setLevel(logging.WARNING)
+    ids = seed(supabase, 1, WORKOUTS * 4, 6)["user-0"]
+    asyncio.run(run(app, fake, gemini_service, ids))
+
+
+if __name__ == "__main__":
+    main()
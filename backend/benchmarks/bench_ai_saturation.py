@@ -0,0 +1,106 @@
+"""Check /workouts latency stays flat while AI calls saturate the model.
+
+A fake Gemini server answers every call after LATENCY seconds. The app runs
+in-process behind httpx.AsyncClient; a steady stream of GET /workouts is
+timed alone, then again while AI_REQUESTS analyze / weekly-summary calls
+are in flight. The AI calls start over RAMP seconds rather than in one loop
+tick, so the probes time saturation, not the routing of 100 simultaneous
+arrivals. The service warm-up the app's lifespan starts runs first, as
+it does before /ready reports the app ready. Exits 1 when the saturated
+p99 exceeds the idle p99 by more than MAX_P99_SLOWDOWN_MS. Run from the
+repository root:
+    python -m backend.benchmarks.bench_ai_saturation
+"""
+import os
+import time
+import asyncio
+import logging
+import sys
+import statistics
+
+from .fake_gemini import serve
+
+LATENCY = 2.0
+AI_REQUESTS = 100
+PROBES = 100
+RAMP = 0.5
+# allowed growth of the /workouts p99 under AI load
+MAX_P99_SLOWDOWN_MS = float(os.getenv("MAX_P99_SLOWDOWN_MS", "50"))
+
+base_url, fake = serve(latency=LATENCY)
+os.environ["GEMINI_API_BASE"] = base_url
+os.environ.setdefault("FRONTEND_URL", "http://localhost")
+# AI_REQUESTS calls must not be turned away by the per-user limit
+os.environ["AI_RATE_LIMIT"] = "100000/minute"
+
+import httpx  # noqa: E402
+from ..main import app  # noqa: E402
+from ..services.registry import registry  # noqa: E402
+
+logging.getLogger("fittrack").setLevel(logging.WARNING)
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+
+async def probe(client, n):
+    timings = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = await client.get("/workouts/", headers={"Authorization": "Bearer reader"})
+        r.raise_for_status()
+        timings.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.01)
+    return timings
+
+
+async def main():
+    # ASGITransport does not run the lifespan; warm up as it would
+    await registry.warm_up()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        await client.post("/workouts/", json={"title": "probe", "date": "2024-01-01"}, headers={"Authorization": "Bearer reader"})
+        ids = []
+        for i in range(AI_REQUESTS):
+            r = await client.post(
+                "/workouts/",
+                json={"title": f"w{i}", "date": "2024-01-01", "exercises": [{"name": f"ex{i}", "sets": 3, "reps": 5}]},
+                headers={"Authorization": f"Bearer u{i}"},
+            )
+            ids.append(r.json()["id"])
+
+        # the first request through a router builds its route state; keep that out of the timings
+        await client.get("/ai/weekly-summary", headers={"Authorization": "Bearer reader"})
+
+        idle = await probe(client, PROBES)
+
+        async def ai_call(i):
+            await asyncio.sleep(RAMP * i / AI_REQUESTS)
+            headers = {"Authorization": f"Bearer u{i}"}
+            if i % 2:
+                return await client.get("/ai/weekly-summary", headers=headers)
+            return await client.post(f"/ai/analyze/{ids[i]}", headers=headers)
+
+        t0 = time.perf_counter()
+        ai = asyncio.gather(*(ai_call(i) for i in range(AI_REQUESTS)))
+        busy = await probe(client, PROBES)
+        results = await ai
+        ai_elapsed = time.perf_counter() - t0
+
+    print(f"fake model latency {LATENCY}s, {AI_REQUESTS} concurrent AI requests, {fake.state.calls} model calls")
+    print(f"AI statuses: { {s: sum(r.status_code == s for r in results) for s in {r.status_code for r in results}} } in {ai_elapsed:.1f}s")
+    print(f"{'GET /workouts':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, t in (("idle", idle), ("AI saturated", busy)):
+        print(f"{name:<22} {pct(t, .5):>8.2f} {pct(t, .95):>8.2f} {pct(t, .99):>8.2f} {statistics.mean(t) * 1000:>8.2f}")
+    slowdown = pct(busy, .99) - pct(idle, .99)
+    if slowdown > MAX_P99_SLOWDOWN_MS:
+        print(f"FAIL: p99 grew by {slowdown:.1f} ms under AI load (allowed {MAX_P99_SLOWDOWN_MS:.0f} ms)")
+        return 1
+    print(f"p99 grew by {slowdown:.1f} ms under AI load (allowed {MAX_P99_SLOWDOWN_MS:.0f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
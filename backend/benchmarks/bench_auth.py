@@ -0,0 +1,72 @@
+"""Per-request authentication overhead before and after the verified-token cache.
+
+"before" is what a request used to pay: two full jwt.decode verifications
+(middleware + dependency). "after" is one decode_token call that hits the
+cache. Also counts jwt.decode calls across real requests through the app.
+Run from the repository root:  python -m backend.benchmarks.bench_auth
+"""
+import os
+import time
+import logging
+import warnings
+
+os.environ["SUPABASE_JWT_SECRET"] = "bench-secret"
+os.environ.setdefault("FRONTEND_URL", "http://localhost")
+warnings.filterwarnings("ignore")
+
+from jose import jwt  # noqa: E402
+
+from ..services import auth  # noqa: E402
+
+N = 20_000
+
+
+def per_call_us(fn, n: int = N) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    token = jwt.encode({"sub": "user-1", "email": "u@example.com", "exp": time.time() + 3600}, "bench-secret", algorithm="HS256")
+    header = f"Bearer {token}"
+
+    def before():
+        for _ in range(2):
+            payload = jwt.decode(token, "bench-secret", algorithms=[auth.ALGORITHM])
+            auth.User(id=payload["sub"], email=payload.get("email"))
+
+    auth.decode_token(header)
+    before_us = per_call_us(before, N // 10)
+    after_us = per_call_us(lambda: auth.decode_token(header))
+    print(f"auth per request: before {before_us:.1f} us, after {after_us:.2f} us ({before_us / after_us:.0f}x)")
+
+    # end to end: how many verifications do 100 requests cost now?
+    from fastapi.testclient import TestClient
+    from ..main import app
+
+    calls = 0
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        return real_decode(*args, **kwargs)
+
+    logging.getLogger("fittrack").setLevel(logging.WARNING)
+    client = TestClient(app)
+    jwt.decode = counting_decode
+    for maxsize in (0, auth.AUTH_TOKEN_CACHE_SIZE):
+        calls = 0
+        auth.token_cache.clear()
+        auth.token_cache.maxsize = maxsize
+        for _ in range(100):
+            client.get("/workouts/", headers={"Authorization": header})
+        label = "cache off" if maxsize == 0 else "cache on"
+        print(f"jwt.decode calls for 100 authenticated requests ({label}): {calls}")
+    jwt.decode = real_decode
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Dashboard refresh after one write: full reload versus the change feed.
+
+For histories of 100, 1k and 5k workouts, creates one workout and then
+refreshes three ways through the ASGI stack, reporting time and bytes:
+
+- full: every page of GET /workouts (what a reload of the whole list costs);
+- first page: GET /workouts?limit=50, the old dashboard refetch;
+- delta: GET /workouts/changes?since=<version before the write>.
+
+Also times a delta poll when nothing changed (304 from If-None-Match).
+
+Run from the repository root:  python -m backend.benchmarks.bench_changes
+"""
+import os
+import time
+import asyncio
+import logging
+import warnings
+
+import httpx
+
+from .datasets import workout_rows
+
+SIZES = (100, 1_000, 5_000)
+EXERCISES_PER_WORKOUT = 6
+ROUNDS = 20
+
+WORKOUT = {"title": "Push", "date": "2030-01-01", "exercises": [{"name": "bench press", "sets": 3, "reps": 5, "weight_kg": 80}]}
+
+
+async def full(client, auth) -> int:
+    size, cursor = 0, None
+    while True:
+        r = await client.get("/workouts/", params={"limit": 200, **({"cursor": cursor} if cursor else {})}, headers=auth)
+        size += len(r.content)
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            return size
+
+
+async def first_page(client, auth) -> int:
+    return len((await client.get("/workouts/?limit=50", headers=auth)).content)
+
+
+async def run(app, user: str):
+    auth = {"Authorization": f"Bearer {user}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        results = {}
+        for name in ("full", "first page", "delta"):
+            elapsed, size = 0.0, 0
+            for _ in range(ROUNDS):
+                version = (await client.get("/workouts/changes", headers=auth)).json()["version"]
+                r = await client.post("/workouts/", json=WORKOUT, headers=auth)
+                assert r.status_code == 201, r.text
+                t0 = time.perf_counter()
+                if name == "full":
+                    size += await full(client, auth)
+                elif name == "first page":
+                    size += await first_page(client, auth)
+                else:
+                    r = await client.get(f"/workouts/changes?since={version}", headers=auth)
+                    assert len(r.json()["workouts"]) == 1
+                    size += len(r.content)
+                elapsed += time.perf_counter() - t0
+            results[name] = (elapsed / ROUNDS * 1000, size / ROUNDS / 1024)
+        r = await client.get("/workouts/changes", headers=auth)
+        path = f"/workouts/changes?since={r.json()['version']}"
+        etag = (await client.get(path, headers=auth)).headers["etag"]
+        t0 = time.perf_counter()
+        for _ in range(ROUNDS):
+            assert (await client.get(path, headers={**auth, "If-None-Match": etag})).status_code == 304
+        results["idle poll"] = ((time.perf_counter() - t0) / ROUNDS * 1000, 0.0)
+        return results
+
+
+def seed_user(supabase, user: str, size: int):
+    workouts, exercises = [], []
+    for workout, rows in workout_rows(1, size, EXERCISES_PER_WORKOUT):
+        workout["id"] = f"{user}-{workout['id']}"
+        workout["user_id"] = user
+        workouts.append(workout)
+        exercises.extend({**ex, "id": f"{user}-{ex['id']}", "workout_id": workout["id"]} for ex in rows)
+    supabase.table("workouts").insert(workouts).execute()
+    supabase.table("exercises").insert(exercises).execute()
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    for var in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY", "SUPABASE_JWT_SECRET", "SUPABASE_SQLITE_PATH"):
+        os.environ.pop(var, None)
+    os.environ.setdefault("FRONTEND_URL", "http://localhost")
+
+    from ..main import app
+    from ..services.supabase_client import supabase
+
+    logging.getLogger("fittrack").setLevel(logging.WARNING)
+    names = ("full", "first page", "delta", "idle poll")
+    print(f"{'workouts':>9}" + "".join(f"{n + ' ms':>14}{'KB':>7}" for n in names))
+    for size in SIZES:
+        user = f"history-{size}"
+        seed_user(supabase, user, size)
+        results = asyncio.run(run(app, user))
+        print(f"{size:>9}" + "".join(f"{results[n][0]:>14.2f}{results[n][1]:>7.1f}" for n in names))
+
+
+if __name__ == "__main__":
+    main()
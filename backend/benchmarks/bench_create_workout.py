@@ -0,0 +1,68 @@
+"""Compare per-exercise inserts against the bulk write path of POST /workouts.
+
+Every execute() against the fake store sleeps for RTT_MS to stand in for a
+Supabase round trip. Run from the repository root:
+    python -m backend.benchmarks.bench_create_workout
+"""
+import time
+import datetime
+
+from ..models import schemas
+from ..routers import workouts as workouts_router
+from ..services.supabase_client import FakeSupabase, FakeTable
+
+RTT_MS = 5.0
+REPEAT = 20
+
+
+class SlowTable(FakeTable):
+    calls = 0
+
+    def execute(self):
+        SlowTable.calls += 1
+        time.sleep(RTT_MS / 1000)
+        return super().execute()
+
+
+class SlowSupabase(FakeSupabase):
+    def table(self, name):
+        t = super().table(name)
+        return SlowTable(t.store, self)
+
+
+def per_row_create(db, user_id: str, workout: schemas.WorkoutCreate):
+    # the previous write path: one insert per exercise, then a re-read
+    created = db.table("workouts").insert({"user_id": user_id, "title": workout.title}).execute().data[0]
+    for ex in workout.exercises:
+        exdata = ex.dict()
+        exdata["workout_id"] = created["id"]
+        db.table("exercises").insert(exdata).execute()
+    return db.table("workouts").select("*, exercises(*)").eq("id", created["id"]).execute().data[0]
+
+
+def run(fn, workout):
+    SlowTable.calls = 0
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(workout)
+    return (time.perf_counter() - t0) / REPEAT * 1000, SlowTable.calls // REPEAT
+
+
+def main():
+    db = SlowSupabase()
+    workouts_router.supabase = db
+    print(f"simulated round trip: {RTT_MS} ms")
+    print(f"{'exercises':>10} {'per-row ms':>11} {'calls':>6} {'bulk ms':>9} {'calls':>6}")
+    for n in (1, 10, 50):
+        workout = schemas.WorkoutCreate(
+            title="session",
+            date=datetime.date.today(),
+            exercises=[schemas.ExerciseCreate(name=f"ex-{i}", sets=3, reps=10, weight_kg=40.0) for i in range(n)],
+        )
+        old_ms, old_calls = run(lambda w: per_row_create(db, "bench", w), workout)
+        new_ms, new_calls = run(lambda w: workouts_router.insert_workouts("bench", [w]), workout)
+        print(f"{n:>10} {old_ms:>11.1f} {old_calls:>6} {new_ms:>9.1f} {new_calls:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Check that /workouts/export memory stays flat as the history grows.
+
+For each history size the export generator is drained while tracemalloc
+records the peak of new allocations, next to the peak for materializing
+the whole history the way a single list response would. The export peak
+should stay roughly constant (one page); the materialized one grows
+linearly.
+
+Run from the repository root:  python -m backend.benchmarks.bench_export
+"""
+import sys
+import time
+import tracemalloc
+
+from ..services.supabase_client import FakeSupabase
+from ..routers import workouts
+from ..models import schemas
+from .datasets import seed
+
+SIZES = (1_000, 5_000, 20_000)
+EXERCISES_PER_WORKOUT = 8
+
+
+def drain(body) -> int:
+    return sum(len(chunk) for chunk in body)
+
+
+def measure(fn):
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - t0
+    return size, (tracemalloc.get_traced_memory()[1] - base) / 1e6, elapsed
+
+
+def main():
+    print(f"{'workouts':>9}{'format':>9}{'bytes':>12}{'peak MB':>10}{'time s':>8}   materialized peak MB")
+    peaks = []
+    for n in SIZES:
+        # a fresh store per size, swapped in for the router's client
+        db = FakeSupabase()
+        seed(db, 1, n, EXERCISES_PER_WORKOUT)
+        workouts.supabase = db
+        tracemalloc.start()
+        _, full_peak, _ = measure(
+            lambda: len([schemas.Workout(**w).json() for w in db.table("workouts").select("*, exercises(*)").eq("user_id", "user-0").execute().data])
+        )
+        for fmt, body in (
+            ("ndjson", lambda: workouts.stream_ndjson("user-0", None, workouts.EXPORT_PAGE_SIZE)),
+            ("csv", lambda: workouts.stream_csv("user-0", workouts.EXPORT_PAGE_SIZE)),
+        ):
+            size, peak, elapsed = measure(lambda: drain(body()))
+            peaks.append(peak)
+            print(f"{n:>9}{fmt:>9}{size:>12}{peak:>10.1f}{elapsed:>8.2f}   {full_peak:.1f}")
+        tracemalloc.stop()
+    # flat: the largest export peak is within 2x of the smallest
+    flat = max(peaks) <= 2 * min(peaks)
+    print("export peak memory flat across sizes:", "yes" if flat else "NO")
+    sys.exit(0 if flat else 1)
+
+
+if __name__ == "__main__":
+    main()
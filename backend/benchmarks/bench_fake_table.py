@@ -0,0 +1,38 @@
+"""Show FakeTable query cost tracks the result size, not the table size.
+
+Run from the repository root:  python -m backend.benchmarks.bench_fake_table
+"""
+import time
+
+from ..services.supabase_client import FakeSupabase
+from .datasets import seed
+
+WORKOUTS_PER_USER = 50
+EXERCISES_PER_WORKOUT = 6
+
+
+def build(n_users: int) -> FakeSupabase:
+    db = FakeSupabase()
+    seed(db, n_users, WORKOUTS_PER_USER, EXERCISES_PER_WORKOUT)
+    return db
+
+
+def timeit(fn, repeat: int = 50) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    print(f"{'users':>8} {'workouts':>10} {'exercises':>10} {'list ms':>9} {'get ms':>8}")
+    for n_users in (10, 100, 1000):
+        db = build(n_users)
+        one = db.table("workouts").select("*").eq("user_id", "user-0").execute().data[0]["id"]
+        list_ms = timeit(lambda: db.table("workouts").select("*, exercises(*)").eq("user_id", "user-0").order("date", desc=True).execute())
+        get_ms = timeit(lambda: db.table("workouts").select("*, exercises(*)").eq("id", one).eq("user_id", "user-0").execute())
+        print(f"{n_users:>8} {len(db._tables['workouts']):>10} {len(db._tables['exercises']):>10} {list_ms:>9.3f} {get_ms:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
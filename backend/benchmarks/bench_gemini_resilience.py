@@ -0,0 +1,143 @@
+"""The Gemini call layer against an unreliable model, fully offline.
+
+Model calls go through gemini_service.generate to the fake Gemini app over
+an in-process httpx.ASGITransport, with seeded fault injection, so every
+run sends the same faults. Each scenario compares the layer with a
+feature off and on:
+
+1. transient errors: 30% of calls answer 503; no retries vs. jittered
+   exponential backoff with 2 retries;
+2. outage: every call fails; no breaker vs. a breaker that opens after 5
+   failures (calls sent to the model, time to fail), then recovery once
+   the model is back;
+3. tail latency: 10% of calls take 1 s longer; no hedging vs. a hedge
+   after 150 ms (percentiles and extra model calls; p99 keeps the ~1% of
+   calls whose hedge was slow too);
+4. malformed JSON: 30% of answers truncated; analyses that still come
+   back valid thanks to the strict-prompt retry;
+5. deadline: a 0.3 s deadline against a model that takes 2 s.
+
+Run from the repository root:  python -m backend.benchmarks.bench_gemini_resilience
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import warnings
+
+import httpx
+
+from .fake_gemini import Faults, make_app
+
+LATENCY = 0.05
+CALLS = 200
+CONCURRENCY = 10
+
+
+def caller(gemini_service, resilience, retries=2, breaker_failures=1_000_000, hedge_after=0.0):
+    breaker = resilience.CircuitBreaker("gemini", breaker_failures, reset_seconds=1.0)
+    return resilience.ResilientCaller(
+        "gemini", gemini_service._transient, attempt_timeout=5.0, retries=retries,
+        backoff_base=0.05, backoff_max=0.5, breaker=breaker, hedge_after=hedge_after, rng=random.Random(1),
+    )
+
+
+async def run_calls(call, n: int = CALLS):
+    """(latencies of successes, errors by type) for n calls, CONCURRENCY at a time."""
+    latencies, errors = [], {}
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await call()
+                latencies.append(time.perf_counter() - t0)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(n)))
+    return latencies, errors
+
+
+def pct(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else float("nan")
+
+
+async def scenario(gemini_service, faults: Faults, layer, call=None, n: int = CALLS):
+    app = make_app(LATENCY, faults=faults)
+    await gemini_service.use_transport(httpx.ASGITransport(app=app))
+    gemini_service.caller = layer
+    call = call or (lambda: gemini_service.generate("Write a weekly narrative."))
+    t0 = time.perf_counter()
+    latencies, errors = await run_calls(call, n)
+    return app, latencies, errors, time.perf_counter() - t0
+
+
+async def run(gemini_service, resilience):
+    print("1. transient errors (30% 503)")
+    for name, retries in (("no retries", 0), ("backoff, 2 retries", 2)):
+        app, ok, errors, _ = await scenario(gemini_service, Faults(error_rate=0.3, seed=7), caller(gemini_service, resilience, retries))
+        print(f"   {name:<20} success {len(ok) / CALLS:>6.1%}  model calls {app.state.calls:>4}  p50 {pct(ok, .5):>5.0f} ms  p99 {pct(ok, .99):>5.0f} ms")
+
+    print("2. outage (every call fails)")
+    for name, failures in (("no breaker", 1_000_000), ("breaker after 5", 5)):
+        layer = caller(gemini_service, resilience, 2, failures)
+        faults = Faults(error_rate=1.0)
+        app, _, errors, wall = await scenario(gemini_service, faults, layer)
+        print(f"   {name:<20} model calls {app.state.calls:>4}  mean time to fail {wall / CALLS * CONCURRENCY * 1000:>6.1f} ms  errors {errors}")
+        if failures < 1_000_000:
+            faults.error_rate = 0.0
+            await asyncio.sleep(layer.breaker.reset_seconds)
+            state = layer.breaker.state
+            await gemini_service.generate("Write a weekly narrative.")
+            ok, errors = await run_calls(lambda: gemini_service.generate("Write a weekly narrative."), 20)
+            print(f"   {'model back':<20} {state} -> probe succeeded -> {layer.breaker.state}, then {len(ok)}/20 calls succeed")
+
+    print("3. tail latency (10% of calls 1 s slower)")
+    for name, hedge in (("no hedging", 0.0), ("hedge after 150 ms", 0.15)):
+        layer = caller(gemini_service, resilience, 2, hedge_after=hedge)
+        app, ok, errors, _ = await scenario(gemini_service, Faults(slow_rate=0.1, slow_latency=1.0, seed=3), layer)
+        print(
+            f"   {name:<20} p50 {pct(ok, .5):>5.0f} ms  p95 {pct(ok, .95):>5.0f} ms  p99 {pct(ok, .99):>5.0f} ms  "
+            f"model calls {app.state.calls:>4} (+{app.state.calls / CALLS - 1:.0%})"
+        )
+
+    print("4. malformed JSON (30% truncated)")
+    payload = {"title": "Push", "date": "2024-01-01", "exercises": [{"name": "bench press", "sets": 3, "reps": 5, "weight_kg": 80}]}
+    app, ok, errors, _ = await scenario(
+        gemini_service, Faults(malformed_rate=0.3, seed=5), caller(gemini_service, resilience),
+        call=lambda: gemini_service.analyze_workout_async(payload),
+    )
+    print(f"   valid analyses {len(ok) / CALLS:.1%} ({app.state.outcomes.get('malformed', 0)} malformed answers), errors {errors}")
+
+    print("5. deadline (model takes 2 s)")
+    layer = caller(gemini_service, resilience)
+    app = make_app(2.0)
+    await gemini_service.use_transport(httpx.ASGITransport(app=app))
+    gemini_service.caller = layer
+    t0 = time.perf_counter()
+    try:
+        with resilience.deadline(0.3):
+            await gemini_service.generate("Write a weekly narrative.")
+    except asyncio.TimeoutError:
+        pass
+    print(f"   gave up after {(time.perf_counter() - t0) * 1000:.0f} ms with a 300 ms deadline")
+    await gemini_service.use_transport(None)
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    os.environ["GEMINI_API_BASE"] = "http://fake-gemini"
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(CONCURRENCY * 2)
+    from ..services import gemini_service, resilience
+
+    logging.getLogger("backend").setLevel(logging.CRITICAL)
+    logging.getLogger(gemini_service.__name__).setLevel(logging.CRITICAL)
+    asyncio.run(run(gemini_service, resilience))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Time POST /workouts/import of a CSV with 100k exercises against the in-memory store.
+
+The upload is streamed in 64 KB chunks. For comparison it also times a
+sample of single POST /workouts calls and extrapolates to the same history.
+
+Run from the repository root:  python -m backend.benchmarks.bench_import
+"""
+import io
+import csv
+import time
+import asyncio
+import logging
+
+import httpx
+
+from .datasets import workout_rows
+
+WORKOUTS = 12_500
+EXERCISES_PER_WORKOUT = 8
+CHUNK = 64 * 1024
+SAMPLE_POSTS = 200
+
+
+def build_csv() -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["date", "title", "duration_minutes", "notes", "exercise", "sets", "reps", "weight_kg", "muscle_group"])
+    for workout, exercises in workout_rows(1, WORKOUTS, EXERCISES_PER_WORKOUT):
+        for ex in exercises:
+            writer.writerow([
+                workout["date"], workout["title"], workout["duration_minutes"], "",
+                ex["name"], ex["sets"], ex["reps"], ex["weight_kg"], ex["muscle_group"],
+            ])
+    return out.getvalue().encode()
+
+
+async def main():
+    from ..main import app
+
+    logging.getLogger("fittrack").setLevel(logging.WARNING)
+    body = build_csv()
+
+    async def chunks():
+        for i in range(0, len(body), CHUNK):
+            yield body[i:i + CHUNK]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        t0 = time.perf_counter()
+        r = await client.post(
+            "/workouts/import", content=chunks(), headers={"Authorization": "Bearer importer", "Content-Type": "text/csv"}
+        )
+        elapsed = time.perf_counter() - t0
+        report = r.json()
+        print(f"import: {len(body) / 1e6:.1f} MB CSV, status {r.status_code}")
+        print(f"  {report['workouts']} workouts, {report['exercises']} exercises, {report['error_count']} errors in {elapsed:.2f}s")
+        print(f"  {report['exercises'] / elapsed:,.0f} exercises/s")
+
+        sample = [
+            {"title": w["title"], "date": w["date"], "exercises": [{k: e[k] for k in ("name", "sets", "reps", "weight_kg", "muscle_group")} for e in ex]}
+            for w, ex in workout_rows(1, SAMPLE_POSTS, EXERCISES_PER_WORKOUT, seed=1)
+        ]
+        t0 = time.perf_counter()
+        for w in sample:
+            await client.post("/workouts/", json=w, headers={"Authorization": "Bearer poster"})
+        per_post = (time.perf_counter() - t0) / SAMPLE_POSTS
+        print(f"single POST /workouts: {per_post * 1000:.2f} ms each, ~{per_post * WORKOUTS:.1f}s for the same history in-process")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""Prompt size before (json.dumps of raw rows) and after the compact encoding.
+
+Histories are synthetic sessions with 8 exercises each, shaped like the
+rows Supabase returns (uuids, timestamps, nulls included).
+
+Run from the repository root:  python -m backend.benchmarks.bench_prompt_size
+"""
+import json
+import uuid
+
+from ..services import gemini_service
+from ..services.prompt_encoding import PROMPT_TOKEN_BUDGET, estimate_tokens
+from .datasets import workout_rows
+
+SESSIONS = (1, 7, 30, 90, 365)
+
+
+def history(n: int):
+    rows = []
+    for workout, exercises in workout_rows(1, n, 8):
+        wid = str(uuid.uuid4())
+        workout = dict(workout, id=wid, user_id=str(uuid.uuid4()))
+        workout["exercises"] = [dict(ex, id=str(uuid.uuid4()), workout_id=wid) for ex in exercises]
+        rows.append(workout)
+    return rows
+
+
+def main():
+    print(f"token budget {PROMPT_TOKEN_BUDGET} (estimated at 4 chars/token)")
+    print(f"{'prompt':<10}{'sessions':>9}{'raw chars':>12}{'raw tokens':>12}{'compact':>10}{'tokens':>9}{'ratio':>8}")
+    for n in SESSIONS:
+        rows = history(n)
+        if n == 1:
+            before = gemini_service.ANALYSIS_PROMPT.replace("{workout}", json.dumps(rows[0]))
+            after = gemini_service.analysis_prompt(rows[0])
+            kind = "analysis"
+        else:
+            before = gemini_service.SUMMARY_PROMPT.replace("{history}", json.dumps(rows))
+            after = gemini_service.summary_prompt(rows)
+            kind = "summary"
+        print(
+            f"{kind:<10}{n:>9}{len(before):>12}{estimate_tokens(before):>12}"
+            f"{len(after):>10}{estimate_tokens(after):>9}{len(before) / len(after):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
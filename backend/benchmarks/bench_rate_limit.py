@@ -0,0 +1,93 @@
+"""Per-request cost of the token-bucket rate limiter, and its correctness across processes.
+
+1. take() per call for the memory and SQLite backends.
+2. The same as request overhead: a bare route against the same route
+   with a limit_per_ip dependency, through the ASGI stack.
+3. Four processes sharing one SQLite file spend a 50-token bucket with
+   100 attempts each; exactly 50 must be allowed in total.
+
+Run from the repository root:  python -m backend.benchmarks.bench_rate_limit
+"""
+import os
+import time
+import asyncio
+import tempfile
+import multiprocessing
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from ..services import rate_limit
+from ..services.rate_limit import Limit, MemoryBackend, RateLimiter, SQLiteBackend
+
+CALLS = 20_000
+REQUESTS = 3_000
+PROCESSES = 4
+ATTEMPTS = 100
+SHARED_CAPACITY = 50
+
+
+def per_call(backend) -> float:
+    limit = Limit.parse("1000000/second")
+    t0 = time.perf_counter()
+    for i in range(CALLS):
+        backend.take(f"k{i % 100}", limit)
+    return (time.perf_counter() - t0) / CALLS * 1e6
+
+
+async def per_request(backend) -> tuple:
+    rate_limit.rate_limiter = RateLimiter(backend)
+    app = FastAPI()
+
+    @app.get("/bare")
+    async def bare():
+        return {}
+
+    @app.get("/limited", dependencies=[Depends(rate_limit.limit_per_ip("bench", "1000000/second"))])
+    async def limited():
+        return {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        timings = []
+        for path in ("/bare", "/limited"):
+            await client.get(path)
+            t0 = time.perf_counter()
+            for _ in range(REQUESTS):
+                await client.get(path)
+            timings.append((time.perf_counter() - t0) / REQUESTS * 1e6)
+    return tuple(timings)
+
+
+def spend(path: str, results):
+    backend = SQLiteBackend(path)
+    limit = Limit.parse(f"{SHARED_CAPACITY}/day")
+    results.put(sum(backend.take("shared", limit)[0] for _ in range(ATTEMPTS)))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ratelimit.sqlite3")
+        backends = {"memory": MemoryBackend(), "sqlite": SQLiteBackend(path)}
+        print(f"{'backend':<8}{'take() us':>11}{'bare req us':>13}{'limited req us':>16}{'overhead us':>13}")
+        for name, backend in backends.items():
+            call = per_call(backend)
+            bare, limited = asyncio.run(per_request(backend))
+            print(f"{name:<8}{call:>11.1f}{bare:>13.1f}{limited:>16.1f}{limited - bare:>13.1f}")
+
+        shared = os.path.join(tmp, "shared.sqlite3")
+        SQLiteBackend(shared)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=spend, args=(shared, results)) for _ in range(PROCESSES)]
+        for p in procs:
+            p.start()
+        allowed = sum(results.get() for _ in procs)
+        for p in procs:
+            p.join()
+        print(
+            f"{PROCESSES} processes x {ATTEMPTS} attempts on a {SHARED_CAPACITY}-token shared bucket: "
+            f"{allowed} allowed ({'ok' if allowed == SHARED_CAPACITY else 'WRONG'})"
+        )
+
+
+if __name__ == "__main__":
+    main()
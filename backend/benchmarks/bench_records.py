@@ -0,0 +1,80 @@
+"""Personal records and one exercise's progression: index versus history scan.
+
+For histories of 100, 1k and 10k workouts (8 exercises each) compares:
+
+- scan: the full `exercises(*)` history, aggregated per exercise in Python
+  (what a client had to do with list_workouts);
+- index: the exercise_records / exercise_progress reads behind
+  /workouts/records and /workouts/progression/{exercise}.
+
+Also checks the incremental index (one apply_workouts per workout, then a
+delete) matches a rebuild from the raw tables.
+
+Run from the repository root:  python -m backend.benchmarks.bench_records
+"""
+import time
+
+from ..services import records
+from ..services.supabase_client import FakeSupabase
+from .datasets import seed
+
+SIZES = (100, 1_000, 10_000)
+EXERCISES_PER_WORKOUT = 8
+USER = "user-0"
+EXERCISE = "bench press"
+
+
+def scan(db):
+    history = db.table("workouts").select("*, exercises(*)").eq("user_id", USER).execute().data
+    progress = [row for w in history for row in records.progress_rows(USER, w)]
+    index = records._records_from(progress)
+    key = records.record_key(USER, EXERCISE)
+    return index, sorted((p for p in progress if p["record_key"] == key), key=lambda p: p["date"])
+
+
+def lookup(db):
+    index = db.table(records.RECORDS_TABLE).select("*").eq("user_id", USER).order("exercise").execute().data
+    key = records.record_key(USER, EXERCISE)
+    progression = db.table(records.PROGRESS_TABLE).select("*").eq("record_key", key).order("date").order("workout_id").execute().data
+    return index, progression
+
+
+def timed(fn, db, size: int) -> float:
+    fn(db)
+    runs = max(3, 5_000 // size)
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        fn(db)
+    return (time.perf_counter() - t0) / runs * 1000
+
+
+def snapshot(db):
+    strip = lambda rows: sorted(({k: v for k, v in r.items() if k not in ("id", "created_at", "revision")} for r in rows), key=lambda r: r["record_key"])  # noqa: E731
+    return strip(db.table(records.RECORDS_TABLE).select("*").eq("user_id", USER).execute().data)
+
+
+def main():
+    print(f"{'workouts':>9}{'scan ms':>10}{'index ms':>10}{'speedup':>10}{'progression rows':>18}")
+    for size in SIZES:
+        db = FakeSupabase()
+        records.supabase = db
+        seed(db, 1, size, EXERCISES_PER_WORKOUT)
+        records.rebuild(USER)
+        t_scan, t_index = timed(scan, db, size), timed(lookup, db, size)
+        print(f"{size:>9}{t_scan:>10.2f}{t_index:>10.3f}{t_scan / t_index:>9.0f}x{len(lookup(db)[1]):>18}")
+
+    db = FakeSupabase()
+    records.supabase = db
+    seed(db, 1, 200, EXERCISES_PER_WORKOUT)
+    for w in db.table("workouts").select("*, exercises(*)").eq("user_id", USER).order("date").execute().data:
+        records.apply_workouts(USER, [w])
+    victim = f"{USER}-w000150"
+    db.table("workouts").delete().eq("id", victim).execute()
+    records.remove_workout(USER, victim)
+    incremental = snapshot(db)
+    records.rebuild(USER)
+    print(f"incremental index matches rebuild after 200 inserts and a delete: {incremental == snapshot(db)}")
+
+
+if __name__ == "__main__":
+    main()
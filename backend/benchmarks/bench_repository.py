@@ -0,0 +1,114 @@
+"""Async repository against a PostgREST stand-in with network latency.
+
+The PostgREST backend talks to an in-process fake server (an httpx
+MockTransport that answers from FakeSupabase after LATENCY seconds), so
+the real request building and pooled client are exercised.
+
+1. Checks the PostgREST results match the same queries on the fake.
+2. Two independent reads (workout + stored analysis, as in /ai/analyze):
+   awaited one after the other versus db.gather.
+3. CONCURRENCY simultaneous reads: sync client calls on the threadpool
+   (the old router path, 40 threads) versus the async repository. The
+   fake server's own JSON work shares the event loop, so the async
+   figure is pessimistic.
+
+Run from the repository root:  python -m backend.benchmarks.bench_repository
+"""
+import json
+import time
+import asyncio
+
+import anyio
+import httpx
+
+from ..services.repository import AsyncDatabase, PostgrestBackend
+from ..services.supabase_client import FakeSupabase
+from .datasets import seed
+
+LATENCY = 0.03
+PAIRS = 50
+CONCURRENCY = 400
+
+
+def fake_postgrest(fake: FakeSupabase, latency: float) -> httpx.MockTransport:
+    """Answer PostgREST requests from `fake` after `latency` seconds."""
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        q = fake.table(request.url.path.rsplit("/", 1)[-1])
+        params = request.url.params
+        prefer = request.headers.get("prefer", "")
+        if request.method == "POST":
+            body = json.loads(request.content)
+            q = q.upsert(body, on_conflict=params.get("on_conflict")) if "merge-duplicates" in prefer else q.insert(body)
+        elif request.method == "DELETE":
+            q = q.delete()
+        for key, value in params.multi_items():
+            if key == "select":
+                q = q.select(value)
+            elif key == "order":
+                for part in value.split(","):
+                    field, _, direction = part.partition(".")
+                    q = q.order(field, desc=direction == "desc")
+            elif key == "limit":
+                q = q.limit(int(value))
+            elif key == "or":
+                q = q.or_(value[1:-1])
+            elif key != "on_conflict":
+                op, _, arg = value.partition(".")
+                if op == "in":
+                    q = q.in_(key, [v.strip('"') for v in arg[1:-1].split(",")])
+                else:
+                    q = getattr(q, op)(key, arg)
+        res = q.execute()
+        if res.error:
+            return httpx.Response(400, json={"message": str(res.error)})
+        return httpx.Response(200, json=res.data)
+
+    return httpx.MockTransport(handle)
+
+
+async def run(fake: FakeSupabase, ids: dict):
+    db = AsyncDatabase(PostgrestBackend("http://postgrest.local", "key", pool_size=CONCURRENCY, transport=fake_postgrest(fake, LATENCY)))
+    user = "user-1"
+    wid = ids[user][10]
+
+    page = await db.workouts.page(user, None, 20)
+    direct = fake.table("workouts").select("*, exercises(*)").eq("user_id", user).order("date", desc=True).order("id", desc=True).limit(20).execute()
+    after = (page.data[-1]["date"], page.data[-1]["id"])
+    nxt = await db.workouts.page(user, after, 20)
+    print(f"page matches fake: {page.data == direct.data}; next page starts after cursor: {nxt.data[0]['date'] <= after[0]}")
+
+    t0 = time.perf_counter()
+    for _ in range(PAIRS):
+        await db.workouts.get(wid)
+        await db.analyses.for_workout(wid, user)
+    sequential = (time.perf_counter() - t0) / PAIRS * 1000
+    t0 = time.perf_counter()
+    for _ in range(PAIRS):
+        await db.gather(db.workouts.get(wid), db.analyses.for_workout(wid, user))
+    gathered = (time.perf_counter() - t0) / PAIRS * 1000
+    print(f"workout + analysis, {LATENCY * 1000:.0f} ms round trips: sequential {sequential:.1f} ms, gather {gathered:.1f} ms")
+
+    def blocking_get():
+        time.sleep(LATENCY)
+        return fake.table("workouts").select("*, exercises(*)").eq("id", wid).execute()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(anyio.to_thread.run_sync(blocking_get) for _ in range(CONCURRENCY)))
+    threaded = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    await asyncio.gather(*(db.workouts.get(wid) for _ in range(CONCURRENCY)))
+    pooled = time.perf_counter() - t0
+    print(f"{CONCURRENCY} concurrent reads: threadpool {threaded * 1000:.0f} ms, async pool {pooled * 1000:.0f} ms")
+    await db.aclose()
+
+
+def main():
+    fake = FakeSupabase()
+    ids = seed(fake, 5, 200, 6)
+    asyncio.run(run(fake, ids))
+
+
+if __name__ == "__main__":
+    main()
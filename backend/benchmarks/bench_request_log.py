@@ -0,0 +1,161 @@
+"""Per-request cost of request logging at high request rates.
+
+Drives REQUESTS requests, CONCURRENCY at a time, straight into a minimal
+ASGI app (one authenticated JSON route) so that the logging overhead is
+not lost in handler time. It compares:
+
+- none: no logging middleware (the baseline);
+- inline: the old middleware, a BaseHTTPMiddleware that decodes the JWT
+  itself and writes an f-string through a StreamHandler on the event loop;
+- queued: RequestLogMiddleware, JSON written by the listener thread, with
+  every 2xx logged and with 10% of them sampled.
+
+Each runs against a fast sink and a slow one (every write blocks for
+SLOW_WRITE seconds, like stderr behind a busy pipe), reporting the mean and
+p99 per-request time (best of ROUNDS runs) and the records written or
+dropped.
+
+Run from the repository root:  python -m backend.benchmarks.bench_request_log
+"""
+import os
+import time
+import asyncio
+import logging
+import warnings
+
+REQUESTS = 20_000
+CONCURRENCY = 100
+ROUNDS = 3
+SLOW_WRITE = 0.0002
+SECRET = "bench-secret"
+
+
+class Sink:
+    """Stream that counts lines and optionally blocks on each write."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, s):
+        self.lines += s.count("\n")
+        if self.delay:
+            time.sleep(self.delay)
+
+    def flush(self):
+        pass
+
+
+def build_app(auth, request_log, variant: str, sink: Sink, sample_rate: float):
+    from fastapi import Depends, FastAPI, Header, Request
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    app = FastAPI()
+
+    # async all the way down, so no threadpool hop blurs the numbers
+    async def current_user(request: Request, authorization: str = Header(None)):
+        return auth.get_current_user(request, authorization)
+
+    @app.get("/ping")
+    async def ping(user=Depends(current_user)):
+        return {"user": user.id}
+
+    if variant == "inline":
+        logger = logging.getLogger("bench.inline")
+        logger.handlers[:] = []
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        logger.addHandler(handler)
+
+        async def log_requests(request: Request, call_next):
+            user_id = None
+            try:
+                auth_header = request.headers.get("authorization")
+                if auth_header:
+                    user = auth.decode_token(auth_header)
+                    user_id = getattr(user, "id", None)
+                    request.state.user = user
+            except Exception:
+                pass
+            response = await call_next(request)
+            logger.info(f"{request.method} {request.url.path} user={user_id} status={response.status_code}")
+            return response
+
+        app.add_middleware(BaseHTTPMiddleware, dispatch=log_requests)
+        return app, None
+    if variant == "queued":
+        log = request_log.RequestLog(f"bench.queued.{id(sink)}", stream=sink)
+        log.logger.propagate = False
+        app.add_middleware(request_log.RequestLogMiddleware, log=log, sample_rate=sample_rate)
+        return app, log
+    return app, None
+
+
+async def drive(app, header: bytes):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/ping", "raw_path": b"/ping", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"authorization", header)], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    latencies = []
+
+    async def one():
+        t0 = time.perf_counter()
+        await app(dict(scope), receive, send)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for _ in range(REQUESTS // CONCURRENCY):
+        await asyncio.gather(*(one() for _ in range(CONCURRENCY)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return wall / REQUESTS, latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    os.environ["SUPABASE_JWT_SECRET"] = SECRET
+    from jose import jwt
+    from ..services import auth, request_log
+
+    token = jwt.encode({"sub": "user-1", "exp": time.time() + 3600}, SECRET, algorithm=auth.ALGORITHM)
+    header = f"Bearer {token}".encode()
+    variants = (("none", "none", 1.0), ("inline", "inline", 1.0), ("queued", "queued", 1.0), ("queued, 10% of 2xx", "queued", 0.1))
+
+    print(f"{REQUESTS} requests x {ROUNDS} rounds, {CONCURRENCY} concurrent")
+    for sink_name, delay in (("fast sink", 0.0), (f"slow sink ({SLOW_WRITE * 1e6:.0f} us/write)", SLOW_WRITE)):
+        print(sink_name)
+        base = None
+        for name, variant, rate in variants:
+            sink = Sink(delay)
+            app, log = build_app(auth, request_log, variant, sink, rate)
+            asyncio.run(drive(app, header))  # warm up
+            if log is not None:
+                log.stop()
+                log.listener.start()
+                log.handler.dropped = 0
+            sink.lines = 0
+            mean, p99 = min(asyncio.run(drive(app, header)) for _ in range(ROUNDS))
+            dropped = 0
+            if log is not None:
+                log.stop()
+                dropped = log.dropped
+            if base is None:
+                base = (mean, p99)
+            print(
+                f"   {name:<20} {1 / mean:>8.0f} req/s  overhead mean {(mean - base[0]) * 1e6:>7.1f} us  "
+                f"p99 {p99 * 1e3:>7.2f} ms  lines {sink.lines:>6}  dropped {dropped:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Dashboard refresh cost with ETags and the per-user response cache.
+
+Times the cached read endpoints three ways through the ASGI stack:
+rebuilt from the database every time (the user's version bumped before
+each request), served from the body cache, and answered 304 from
+If-None-Match. Also counts database calls per request.
+
+Run from the repository root:  python -m backend.benchmarks.bench_response_cache
+"""
+import os
+import time
+import asyncio
+import logging
+import warnings
+
+import httpx
+
+USERS = 20
+WORKOUTS_PER_USER = 300
+EXERCISES_PER_WORKOUT = 6
+REQUESTS = 500
+
+
+async def timed(client, path: str, headers: dict, before=None) -> float:
+    await client.get(path, headers=headers)
+    t0 = time.perf_counter()
+    for _ in range(REQUESTS):
+        if before:
+            before()
+        r = await client.get(path, headers=headers)
+        assert r.status_code in (200, 304), r.status_code
+    return (time.perf_counter() - t0) / REQUESTS * 1e6
+
+
+async def run(app, repository, response_cache, ids):
+    user = "user-3"
+    wid = ids[user][0]
+    auth = {"Authorization": f"Bearer {user}"}
+    paths = {
+        "GET /workouts (50 rows)": "/workouts/?limit=50",
+        "GET /workouts/{id}": f"/workouts/{wid}",
+        "GET /stats": "/stats/",
+    }
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        print(f"{'endpoint':<26}{'rebuilt us':>12}{'cached us':>12}{'304 us':>10}{'body KB':>10}")
+        for name, path in paths.items():
+            rebuilt = await timed(client, path, auth, before=lambda: response_cache.invalidate(user))
+            cached = await timed(client, path, auth)
+            r = await client.get(path, headers=auth)
+            not_modified = await timed(client, path, {**auth, "If-None-Match": r.headers["etag"]})
+            print(f"{name:<26}{rebuilt:>12.0f}{cached:>12.0f}{not_modified:>10.0f}{len(r.content) / 1024:>10.1f}")
+
+        # reads go through the async repository, so count queries on its backend
+        calls = {"n": 0}
+        run_query = repository.LocalBackend.run
+
+        async def counting(self, query):
+            calls["n"] += 1
+            return await run_query(self, query)
+
+        repository.LocalBackend.run = counting
+        try:
+            path = "/workouts/?limit=50"
+            r = await client.get(path, headers=auth)
+            response_cache.invalidate(user)
+            for label in ("rebuilt", "cached", "304"):
+                headers = {**auth, "If-None-Match": r.headers["etag"]} if label == "304" else auth
+                calls["n"] = 0
+                r = await client.get(path, headers=headers)
+                print(f"database calls on a {label} refresh: {calls['n']} (status {r.status_code})")
+        finally:
+            repository.LocalBackend.run = run_query
+    print("cache:", response_cache.stats())
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    for var in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY", "SUPABASE_JWT_SECRET", "SUPABASE_SQLITE_PATH"):
+        os.environ.pop(var, None)
+    os.environ.setdefault("FRONTEND_URL", "http://localhost")
+
+    from ..main import app
+    from ..services.supabase_client import supabase
+    from ..services import repository
+    from ..services.response_cache import response_cache
+    from .datasets import seed
+
+    logging.getLogger("fittrack").setLevel(logging.WARNING)
+    ids = seed(supabase, USERS, WORKOUTS_PER_USER, EXERCISES_PER_WORKOUT)
+    asyncio.run(run(app, repository, response_cache, ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Cost of encoding workout list responses, by encoder and response size.
+
+For 100, 1k and 10k workouts (8 exercises each) compares:
+
+- stdlib: model instances, jsonable_encoder and json.dumps, as FastAPI
+  encodes a response_model;
+- validated: the precompiled TypeAdapter, validating once and writing
+  bytes in pydantic-core (the default path);
+- trusted: FAST_SERIALIZATION, no validation, the TypedDict row adapter.
+
+Also checks that stdlib and validated bytes are identical.
+
+Run from the repository root:  python -m backend.benchmarks.bench_serialization
+"""
+import json
+import time
+import warnings
+
+from fastapi.encoders import jsonable_encoder
+
+from ..models import schemas
+from ..services.serialization import dump_json
+from ..services.supabase_client import FakeSupabase
+from .datasets import seed
+
+SIZES = (100, 1_000, 10_000)
+EXERCISES_PER_WORKOUT = 8
+
+
+def stdlib(rows) -> bytes:
+    models = [schemas.Workout(**row) for row in rows]
+    return json.dumps(jsonable_encoder(models), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def timed(fn, rows) -> float:
+    fn(rows)
+    runs = max(3, 20_000 // len(rows))
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        fn(rows)
+    return (time.perf_counter() - t0) / runs * 1000
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    encoders = {
+        "stdlib": stdlib,
+        "validated": lambda rows: dump_json(schemas.Workout, rows, trusted=False),
+        "trusted": lambda rows: dump_json(schemas.Workout, rows, trusted=True),
+    }
+    print(f"{'workouts':>9}{'MB':>7}" + "".join(f"{name + ' ms':>14}" for name in encoders) + f"{'speedup':>10}  same bytes")
+    for size in SIZES:
+        db = FakeSupabase()
+        seed(db, 1, size, EXERCISES_PER_WORKOUT)
+        rows = db.table("workouts").select("*, exercises(*)").eq("user_id", "user-0").execute().data
+        times = {name: timed(fn, rows) for name, fn in encoders.items()}
+        body = stdlib(rows)
+        same = body == encoders["validated"](rows)
+        print(
+            f"{size:>9}{len(body) / 1e6:>7.1f}" + "".join(f"{t:>14.1f}" for t in times.values())
+            + f"{times['stdlib'] / times['trusted']:>9.1f}x  {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compare the in-memory FakeSupabase with the SQLite backend on the app's queries.
+
+Seeds both with the same synthetic history, times the queries the routers
+issue, prints SQLite's plan for the list page, then checks that a second
+process sees the data (persistence and multi-worker sharing).
+
+Run from the repository root:  python -m backend.benchmarks.bench_sqlite_backend
+"""
+import os
+import time
+import tempfile
+import subprocess
+import sys
+
+from ..services.supabase_client import FakeSupabase
+from ..services.sqlite_supabase import SQLiteSupabase
+from .datasets import seed
+
+USERS = 50
+WORKOUTS_PER_USER = 400
+EXERCISES_PER_WORKOUT = 8
+REPEAT = 200
+
+
+def timed(fn, n=REPEAT) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1000
+
+
+def queries(db, ids):
+    user = "user-7"
+    wid = ids[user][len(ids[user]) // 2]
+    page = db.table("workouts").select("*, exercises(*)").eq("user_id", user).order("date", desc=True).order("id", desc=True).limit(51).execute().data
+    last = page[49]
+    cursor = f"date.lt.{last['date']},and(date.eq.{last['date']},id.lt.{last['id']})"
+    return {
+        "list page (50 + embed)": lambda: db.table("workouts").select("*, exercises(*)").eq("user_id", user)
+        .order("date", desc=True).order("id", desc=True).limit(51).execute(),
+        "next page via or_ cursor": lambda: db.table("workouts").select("*, exercises(*)").eq("user_id", user)
+        .or_(cursor).order("date", desc=True).order("id", desc=True).limit(51).execute(),
+        "get by id + embed": lambda: db.table("workouts").select("*, exercises(*)").eq("id", wid).eq("user_id", user).execute(),
+        "date range (30 days)": lambda: db.table("workouts").select("*, exercises(*)").eq("user_id", user)
+        .gte("date", "2020-06-01").lte("date", "2020-06-30").execute(),
+        "stats projection (full history)": lambda: db.table("workouts")
+        .select("id, date, exercises(sets, reps, weight_kg, muscle_group)").eq("user_id", user).execute(),
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "local.sqlite3")
+        backends = {"memory": FakeSupabase(), "sqlite": SQLiteSupabase(path)}
+        results = {}
+        for name, db in backends.items():
+            t0 = time.perf_counter()
+            ids = seed(db, USERS, WORKOUTS_PER_USER, EXERCISES_PER_WORKOUT)
+            load = time.perf_counter() - t0
+            results[name] = {"seed": load, **{q: timed(fn) for q, fn in queries(db, ids).items()}}
+        n_ex = USERS * WORKOUTS_PER_USER * EXERCISES_PER_WORKOUT
+        print(f"{USERS} users x {WORKOUTS_PER_USER} workouts x {EXERCISES_PER_WORKOUT} exercises ({n_ex} exercise rows)")
+        print(f"{'':<34}{'memory':>12}{'sqlite':>12}")
+        print(f"{'seed (s)':<34}{results['memory']['seed']:>12.2f}{results['sqlite']['seed']:>12.2f}")
+        for q in list(results["memory"])[1:]:
+            print(f"{q + ' (ms)':<34}{results['memory'][q]:>12.3f}{results['sqlite'][q]:>12.3f}")
+
+        conn = backends["sqlite"].conn()
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM workouts WHERE user_id = ? ORDER BY date DESC, id DESC LIMIT 51", ("user-7",)
+        ).fetchall()
+        print("list page plan:", "; ".join(row[-1] for row in plan))
+
+        # a separate process opens the same file, as another uvicorn worker would
+        code = (
+            "import sys; from backend.services.sqlite_supabase import SQLiteSupabase; "
+            "db = SQLiteSupabase(sys.argv[1]); "
+            "print(len(db.table('workouts').select('id').eq('user_id', 'user-7').execute().data))"
+        )
+        out = subprocess.run([sys.executable, "-c", code, path], capture_output=True, text=True, cwd=os.getcwd())
+        print(f"second process sees {out.stdout.strip() or out.stderr.strip()} workouts for user-7 (expected {WORKOUTS_PER_USER})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Cold start: import time of backend.main and time until a new worker answers.
+
+Runs in fresh subprocesses with every service configured (Supabase URL and
+key, JWT secret, Gemini key) but pointed nowhere, so nothing is contacted:
+
+- import: best of --rounds runs of `import backend.main`, and which heavy
+  modules (HEAVY) that import loaded;
+- first response: a uvicorn worker with the real lifespan, timed from spawn
+  to the first 200 on GET /, then to GET /ready turning 200 once warm-up
+  has built the services (per-service build times from /ready).
+
+Exits 1 when the import takes longer than --budget-ms or loads a HEAVY
+module, printing the slowest imports, so a heavy import that creeps back
+onto the startup path fails the run.
+
+Run from the repository root:  python -m backend.benchmarks.bench_startup
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+
+import httpx
+
+# heavy modules that must stay off `import backend.main`
+HEAVY = ("google.generativeai", "supabase", "jose.jwt", "numpy")
+
+ENV = {
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_SERVICE_KEY": "bench-key",
+    "SUPABASE_JWT_SECRET": "bench-secret",
+    "FRONTEND_URL": "http://localhost",
+    "GEMINI_API_KEY": "bench-key",
+    "PYTHONWARNINGS": "ignore",
+}
+
+PROBE = f"""
+import sys, json, time
+t0 = time.perf_counter()
+import backend.main
+print(json.dumps({{"seconds": time.perf_counter() - t0, "heavy": [m for m in {HEAVY!r} if m in sys.modules]}}))
+"""
+
+SERVE = "import sys, uvicorn; uvicorn.run('backend.main:app', host='127.0.0.1', port=int(sys.argv[1]), log_level='warning')"
+
+
+def environ() -> dict:
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("SUPABASE_", "GEMINI_"))}
+    return {**env, **ENV}
+
+
+def probe_import() -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE], env=environ(), capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(n: int = 10) -> list:
+    """(cumulative ms, module) of the n slowest imports under `import backend.main`."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend.main"], env=environ(), capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_response(timeout: float = 30.0) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", SERVE, str(port)], env=environ(), stderr=subprocess.DEVNULL)
+    result = {}
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - t0 < timeout:
+                try:
+                    if "first" not in result and client.get(f"{base}/").status_code == 200:
+                        result["first"] = time.perf_counter() - t0
+                    if "first" in result:
+                        r = client.get(f"{base}/ready")
+                        if r.status_code == 200:
+                            result["ready"] = time.perf_counter() - t0
+                            result["services"] = r.json()["services"]
+                            return result
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError(f"worker not ready after {timeout:.0f}s: {result}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "750")))
+    args = parser.parse_args()
+
+    probes = [probe_import() for _ in range(args.rounds)]
+    import_ms = min(p["seconds"] for p in probes) * 1000
+    heavy = sorted({m for p in probes for m in p["heavy"]})
+    print(f"import backend.main    {import_ms:>7.0f} ms  (budget {args.budget_ms:.0f} ms)  heavy modules loaded: {heavy or 'none'}")
+
+    start = first_response()
+    print(f"first response         {start['first'] * 1000:>7.0f} ms after spawn")
+    print(f"ready (warm-up done)   {start['ready'] * 1000:>7.0f} ms after spawn")
+    for name, status in start["services"].items():
+        seconds = status["seconds"]
+        built = f"{seconds * 1000:.0f} ms" if seconds is not None else "not built"
+        print(f"   {name:<18} {built}")
+
+    if import_ms > args.budget_ms or heavy:
+        print("startup budget exceeded; slowest imports:")
+        for ms, name in slowest_imports():
+            print(f"   {ms:>8.1f} ms  {name}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
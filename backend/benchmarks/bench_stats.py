@@ -0,0 +1,86 @@
+"""Time /stats aggregation over a synthetic history of 10k workouts and 100k exercises.
+
+Also prints how much JSON the dashboard downloaded before (the whole
+history) against the /stats payload that replaces it.
+
+Run from the repository root:  python -m backend.benchmarks.bench_stats
+"""
+import gc
+import json
+import time
+import random
+import datetime
+from collections import defaultdict
+
+from ..services import analytics
+
+N_WORKOUTS = 10_000
+EXERCISES_PER_WORKOUT = 10
+GROUPS = ["chest", "back", "legs", "shoulders", "arms", "core"]
+
+
+def synthetic_history(seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime.date(2015, 1, 1)
+    workouts, analyses = [], []
+    for i in range(N_WORKOUTS):
+        wid = f"w{i}"
+        workouts.append({
+            "id": wid,
+            "date": (start + datetime.timedelta(days=i // 3)).isoformat(),
+            "exercises": [
+                {"sets": rng.randint(1, 5), "reps": rng.randint(3, 12), "weight_kg": rng.uniform(10, 150),
+                 "muscle_group": rng.choice(GROUPS)}
+                for _ in range(EXERCISES_PER_WORKOUT)
+            ],
+        })
+        if i % 2 == 0:
+            analyses.append({"workout_id": wid, "overall_score": rng.randint(1, 10)})
+    return workouts, analyses
+
+
+def python_stats(workouts, analyses, bucket):
+    # row-at-a-time reference, the same pass the browser charts used to run
+    volume, groups, scores = defaultdict(float), defaultdict(float), defaultdict(list)
+    dates = {}
+    for w in workouts:
+        day = datetime.date.fromisoformat(w["date"])
+        if bucket == "week":
+            day -= datetime.timedelta(days=day.weekday())
+        elif bucket == "month":
+            day = day.replace(day=1)
+        dates[w["id"]] = day
+        for ex in w["exercises"]:
+            v = (ex["weight_kg"] or 0) * (ex["reps"] or 0) * (ex["sets"] or 0)
+            volume[day] += v
+            groups[ex["muscle_group"] or ""] += v
+    for a in analyses:
+        scores[dates[a["workout_id"]]].append(a["overall_score"])
+    return volume, groups, {d: sum(s) / len(s) for d, s in scores.items()}
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    gc.disable()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    gc.enable()
+    return best * 1000
+
+
+def main():
+    workouts, analyses = synthetic_history()
+    print(f"{len(workouts)} workouts, {len(workouts) * EXERCISES_PER_WORKOUT} exercises, {len(analyses)} analyses")
+    history_bytes = len(json.dumps(workouts))
+    print(f"{'bucket':>7} {'rows ms':>10} {'stats ms':>9} {'history KB':>11} {'stats KB':>9}")
+    for bucket in analytics.BUCKETS:
+        rows_ms = best_of(lambda: python_stats(workouts, analyses, bucket))
+        stats_ms = best_of(lambda: analytics.compute_stats(workouts, analyses, bucket))
+        stats_bytes = len(json.dumps(analytics.compute_stats(workouts, analyses, bucket)))
+        print(f"{bucket:>7} {rows_ms:>10.1f} {stats_ms:>9.1f} {history_bytes / 1024:>11.0f} {stats_bytes / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
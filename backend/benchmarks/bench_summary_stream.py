@@ -0,0 +1,57 @@
+"""Time-to-first-byte of the streamed weekly summary against the JSON endpoint.
+
+The app is served by uvicorn (httpx's in-process ASGI transport buffers
+whole responses) against benchmarks/fake_gemini.py, whose streaming mode
+spreads LATENCY seconds over its chunks. Checks that the streamed narrative
+matches the non-streaming one. Run from the repository root:
+    python -m backend.benchmarks.bench_summary_stream
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+
+from .fake_gemini import serve, serve_app
+
+LATENCY = 2.0
+
+base_url, fake = serve(latency=LATENCY)
+os.environ["GEMINI_API_BASE"] = base_url
+os.environ.setdefault("FRONTEND_URL", "http://localhost")
+
+import httpx  # noqa: E402
+from ..main import app  # noqa: E402
+
+logging.getLogger("fittrack").setLevel(logging.WARNING)
+HEADERS = {"Authorization": "Bearer streamer"}
+
+
+async def main():
+    async with httpx.AsyncClient(base_url=serve_app(app, lifespan="off"), timeout=60) as client:
+        t0 = time.perf_counter()
+        r = await client.get("/ai/weekly-summary", headers=HEADERS)
+        json_total = time.perf_counter() - t0
+        narrative = r.json()["narrative"]
+
+        chunks, first, event = [], None, None
+        t0 = time.perf_counter()
+        async with client.stream("GET", "/ai/weekly-summary/stream", headers=HEADERS) as resp:
+            async for line in resp.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:") and event == "chunk":
+                    if first is None:
+                        first = time.perf_counter() - t0
+                    chunks.append(json.loads(line[5:])["text"])
+        stream_total = time.perf_counter() - t0
+
+    assert event == "done", event
+    assert "".join(chunks) == narrative
+    print(f"{'endpoint':<28} {'first byte ms':>14} {'complete ms':>12}")
+    print(f"{'/ai/weekly-summary':<28} {json_total * 1000:>14.0f} {json_total * 1000:>12.0f}")
+    print(f"{'/ai/weekly-summary/stream':<28} {first * 1000:>14.0f} {stream_total * 1000:>12.0f}  ({len(chunks)} chunks)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
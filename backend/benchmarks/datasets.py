@@ -0,0 +1,65 @@
+"""Synthetic users x workouts x exercises histories for benchmarks."""
+import random
+import datetime
+from typing import Dict, List
+
+GROUPS = ["chest", "back", "legs", "shoulders", "arms", "core"]
+EXERCISES = {
+    "chest": ["bench press", "incline press", "dips"],
+    "back": ["deadlift", "pull-up", "barbell row"],
+    "legs": ["squat", "lunge", "leg press"],
+    "shoulders": ["overhead press", "lateral raise"],
+    "arms": ["curl", "skull crusher"],
+    "core": ["plank", "hanging leg raise"],
+}
+
+
+def workout_rows(users: int, workouts_per_user: int, exercises_per_workout: int, seed: int = 0):
+    """Yield (workout_row, [exercise_rows]) in the shape the backend stores them."""
+    rng = random.Random(seed)
+    start = datetime.date(2020, 1, 1)
+    for u in range(users):
+        user_id = f"user-{u}"
+        for i in range(workouts_per_user):
+            wid = f"{user_id}-w{i:06d}"
+            workout = {
+                "id": wid,
+                "user_id": user_id,
+                "title": f"Session {i}",
+                "date": (start + datetime.timedelta(days=i)).isoformat(),
+                "duration_minutes": rng.randint(30, 90),
+                "notes": None,
+                "created_at": datetime.datetime(2020, 1, 1).isoformat(),
+            }
+            exercises = []
+            for e in range(exercises_per_workout):
+                group = rng.choice(GROUPS)
+                exercises.append({
+                    "id": f"{wid}-e{e}",
+                    "workout_id": wid,
+                    "name": rng.choice(EXERCISES[group]),
+                    "sets": rng.randint(1, 5),
+                    "reps": rng.randint(3, 12),
+                    "weight_kg": round(rng.uniform(10, 150), 1),
+                    "muscle_group": group,
+                })
+            yield workout, exercises
+
+
+def seed(db, users: int, workouts_per_user: int, exercises_per_workout: int, seed: int = 0) -> Dict[str, List[str]]:
+    """Bulk-load a synthetic history into a supabase-like client; returns workout ids per user."""
+    ids: Dict[str, List[str]] = {}
+    batch_w, batch_e = [], []
+    for workout, exercises in workout_rows(users, workouts_per_user, exercises_per_workout, seed):
+        ids.setdefault(workout["user_id"], []).append(workout["id"])
+        batch_w.append(workout)
+        batch_e.extend(exercises)
+        if len(batch_e) >= 10_000:
+            db.table("workouts").insert(batch_w).execute()
+            db.table("exercises").insert(batch_e).execute()
+            batch_w, batch_e = [], []
+    if batch_w:
+        db.table("workouts").insert(batch_w).execute()
+    if batch_e:
+        db.table("exercises").insert(batch_e).execute()
+    return ids
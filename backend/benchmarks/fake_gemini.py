@@ -0,0 +1,155 @@
+"""A local stand-in for the Gemini generateContent REST API.
+
+Start it in a background thread with `serve()` and point the backend at it
+with GEMINI_API_BASE=http://127.0.0.1:<port>. Every call sleeps for
+`latency` seconds before answering (plus `item_latency` for every extra
+workout in a batch analysis prompt); streamGenerateContent spreads that
+delay evenly over its chunks.
+
+`Faults` makes it misbehave on purpose: answer 503 or 429, return
+malformed JSON, or answer late. Outcomes depend only on the seed and the
+call number, so a run can be replayed exactly. For tests without a
+socket, pass `httpx.ASGITransport(make_app(...))` to
+`gemini_service.use_transport`.
+"""
+import re
+import json
+import time
+import random
+import socket
+import asyncio
+import threading
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANALYSIS = {
+    "summary": "Solid session with good volume.",
+    "strengths": ["consistent reps"],
+    "improvements": ["add a warm-up set"],
+    "next_session_tips": "Increase the load by 2.5 kg.",
+    "overall_score": 7,
+}
+
+
+NARRATIVE = (
+    "You trained consistently this week, hitting every major muscle group at least once. "
+    "Bench volume went up and squat depth looked steadier. Next week, add one more pull session "
+    "and keep the rest days between heavy lower-body work."
+)
+STREAM_CHUNKS = 10
+# workout ids in a batch analysis prompt
+BATCH_IDS = re.compile(r"^## (\S+)$", re.MULTILINE)
+
+
+class Faults:
+    """Per-call fault injection.
+
+    Call n (counted from 1) fails with 503 ("error") with probability
+    `error_rate`, 429 ("throttle") with `throttle_rate`, returns truncated
+    JSON ("malformed") with `malformed_rate`, or answers `slow_latency`
+    seconds late ("slow") with `slow_rate`; otherwise "ok". `script` fixes
+    the outcomes of the first calls, e.g. ["error", "error", "ok"]. Change
+    the attributes at any time to start or end an outage.
+    """
+
+    def __init__(
+        self,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 5.0,
+        script: Optional[List[str]] = None,
+        seed: int = 0,
+    ):
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.malformed_rate = malformed_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.script = list(script or [])
+        self.seed = seed
+
+    def outcome(self, call: int) -> str:
+        if call <= len(self.script):
+            return self.script[call - 1]
+        x = random.Random(self.seed * 1_000_003 + call).random()
+        for name, rate in (("error", self.error_rate), ("throttle", self.throttle_rate), ("malformed", self.malformed_rate), ("slow", self.slow_rate)):
+            if x < rate:
+                return name
+            x -= rate
+        return "ok"
+
+
+async def stream(text: str, latency: float):
+    step = -(-len(text) // STREAM_CHUNKS)
+    for i in range(0, len(text), step):
+        await asyncio.sleep(latency / STREAM_CHUNKS)
+        chunk = {"candidates": [{"content": {"parts": [{"text": text[i:i + step]}]}}]}
+        yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+
+def make_app(latency: float = 0.5, item_latency: float = 0.0, faults: Optional[Faults] = None) -> FastAPI:
+    app = FastAPI()
+    app.state.latency = latency
+    app.state.item_latency = item_latency
+    app.state.faults = faults or Faults()
+    app.state.calls = 0
+    app.state.outcomes = {}
+
+    @app.post("/models/{model_action}")
+    async def generate(model_action: str, request: Request):
+        body = await request.json()
+        prompt = body["contents"][0]["parts"][0]["text"]
+        app.state.calls += 1
+        outcome = app.state.faults.outcome(app.state.calls)
+        app.state.outcomes[outcome] = app.state.outcomes.get(outcome, 0) + 1
+        if outcome in ("error", "throttle"):
+            await asyncio.sleep(app.state.latency / 10)
+            status = 503 if outcome == "error" else 429
+            return JSONResponse({"error": {"code": status, "message": f"injected {outcome}"}}, status_code=status)
+        ids = BATCH_IDS.findall(prompt)
+        if ids:
+            text = json.dumps({i: ANALYSIS for i in ids})
+        elif "overall_score" in prompt:
+            text = json.dumps(ANALYSIS)
+        else:
+            text = NARRATIVE
+        if outcome == "malformed":
+            text = text[: len(text) // 2]
+        if model_action.endswith(":streamGenerateContent"):
+            return StreamingResponse(stream(text, app.state.latency), media_type="text/event-stream")
+        # output grows with the number of workouts analyzed
+        delay = app.state.latency + app.state.item_latency * max(len(ids) - 1, 0)
+        await asyncio.sleep(delay + (app.state.faults.slow_latency if outcome == "slow" else 0))
+        return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_app(app, port: int = 0, lifespan: str = "auto") -> str:
+    """Run any ASGI app under uvicorn in a daemon thread; returns its base URL."""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan=lifespan))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("server failed to start")
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def serve(latency: float = 0.5, port: int = 0, item_latency: float = 0.0, faults: Optional[Faults] = None):
+    """Run the fake server in a daemon thread; returns (base_url, app)."""
+    app = make_app(latency, item_latency, faults)
+    return serve_app(app, port), app
@@ -0,0 +1,232 @@
+"""Reproducible benchmark suite: microbenchmarks plus an in-process mixed-traffic load test.
+
+The app runs in dummy mode (in-memory FakeSupabase) behind httpx.AsyncClient,
+with Gemini served by benchmarks/fake_gemini.py. Results are written as JSON
+so runs can be compared:
+
+    python -m backend.benchmarks.suite --out bench.json
+    python -m backend.benchmarks.suite --out new.json --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import warnings
+from typing import Callable, Dict, List
+
+from .fake_gemini import serve
+
+# (name, weight) of the mixed traffic
+TRAFFIC = [("list_workouts", 50), ("get_workout", 30), ("analyze", 10), ("weekly_summary", 10)]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]  # noqa: E731
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.fmean(ordered)}
+
+
+def micro(name: str, fn: Callable[[], object], n: int) -> Dict[str, float]:
+    """Per-call timings in microseconds, sampled in batches so timer overhead stays small."""
+    batch = max(1, n // 50)
+    samples = []
+    fn()
+    for _ in range(max(1, n // batch)):
+        t0 = time.perf_counter()
+        for _ in range(batch):
+            fn()
+        samples.append((time.perf_counter() - t0) / batch * 1e6)
+    result = {k: round(v, 3) for k, v in percentiles(samples).items()}
+    print(f"  {name:<32} p50 {result['p50']:>10.2f} us  p99 {result['p99']:>10.2f} us")
+    return result
+
+
+def run_micro(args, ids: Dict[str, List[str]]) -> Dict[str, dict]:
+    from jose import jwt
+    from ..models import schemas
+    from ..services import auth
+    from ..services.supabase_client import supabase
+
+    print("microbenchmarks")
+    results = {}
+    secret, auth.SUPABASE_JWT_SECRET = auth.SUPABASE_JWT_SECRET, "bench-secret"
+    token = jwt.encode({"sub": "user-0", "exp": time.time() + 3600}, "bench-secret", algorithm="HS256")
+
+    def cold():
+        auth.token_cache.clear()
+        auth.decode_token(f"Bearer {token}")
+
+    results["decode_token_cold"] = micro("decode_token (verify)", cold, 2_000)
+    results["decode_token_cached"] = micro("decode_token (cached)", lambda: auth.decode_token(f"Bearer {token}"), 50_000)
+    auth.SUPABASE_JWT_SECRET = secret
+
+    user = next(iter(ids))
+    page = supabase.table("workouts").select("*, exercises(*)").eq("user_id", user).order("date", desc=True).limit(50).execute().data
+    results["serialize_workout"] = micro(
+        "Workout validate + json (1)", lambda: schemas.Workout(**page[0]).json(), 5_000
+    )
+    results["serialize_page"] = micro(
+        "Workout validate + json (50)", lambda: [schemas.Workout(**w).json() for w in page], 200
+    )
+    results["fake_table_list"] = micro(
+        "FakeTable list page (50)",
+        lambda: supabase.table("workouts").select("*, exercises(*)").eq("user_id", user).order("date", desc=True).limit(50).execute(),
+        500,
+    )
+    wid = ids[user][0]
+    results["fake_table_get"] = micro(
+        "FakeTable get by id",
+        lambda: supabase.table("workouts").select("*, exercises(*)").eq("id", wid).eq("user_id", user).execute(),
+        5_000,
+    )
+    return results
+
+
+async def run_load(args, app, ids: Dict[str, List[str]]) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    users = list(ids)
+    names = [n for n, _ in TRAFFIC]
+    weights = [w for _, w in TRAFFIC]
+    plan = [(rng.choices(names, weights)[0], rng.choice(users)) for _ in range(args.requests)]
+    timings: Dict[str, List[float]] = {n: [] for n in names}
+    errors: Dict[str, int] = {n: 0 for n in names}
+    cursor = iter(plan)
+
+    async def worker(client):
+        for kind, user in cursor:
+            headers = {"Authorization": f"Bearer {user}"}
+            wid = rng.choice(ids[user])
+            t0 = time.perf_counter()
+            if kind == "list_workouts":
+                r = await client.get("/workouts/", headers=headers)
+            elif kind == "get_workout":
+                r = await client.get(f"/workouts/{wid}", headers=headers)
+            elif kind == "analyze":
+                r = await client.post(f"/ai/analyze/{wid}", headers=headers)
+            else:
+                r = await client.get("/ai/weekly-summary", headers=headers)
+            elapsed = time.perf_counter() - t0
+            # a refused or failed request says nothing about the endpoint's latency
+            if r.status_code >= 300:
+                errors[kind] += 1
+            else:
+                timings[kind].append(elapsed)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    print(f"load test: {args.requests} requests, concurrency {args.concurrency}, {elapsed:.2f}s, {args.requests / elapsed:.0f} req/s")
+    endpoints = {}
+    for name in names:
+        if not timings[name]:
+            if errors[name]:
+                endpoints[name] = {"count": 0, "errors": errors[name]}
+                print(f"  {name:<16} n=0      err={errors[name]}")
+            continue
+        p = {k: round(v * 1000, 3) for k, v in percentiles(timings[name]).items()}
+        endpoints[name] = {"count": len(timings[name]), "errors": errors[name], **{f"{k}_ms": v for k, v in p.items()}}
+        print(f"  {name:<16} n={len(timings[name]):<6} err={errors[name]:<4} p50 {p['p50']:>8.2f} ms  p95 {p['p95']:>8.2f} ms  p99 {p['p99']:>8.2f} ms")
+    return {"elapsed_s": round(elapsed, 3), "throughput_rps": round(args.requests / elapsed, 1), "endpoints": endpoints}
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in results.items():
+        if isinstance(v, dict):
+            out.update(flatten(v, f"{prefix}{k}."))
+        elif isinstance(v, (int, float)) and k != "count":
+            out[f"{prefix}{k}"] = v
+    return out
+
+
+def compare(new: dict, old_path: str, threshold: float) -> bool:
+    """Print metric deltas against an earlier run.
+
+    Returns True if a median latency or the throughput regressed beyond
+    `threshold`; tail percentiles are shown but too noisy to gate on.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    a, b = flatten({"micro": old["micro"], "load": old["load"]}), flatten({"micro": new["micro"], "load": new["load"]})
+    regressed = False
+    print(f"\ncompared with {old_path}")
+    for key in sorted(a.keys() & b.keys()):
+        if not a[key]:
+            continue
+        change = (b[key] - a[key]) / a[key]
+        # throughput regresses downwards, everything else upwards
+        worse = -change if key.endswith("throughput_rps") else change
+        flag = ""
+        if worse > threshold and key.endswith(("p50", "p50_ms", "throughput_rps")):
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"  {key:<52} {a[key]:>12.3f} -> {b[key]:>12.3f} ({change:+.1%}){flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--workouts", type=int, default=200, help="workouts per user")
+    parser.add_argument("--exercises", type=int, default=8, help="exercises per workout")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--gemini-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore")
+    base_url, _ = serve(latency=args.gemini_latency)
+    for var in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY", "SUPABASE_JWT_SECRET"):
+        os.environ.pop(var, None)
+    os.environ["GEMINI_API_BASE"] = base_url
+    os.environ.setdefault("FRONTEND_URL", "http://localhost")
+    # the load test measures latency, not the per-user limits in front of it
+    os.environ["AI_RATE_LIMIT"] = "1000000/minute"
+    os.environ["GUEST_RATE_LIMIT"] = "1000000/minute"
+
+    from ..main import app
+    from ..services.supabase_client import supabase
+    from .datasets import seed
+
+    logging.getLogger("fittrack").setLevel(logging.WARNING)
+    t0 = time.perf_counter()
+    ids = seed(supabase, args.users, args.workouts, args.exercises, args.seed)
+    print(f"seeded {args.users} users x {args.workouts} workouts x {args.exercises} exercises in {time.perf_counter() - t0:.1f}s")
+
+    results = {"micro": run_micro(args, ids), "load": asyncio.run(run_load(args, app, ids))}
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    results["meta"] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nwrote {args.out}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,42 @@
 import os
-import logging
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import Response
+from starlette.responses import Response, JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from typing import List
 
-from .routers import auth, workouts, ai
-from .services import auth as auth_service
+from .routers import auth, workouts, ai, stats
+from .services import gemini_service
+from .services import repository
+from .services.jobs import job_queue
+from .services.ai_cache import analysis_cache
+from .services.rate_limit import rate_limiter
+from .services.response_cache import response_cache
+from .services.changes import notifier as change_notifier
+from .services import metrics
+from .services.request_log import RequestLog, RequestLogMiddleware
+from .services.workout_import import IMPORT_MAX_BYTES
+from .services.registry import registry
+import anyio.to_thread
+from starlette.responses import PlainTextResponse
 
-# structured logger
-logger = logging.getLogger("fittrack")
-logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-
-# rate limiter (slowapi)
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.middleware import SlowAPIMiddleware
-from slowapi.errors import RateLimitExceeded
-
-limiter = Limiter(key_func=get_remote_address)
+# structured JSON request logs, written to stderr by a background thread
+request_log = RequestLog("fittrack")
+logger = request_log.logger
 
 # enforce max request size
 class ContentSizeLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, max_length: int):
+    def __init__(self, app, max_length: int, overrides: dict = None):
         super().__init__(app)
         self.max_length = max_length
+        # path -> limit for endpoints that take larger bodies
+        self.overrides = overrides or {}
 
     async def dispatch(self, request: Request, call_next):
         cl = request.headers.get("content-length")
-        if cl and int(cl) > self.max_length:
+        if cl and int(cl) > self.overrides.get(request.url.path, self.max_length):
             return Response("Request payload too large", status_code=413)
         return await call_next(request)
 
@@ -53,41 +55,69 @@ async def lifespan(app: FastAPI):
             missing.append(var)
     if missing:
         raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
-    # configure logging of requests
+    # build SDK clients and heavy modules in the background; /ready turns 200 once done
+    warm_up = asyncio.create_task(registry.warm_up())
+    # workers, plus failing jobs a previous run left queued or running
+    await job_queue.start()
     yield
+    warm_up.cancel()
+    await job_queue.shutdown()
+    await gemini_service.aclose()
+    await repository.db.aclose()
 
 app = FastAPI(lifespan=lifespan)
-# attach limiter object to app state
-app.state.limiter = limiter
-app.add_middleware(SlowAPIMiddleware)
-app.add_exception_handler(RateLimitExceeded, lambda request, exc: Response("Too many requests", status_code=429))
 app.add_middleware(CORSMiddleware,
     allow_origins=[os.getenv("FRONTEND_URL")],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "If-None-Match"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
-app.add_middleware(ContentSizeLimitMiddleware, max_length=1_000_000)
+app.add_middleware(ContentSizeLimitMiddleware, max_length=1_000_000, overrides={"/workouts/import": IMPORT_MAX_BYTES})
+app.add_middleware(RequestLogMiddleware, log=request_log)
+# outermost, so timings include every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
 
-# request logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    user_id = None
-    try:
-        auth_header = request.headers.get("authorization")
-        if auth_header:
-            user = auth_service.decode_token(auth_header)  # new util
-            user_id = getattr(user, "id", None)
-    except Exception:
-        pass
-    response = await call_next(request)
-    logger.info(f"{request.method} {request.url.path} user={user_id} status={response.status_code}")
-    return response
+metrics.register_gauge(
+    "threadpool_threads_busy", "Starlette threadpool threads running sync handlers or database calls.",
+    lambda: anyio.to_thread.current_default_thread_limiter().borrowed_tokens,
+)
+metrics.register_gauge(
+    "threadpool_tasks_waiting", "Calls queued for a free threadpool thread.",
+    lambda: anyio.to_thread.current_default_thread_limiter().statistics().tasks_waiting,
+)
+metrics.register_gauge("ai_job_queue_depth", "AI analysis jobs waiting for a worker.", job_queue.depth)
+metrics.register_gauge("ai_cache_hits_total", "Analysis cache hits.", lambda: analysis_cache.hits, "counter")
+metrics.register_gauge("ai_cache_misses_total", "Analysis cache misses.", lambda: analysis_cache.misses, "counter")
+metrics.register_gauge("ai_cache_coalesced_total", "Analysis requests that waited on an identical model call in flight.", lambda: analysis_cache.coalesced, "counter")
+metrics.register_gauge("ai_cache_entries", "Analyses held in the cache.", lambda: analysis_cache.stats()["size"])
+metrics.register_gauge("ai_cache_inflight", "Distinct analyses being generated.", lambda: analysis_cache.stats()["inflight"])
+metrics.register_gauge("rate_limited_requests_total", "Requests refused with 429.", lambda: rate_limiter.rejected, "counter")
+metrics.register_gauge("rate_limit_errors_total", "Requests let through because the rate limit store failed.", lambda: rate_limiter.errors, "counter")
+metrics.register_gauge("response_cache_hits_total", "Read responses served from the per-user cache.", lambda: response_cache.hits, "counter")
+metrics.register_gauge("response_cache_misses_total", "Read responses built from the database.", lambda: response_cache.misses, "counter")
+metrics.register_gauge("response_not_modified_total", "Reads answered 304 from If-None-Match.", lambda: response_cache.not_modified, "counter")
+metrics.register_gauge("change_streams_open", "Open /workouts/changes/stream connections.", change_notifier.streams)
+metrics.register_gauge("request_log_dropped_total", "Request log records dropped because the log queue was full.", lambda: request_log.dropped, "counter")
 
 app.include_router(auth.router)
 app.include_router(workouts.router)
 app.include_router(ai.router)
+app.include_router(stats.router)
 
 @app.get("/", tags=["health"])
 def root():
     return {"message": "FitTrack Pro backend is running"}
+
+
+@app.get("/ready", tags=["health"])
+def ready():
+    """503 until the lifespan warm-up has built every service, so traffic waits for a warm worker."""
+    body = {"ready": registry.ready(), "services": registry.status()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    # async so the threadpool gauges are read on the event loop
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,5 +1,5 @@
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import date, datetime
 
 
@@ -13,7 +13,7 @@ class ExerciseCreate(BaseModel):
 
 class WorkoutCreate(BaseModel):
     title: str = Field(..., max_length=100)
-    date: Optional[date]
+    date: date
     duration_minutes: Optional[int] = Field(None, ge=0)
     notes: Optional[str] = Field(None, max_length=1000)
     exercises: List[ExerciseCreate] = []
@@ -28,8 +28,7 @@ class Exercise(BaseModel):
     weight_kg: Optional[float]
     muscle_group: Optional[str]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class Workout(BaseModel):
@@ -42,10 +41,31 @@ class Workout(BaseModel):
     created_at: datetime
     exercises: List[Exercise] = []
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ExerciseRecord(BaseModel):
+    exercise: str
+    name: Optional[str]
+    max_weight_kg: Optional[float]
+    best_e1rm: Optional[float]
+    total_volume: float
+    sessions: int
+    last_performed: Optional[date]
+
+
+class ProgressPoint(BaseModel):
+    workout_id: str
+    date: Optional[date]
+    max_weight_kg: Optional[float]
+    best_e1rm: Optional[float]
+    volume: float
 
 
+class Progression(BaseModel):
+    exercise: str
+    points: List[ProgressPoint]
+
 
 class User(BaseModel):
     id: str
@@ -71,5 +91,83 @@ class AIAnalysis(BaseModel):
     overall_score: int = Field(..., ge=1, le=10)
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AIBatchRequest(BaseModel):
+    workout_ids: List[str] = Field(..., min_length=1, max_length=50)
+
+
+class AIBatchError(BaseModel):
+    workout_id: str
+    error: str
+
+
+class AIBatchResult(BaseModel):
+    analyses: List[AIAnalysis]
+    errors: List[AIBatchError]
+
+
+class Tombstone(BaseModel):
+    kind: str
+    id: str
+
+
+class ChangeFeed(BaseModel):
+    version: int
+    # the client's version is unknown here (e.g. data was reset): reload everything
+    reset: bool = False
+    has_more: bool = False
+    workouts: List[Workout] = []
+    analyses: List[AIAnalysis] = []
+    deleted: List[Tombstone] = []
+
+
+class VolumePoint(BaseModel):
+    period: date
+    volume: float
+    workouts: int
+
+
+class MuscleGroupVolume(BaseModel):
+    muscle_group: str
+    volume: float
+    exercises: int
+
+
+class ScorePoint(BaseModel):
+    period: date
+    overall_score: float
+
+
+class DashboardStats(BaseModel):
+    start: Optional[date]
+    end: Optional[date]
+    bucket: str
+    volume: List[VolumePoint]
+    muscle_groups: List[MuscleGroupVolume]
+    score_trend: List[ScorePoint]
+
+
+class AIJob(BaseModel):
+    id: str
+    kind: str
+    target: str
+    status: str
+    priority: int
+    result: Optional[AIAnalysis] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    workouts: int
+    exercises: int
+    error_count: int
+    errors: List[ImportRowError]
@@ -1,34 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
-from ..services.supabase_client import supabase
+import json
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from ..services.repository import db
 from ..services.auth import get_current_user, User
 from ..services import gemini_service
+from ..services.resilience import CircuitOpen
+from ..services.ai_cache import analysis_cache, AI_CACHE_PERSIST
+from ..services.jobs import job_queue, QueueFull, FINISHED
+from ..services import changes, rate_limit
+from ..services.rate_limit import Limit, limit_per_user, AI_RATE_LIMIT
+from ..services.response_cache import cached_response, response_cache
+from ..services.serialization import dump_json
 from ..models import schemas
 from pydantic import ValidationError
-from typing import List
+from typing import List, Optional
 import logging
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
+# SSE fallback poll interval for jobs run by another worker process
+JOB_POLL_SECONDS = 1.0
+# shared per-user budget for every route that calls the model
+ai_rate_limit = Depends(limit_per_user("ai", AI_RATE_LIMIT))
+AI_LIMIT = Limit.parse(AI_RATE_LIMIT)
 
-@router.post("/analyze/{workout_id}", response_model=schemas.AIAnalysis, status_code=201)
-def analyze(workout_id: str, user: User = Depends(get_current_user)):
-    # fetch workout + exercises
-    res = (
-        supabase.table("workouts").select("*, exercises(*)").eq("id", workout_id).execute()
-    )
-    if res.error:
-        logger = logging.getLogger(__name__)
-        logger.error("Supabase fetch workout for analysis error: %s", res.error)
-        raise HTTPException(status_code=400, detail="Failed to retrieve workout")
-    if not res.data:
-        # do not reveal existence
-        raise HTTPException(status_code=403, detail="Forbidden")
-    workout = res.data[0]
-    if workout.get("user_id") != user.id:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    # call gemini
+
+def _analysis_row(workout_id: str, user_id: str, analysis: schemas.AIResponse, key: str) -> dict:
+    row = {
+        "workout_id": workout_id,
+        "user_id": user_id,
+        "summary": analysis.summary,
+        "strengths": analysis.strengths,
+        "improvements": analysis.improvements,
+        "next_session_tips": analysis.next_session_tips,
+        "overall_score": analysis.overall_score,
+    }
+    if AI_CACHE_PERSIST:
+        row["input_hash"] = key
+    return row
+
+
+async def analyze_and_store(workout: dict, user_id: str, stored: Optional[dict] = None) -> dict:
+    """Run the (cached) Gemini analysis for a workout row and upsert it into ai_analyses.
+
+    `stored` is the workout's ai_analyses row ({} for none) when the caller
+    has already fetched it. While the model's circuit is open, a stored
+    analysis of an older version of the workout is returned instead, and
+    without one the call fails fast with 503.
+    """
+    workout_id = workout["id"]
+    key = gemini_service.analysis_key(workout)
+    if AI_CACHE_PERSIST:
+        if stored is None:
+            prev = await db.analyses.for_workout(workout_id, user_id)
+            stored = prev.data[0] if not prev.error and prev.data else None
+        # an analysis of this exact workout content is already stored
+        if stored and stored.get("input_hash") == key:
+            analysis_cache.record_hit()
+            return stored
+    # call gemini (served from cache when the workout content is unchanged)
     try:
-        analysis_raw = gemini_service.analyze_workout(workout)
+        analysis_raw = await gemini_service.analyze_workout_cached_async(workout, key)
+    except CircuitOpen as e:
+        if stored is None:
+            prev = await db.analyses.for_workout(workout_id, user_id)
+            stored = prev.data[0] if not prev.error and prev.data else None
+        if stored:
+            return stored
+        raise HTTPException(
+            status_code=503, detail="AI service unavailable", headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    except asyncio.TimeoutError:
+        logger = logging.getLogger(__name__)
+        logger.error("Gemini analysis timed out")
+        raise HTTPException(status_code=504, detail="AI service timed out")
     except Exception as e:
         logger = logging.getLogger(__name__)
         logger.exception("Gemini analysis error")
@@ -41,50 +88,219 @@ def analyze(workout_id: str, user: User = Depends(get_current_user)):
         logger.error("Invalid AI response: %s", analysis_raw)
         raise HTTPException(status_code=500, detail="AI service returned unexpected format")
     # upsert into ai_analyses
-    payload = {
-        "workout_id": workout_id,
-        "user_id": user.id,
-        "summary": analysis.summary,
-        "strengths": analysis.strengths,
-        "improvements": analysis.improvements,
-        "next_session_tips": analysis.next_session_tips,
-        "overall_score": analysis.overall_score,
-    }
-    up = supabase.table("ai_analyses").upsert(payload, on_conflict="workout_id").execute()
+    up = await db.analyses.upsert(_analysis_row(workout_id, user_id, analysis, key))
     if up.error:
         logger = logging.getLogger(__name__)
         logger.error("Supabase upsert ai analysis error: %s", up.error)
         raise HTTPException(status_code=500, detail="Failed to save analysis")
+    await run_in_threadpool(changes.record, user_id, "analysis", "upsert", [workout_id])
+    response_cache.invalidate(user_id)
     return up.data[0]
 
-@router.get("/analysis/{workout_id}", response_model=schemas.AIAnalysis)
-def get_analysis(workout_id: str, user: User = Depends(get_current_user)):
-    res = (
-        supabase.table("ai_analyses").select("*").eq("workout_id", workout_id).eq("user_id", user.id)
-    ).execute()
+
+@router.post("/analyze/batch", response_model=schemas.AIBatchResult)
+async def analyze_batch(body: schemas.AIBatchRequest, user: User = Depends(get_current_user)):
+    """Analyze several workouts, packing AI_BATCH_SIZE of them into each model call.
+
+    Every workout gets its own validated analysis and all of them are saved
+    in one upsert. Workouts that were not found, or that the model did not
+    return a valid analysis for after one retry, are listed in `errors`;
+    the rest are still saved. The AI rate limit is charged per model call.
+    """
+    workout_ids = list(dict.fromkeys(body.workout_ids))
+    model_calls = -(-len(workout_ids) // gemini_service.AI_BATCH_SIZE)
+    await rate_limit.rate_limiter.ahit("ai", user.id, AI_LIMIT, min(model_calls, AI_LIMIT.capacity))
+    queries = [db.workouts.get_many(workout_ids, user.id)]
+    if AI_CACHE_PERSIST:
+        queries.append(db.analyses.for_workouts(workout_ids, user.id))
+    res, *prev = await db.gather(*queries)
+    if res.error:
+        logger = logging.getLogger(__name__)
+        logger.error("Supabase fetch workouts for batch analysis error: %s", res.error)
+        raise HTTPException(status_code=400, detail="Failed to retrieve workouts")
+    workouts = {w["id"]: w for w in res.data}
+    stored = {a["workout_id"]: a for a in prev[0].data} if prev and not prev[0].error else {}
+    analyses = {}
+    errors = []
+    todo, keys = [], []
+    for workout_id in workout_ids:
+        workout = workouts.get(workout_id)
+        if workout is None:
+            # other users' workouts look the same as missing ones
+            errors.append({"workout_id": workout_id, "error": "Workout not found"})
+            continue
+        key = gemini_service.analysis_key(workout)
+        if stored.get(workout_id, {}).get("input_hash") == key:
+            analysis_cache.record_hit()
+            analyses[workout_id] = stored[workout_id]
+            continue
+        todo.append(workout)
+        keys.append(key)
+    rows = []
+    for workout, key, analysis in zip(todo, keys, await gemini_service.analyze_workouts_async(todo, keys)):
+        if analysis is None:
+            errors.append({"workout_id": workout["id"], "error": "AI service failed"})
+            continue
+        rows.append(_analysis_row(workout["id"], user.id, schemas.AIResponse(**analysis), key))
+    if rows:
+        up = await db.analyses.upsert(rows)
+        if up.error:
+            logger = logging.getLogger(__name__)
+            logger.error("Supabase upsert batch ai analyses error: %s", up.error)
+            raise HTTPException(status_code=500, detail="Failed to save analyses")
+        await run_in_threadpool(changes.record, user.id, "analysis", "upsert", [row["workout_id"] for row in up.data])
+        response_cache.invalidate(user.id)
+        analyses.update((row["workout_id"], row) for row in up.data)
+    return {"analyses": [analyses[w] for w in workout_ids if w in analyses], "errors": errors}
+
+
+@router.post(
+    "/analyze/{workout_id}",
+    response_model=schemas.AIAnalysis,
+    status_code=201,
+    responses={202: {"model": schemas.AIJob}, 503: {"description": "Analysis queue is full"}},
+    dependencies=[ai_rate_limit],
+)
+async def analyze(
+    workout_id: str,
+    mode: str = Query("sync", pattern="^(sync|async)$"),
+    priority: int = Query(5, ge=0, le=9),
+    prefer: Optional[str] = Header(None),
+    user: User = Depends(get_current_user),
+):
+    """Analyze a workout.
+
+    In async mode (`?mode=async` or `Prefer: respond-async`) the analysis is
+    queued and a 202 with the job is returned; follow it at
+    `/ai/jobs/{id}` or `/ai/jobs/{id}/events`.
+    """
+    # fetch workout + exercises, and the stored analysis alongside when it may be reused
+    if AI_CACHE_PERSIST:
+        res, prev = await db.gather(db.workouts.get(workout_id), db.analyses.for_workout(workout_id, user.id))
+        stored = prev.data[0] if not prev.error and prev.data else {}
+    else:
+        res, stored = await db.workouts.get(workout_id), None
     if res.error:
         logger = logging.getLogger(__name__)
-        logger.error("Supabase get analysis error: %s", res.error)
-        raise HTTPException(status_code=400, detail="Failed to retrieve analysis")
+        logger.error("Supabase fetch workout for analysis error: %s", res.error)
+        raise HTTPException(status_code=400, detail="Failed to retrieve workout")
     if not res.data:
-        raise HTTPException(status_code=404, detail="Analysis not found")
-    return res.data[0]
+        # do not reveal existence
+        raise HTTPException(status_code=403, detail="Forbidden")
+    workout = res.data[0]
+    if workout.get("user_id") != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if mode == "async" or (prefer and "respond-async" in prefer.lower()):
+        try:
+            job = await job_queue.submit(user.id, "analyze", workout_id, lambda: analyze_and_store(workout, user.id), priority)
+        except QueueFull:
+            raise HTTPException(status_code=503, detail="Analysis queue is full, retry later", headers={"Retry-After": "5"})
+        return JSONResponse(
+            _job_view(job), status_code=202, headers={"Location": f"/ai/jobs/{job['id']}"}
+        )
+    return await analyze_and_store(workout, user.id, stored)
+
+
+def _job_view(job: dict) -> dict:
+    return {k: job.get(k) for k in ("id", "kind", "target", "status", "priority", "result", "error", "created_at", "updated_at")}
+
+
+async def _owned_job(job_id: str, user: User) -> dict:
+    job = await job_queue.get(job_id)
+    if not job or job["user_id"] != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.AIJob)
+async def get_job(job_id: str, user: User = Depends(get_current_user)):
+    return _job_view(await _owned_job(job_id, user))
+
 
-@router.get("/weekly-summary")
-def weekly_summary(user: User = Depends(get_current_user)):
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, user: User = Depends(get_current_user)):
+    """Server-sent events with the job state on every change, ending when it finishes."""
+    job = await _owned_job(job_id, user)
+
+    async def events():
+        last = None
+        current = job
+        while True:
+            if current["status"] != last:
+                last = current["status"]
+                yield f"event: {last}\ndata: {json.dumps(_job_view(current), default=str)}\n\n"
+            if last in FINISHED:
+                return
+            await job_queue.wait_for_change(job_id, timeout=JOB_POLL_SECONDS)
+            current = await job_queue.get(job_id) or current
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/analysis/{workout_id}", response_model=schemas.AIAnalysis)
+async def get_analysis(workout_id: str, request: Request, user: User = Depends(get_current_user)):
+    async def build():
+        res = await db.analyses.for_workout(workout_id, user.id)
+        if res.error:
+            logger = logging.getLogger(__name__)
+            logger.error("Supabase get analysis error: %s", res.error)
+            raise HTTPException(status_code=400, detail="Failed to retrieve analysis")
+        if not res.data:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        return dump_json(schemas.AIAnalysis, res.data[0]), {}
+
+    return await cached_response(request, user.id, build)
+
+@router.get("/weekly-summary", dependencies=[ai_rate_limit])
+async def weekly_summary(user: User = Depends(get_current_user)):
     # fetch workouts last 7 days with exercises
-    res = (
-        supabase.table("workouts").select("*, exercises(*)").eq("user_id", user.id).gte("date", "now() - interval '7 days'")
-    ).execute()
+    res = await db.workouts.in_range(user.id, start="now() - interval '7 days'")
     if res.error:
         logger = logging.getLogger(__name__)
         logger.error("Supabase weekly summary fetch error: %s", res.error)
         raise HTTPException(status_code=400, detail="Failed to fetch workouts")
     workouts = res.data
     try:
-        narrative = gemini_service.weekly_summary(workouts)
+        narrative = await gemini_service.weekly_summary_async(workouts)
+    except CircuitOpen:
+        return {"narrative": gemini_service.degraded_summary(workouts), "degraded": True}
+    except asyncio.TimeoutError:
+        logger = logging.getLogger(__name__)
+        logger.error("Gemini weekly summary timed out")
+        raise HTTPException(status_code=504, detail="AI service timed out")
     except Exception as e:
         logger = logging.getLogger(__name__)
         logger.exception("Gemini weekly summary error")
         raise HTTPException(status_code=500, detail="AI service failed")
-    return {"narrative": narrative}
+    return {"narrative": narrative, "degraded": False}
+
+
+@router.get("/weekly-summary/stream", dependencies=[ai_rate_limit])
+async def weekly_summary_stream(user: User = Depends(get_current_user)):
+    """The weekly narrative as server-sent events: `chunk` events as text arrives, then `done`.
+
+    While the model's circuit is open the locally computed summary is sent
+    as one chunk and `done` carries `{"degraded": true}`.
+    """
+    res = await db.workouts.in_range(user.id, start="now() - interval '7 days'")
+    if res.error:
+        logger = logging.getLogger(__name__)
+        logger.error("Supabase weekly summary fetch error: %s", res.error)
+        raise HTTPException(status_code=400, detail="Failed to fetch workouts")
+
+    async def events():
+        try:
+            async for text in gemini_service.weekly_summary_stream(res.data):
+                yield f"event: chunk\ndata: {json.dumps({'text': text})}\n\n"
+        except CircuitOpen:
+            yield f"event: chunk\ndata: {json.dumps({'text': gemini_service.degraded_summary(res.data)})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'degraded': True})}\n\n"
+            return
+        except Exception:
+            logger = logging.getLogger(__name__)
+            logger.exception("Gemini weekly summary stream error")
+            yield f"event: error\ndata: {json.dumps({'detail': 'AI service failed'})}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -1,13 +1,9 @@
 import os
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 
 from ..services.supabase_client import supabase
-
-# limiter instance imported from main if needed, but create a local reference
-limiter = Limiter(key_func=get_remote_address)
+from ..services.rate_limit import limit_per_ip, GUEST_RATE_LIMIT
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -20,11 +16,10 @@ class SessionResponse(BaseModel):
     user: dict
 
 
-@router.post("/guest", response_model=SessionResponse)
-@limiter.limit("10/minute")
-async def guest(request: Request):
+@router.post("/guest", response_model=SessionResponse, dependencies=[Depends(limit_per_ip("guest", GUEST_RATE_LIMIT))])
+async def guest():
     """Sign in using a server-side guest account and return the Supabase session.
-    Rate limited to 10 requests per IP per minute.
+    Rate limited per IP to GUEST_RATE_LIMIT (10 requests per minute by default).
     """
     email = os.getenv("GUEST_EMAIL")
     password = os.getenv("GUEST_PASSWORD")
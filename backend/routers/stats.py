@@ -0,0 +1,50 @@
+import logging
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from ..services.repository import db
+from ..services.auth import get_current_user, User
+from ..services import analytics
+from ..services.response_cache import cached_response
+from ..services.serialization import dump_json
+from ..models import schemas
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+logger = logging.getLogger(__name__)
+
+
+@router.get("/", response_model=schemas.DashboardStats)
+async def dashboard_stats(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: str = Query("week", pattern="^(day|week|month)$"),
+    user: User = Depends(get_current_user),
+):
+    """Volume per bucket, volume per muscle group and AI score trend over [start, end]."""
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    async def build():
+        # the two reads are independent, so they run concurrently
+        res, scores = await db.gather(
+            db.workouts.in_range(
+                user.id,
+                start.isoformat() if start else None,
+                end.isoformat() if end else None,
+                columns="id, date, exercises(sets, reps, weight_kg, muscle_group)",
+            ),
+            db.analyses.scores(user.id),
+        )
+        if res.error:
+            logger.error("Supabase stats workouts error: %s", res.error)
+            raise HTTPException(status_code=400, detail="Failed to compute stats")
+        if scores.error:
+            logger.error("Supabase stats analyses error: %s", scores.error)
+            raise HTTPException(status_code=400, detail="Failed to compute stats")
+        # CPU-bound over the whole range, so kept off the event loop
+        stats = await run_in_threadpool(analytics.compute_stats, res.data, scores.data, bucket)
+        return dump_json(schemas.DashboardStats, {"start": start, "end": end, "bucket": bucket, **stats}), {}
+
+    return await cached_response(request, user.id, build)
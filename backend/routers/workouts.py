@@ -1,80 +1,424 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from typing import List
+import io
+import re
+import csv
+import base64
+import asyncio
+import logging
+import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Iterator, List, Optional, Tuple
 from ..services.supabase_client import supabase
+from ..services.repository import db, WorkoutRepository
 from ..services.auth import get_current_user, User
+from ..services.workout_import import ImportErrors, ImportTooLarge, IMPORT_MAX_BYTES, parse_upload
+from ..services.response_cache import cached_response, response_cache
+from ..services import changes, records
+from ..services.serialization import dump_json, dump_lines
 from ..models import schemas
 
 router = APIRouter(prefix="/workouts", tags=["workouts"])
+logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 200
+# exercises written per bulk insert during an import
+IMPORT_BATCH_SIZE = 5000
+# workouts fetched per database page while exporting
+EXPORT_PAGE_SIZE = 500
+EXPORT_CSV_COLUMNS = ("date", "title", "duration_minutes", "notes", "exercise", "sets", "reps", "weight_kg", "muscle_group")
+# change log rows read per /workouts/changes call or stream event
+CHANGES_PAGE_SIZE = 500
+# how often an open change stream checks for writes made by other workers
+CHANGES_POLL_SECONDS = 15.0
+_CURSOR_ID = re.compile(r"[A-Za-z0-9-]+")
 
-@router.post("/", response_model=schemas.Workout, status_code=201)
-def create_workout(workout: schemas.WorkoutCreate, user: User = Depends(get_current_user)):
-    # insert workout
-    data = {
-        "user_id": user.id,
-        "title": workout.title,
-        "date": workout.date.isoformat() if workout.date else None,
-        "duration_minutes": workout.duration_minutes,
-        "notes": workout.notes,
-    }
-    res = supabase.table("workouts").insert(data).execute()
+
+def insert_workouts(user_id: str, workouts: List[schemas.WorkoutCreate]) -> List[dict]:
+    """Write workouts and all their exercises in two bulk inserts.
+
+    The response rows are assembled from what was written, so no re-read is
+    needed. On an exercise failure the inserted workouts are rolled back.
+    Logs the workouts to the change feed, merges them into the
+    personal-records index, then bumps the user's data version, so cached
+    reads are revalidated.
+    """
+    rows = [
+        {
+            "user_id": user_id,
+            "title": w.title,
+            "date": w.date.isoformat(),
+            "duration_minutes": w.duration_minutes,
+            "notes": w.notes,
+        }
+        for w in workouts
+    ]
+    res = supabase.table("workouts").insert(rows).execute()
     if res.error:
-        logger = logging.getLogger(__name__)
         logger.error("Supabase insert workout error: %s", res.error)
         raise HTTPException(status_code=400, detail="Failed to create workout")
-    created = res.data[0]
-    # insert exercises if any, rollback on failure
     try:
-        for ex in workout.exercises:
-            exdata = ex.dict()
-            exdata["workout_id"] = created["id"]
-            er = supabase.table("exercises").insert(exdata).execute()
+        created = _insert_exercises(res.data, workouts)
+        changes.record(user_id, "workout", "upsert", [row["id"] for row in created])
+        try:
+            records.apply_workouts(user_id, created)
+        except records.RecordsError:
+            # the workouts are saved; the index can be rebuilt from them
+            logger.exception("Records index update failed for user %s", user_id)
+    finally:
+        # after the records too, so a read in between cannot cache old ones
+        # under the new version; also after a rollback, as a read may have
+        # seen the workouts in between
+        response_cache.invalidate(user_id)
+    return created
+
+
+def _insert_exercises(created: List[dict], workouts: List[schemas.WorkoutCreate]) -> List[dict]:
+    exrows = []
+    for row, w in zip(created, workouts):
+        row["exercises"] = []
+        for ex in w.exercises:
+            # dict(model) copies the fields without .dict()'s per-call overhead
+            exdata = dict(ex)
+            exdata["workout_id"] = row["id"]
+            exrows.append(exdata)
+    if exrows:
+        # one list insert for every exercise, rollback on failure
+        try:
+            er = supabase.table("exercises").insert(exrows).execute()
             if er.error:
                 raise Exception(er.error)
-    except Exception as e:
-        # rollback workout
-        supabase.table("workouts").delete().eq("id", created["id"]).execute()
-        raise HTTPException(status_code=500, detail="Failed to save exercises")
-    # fetch full workout with exercises
-    full = supabase.table("workouts").select("*, exercises(*)").eq("id", created["id"]).execute()
-    return full.data[0]
+        except Exception:
+            logger.exception("Supabase insert exercises error")
+            supabase.table("workouts").delete().in_("id", [row["id"] for row in created]).execute()
+            raise HTTPException(status_code=500, detail="Failed to save exercises")
+        by_id = {row["id"]: row for row in created}
+        for ex in er.data:
+            by_id[ex["workout_id"]]["exercises"].append(ex)
+    return created
 
 
-@router.get("/", response_model=List[schemas.Workout])
-def list_workouts(user: User = Depends(get_current_user)):
-    res = (
-        supabase.table("workouts").select("*, exercises(*)").eq("user_id", user.id).order("date", desc=True)
-    ).execute()
+@router.post("/", response_model=schemas.Workout, status_code=201)
+def create_workout(workout: schemas.WorkoutCreate, user: User = Depends(get_current_user)):
+    created = insert_workouts(user.id, [workout])[0]
+    return Response(dump_json(schemas.Workout, created), status_code=201, media_type="application/json")
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_workouts(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(csv|jsonl)$"),
+    user: User = Depends(get_current_user),
+):
+    """Bulk-import a workout history sent as the raw request body.
+
+    CSV (one exercise per row) or JSONL (one workout per line); the format
+    comes from `format` or else the Content-Type. The body is parsed as it
+    arrives and written in batches of IMPORT_BATCH_SIZE exercises, so batches
+    saved before a failure or an oversized upload stay saved. Invalid rows
+    are skipped and listed in the report by line number.
+    """
+    if fmt is None:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "jsonl"
+    errors = ImportErrors()
+    saved = {"workouts": 0, "exercises": 0}
+    batch: List[schemas.WorkoutCreate] = []
+    batch_lines: List[int] = []
+    batch_exercises = 0
+
+    async def flush():
+        try:
+            await run_in_threadpool(insert_workouts, user.id, batch)
+        except HTTPException as e:
+            for line in batch_lines:
+                errors.add(line, f"not saved: {e.detail}")
+            return
+        saved["workouts"] += len(batch)
+        saved["exercises"] += batch_exercises
+
+    try:
+        async for parsed in parse_upload(request.stream(), fmt, errors):
+            for line, workout in parsed:
+                batch.append(workout)
+                batch_lines.append(line)
+                batch_exercises += len(workout.exercises)
+                if batch_exercises >= IMPORT_BATCH_SIZE:
+                    await flush()
+                    batch, batch_lines, batch_exercises = [], [], 0
+        if batch:
+            await flush()
+    except ImportTooLarge:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Import exceeds {IMPORT_MAX_BYTES} bytes; {saved['workouts']} workouts were saved before the limit",
+        )
+    return {**saved, "error_count": errors.count, "errors": errors.items}
+
+
+def encode_cursor(row: dict) -> str:
+    return base64.urlsafe_b64encode(f"{row['date']}|{row['id']}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        day, _, wid = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+        datetime.date.fromisoformat(day)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not _CURSOR_ID.fullmatch(wid):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return day, wid
+
+
+def fetch_page(user_id: str, cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """One keyset page of a user's workouts ordered by (date, id) descending."""
+    after = decode_cursor(cursor) if cursor else None
+    # one extra row tells us whether another page exists
+    res = WorkoutRepository.page_query(supabase.table("workouts"), user_id, after, limit + 1).execute()
+    return _page_result(res, limit)
+
+
+async def fetch_page_async(user_id: str, cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    after = decode_cursor(cursor) if cursor else None
+    return _page_result(await db.workouts.page(user_id, after, limit + 1), limit)
+
+
+def _page_result(res, limit: int) -> Tuple[List[dict], Optional[str]]:
     if res.error:
-        logger = logging.getLogger(__name__)
         logger.error("Supabase list workouts error: %s", res.error)
         raise HTTPException(status_code=400, detail="Failed to list workouts")
-    return res.data
+    rows = res.data
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def iter_pages(user_id: str, cursor: Optional[str], limit: int) -> Iterator[List[dict]]:
+    """Every page from `cursor` onwards; only one page is held at a time."""
+    while True:
+        rows, cursor = fetch_page(user_id, cursor, limit)
+        yield rows
+        if not cursor:
+            return
+
+
+def stream_ndjson(user_id: str, cursor: Optional[str], limit: int) -> Iterator[bytes]:
+    for rows in iter_pages(user_id, cursor, limit):
+        yield dump_lines(schemas.Workout, rows)
+
+
+def stream_csv(user_id: str, limit: int) -> Iterator[bytes]:
+    """One exercise per row in the /workouts/import CSV layout; one chunk per page."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    for rows in iter_pages(user_id, None, limit):
+        for row in rows:
+            head = [row.get("date"), row.get("title"), row.get("duration_minutes"), row.get("notes")]
+            exercises = row.get("exercises") or [{}]
+            for ex in exercises:
+                writer.writerow(head + [ex.get("name"), ex.get("sets"), ex.get("reps"), ex.get("weight_kg"), ex.get("muscle_group")])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+
+
+@router.get("/", response_model=List[schemas.Workout])
+async def list_workouts(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    user: User = Depends(get_current_user),
+):
+    """Newest workouts first, one page per call.
+
+    The cursor for the following page is returned in the X-Next-Cursor header.
+    JSON pages carry an ETag and answer If-None-Match with 304. With
+    `format=ndjson` every page from the cursor onwards is streamed as one
+    workout per line, fetching `limit` rows at a time.
+    """
+    if fmt == "ndjson":
+        if cursor:
+            decode_cursor(cursor)
+        return StreamingResponse(stream_ndjson(user.id, cursor, limit), media_type="application/x-ndjson")
+
+    async def build():
+        rows, next_cursor = await fetch_page_async(user.id, cursor, limit)
+        return dump_json(schemas.Workout, rows), {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+    return await cached_response(request, user.id, build)
+
+
+@router.get("/export")
+def export_workouts(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    user: User = Depends(get_current_user),
+):
+    """Download the full history, newest first, as NDJSON (one workout per line) or CSV.
+
+    The body is produced page by page while it is sent, so memory use does
+    not grow with the size of the history and a slow client only holds up
+    the generator.
+    """
+    if fmt == "csv":
+        body, media_type = stream_csv(user.id, EXPORT_PAGE_SIZE), "text/csv"
+    else:
+        body, media_type = stream_ndjson(user.id, None, EXPORT_PAGE_SIZE), "application/x-ndjson"
+    filename = f"workouts-{datetime.date.today().isoformat()}.{fmt}"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+async def fetch_changes(user_id: str, since: Optional[int], limit: int = CHANGES_PAGE_SIZE) -> dict:
+    """What changed after version `since`, as current rows plus tombstones.
+
+    Several changes to one entity collapse into its latest state. Reads at
+    most `limit` log rows; `has_more` asks for another call from the
+    returned version.
+    """
+    if since is None:
+        log = None
+    else:
+        log = await db.changes.since(user_id, since, limit + 1)
+        if log.error:
+            logger.error("Supabase changes error: %s", log.error)
+            raise HTTPException(status_code=400, detail="Failed to retrieve changes")
+    if log is None or (not log.data and since > 0):
+        latest = await db.changes.latest(user_id)
+        if latest.error:
+            logger.error("Supabase changes error: %s", latest.error)
+            raise HTTPException(status_code=400, detail="Failed to retrieve changes")
+        version = latest.data[0]["seq"] if latest.data else 0
+        if log is None or since > version:
+            return {"version": version, "reset": True}
+    rows = log.data[:limit]
+    ops = changes.collapse(rows)
+    upserted = {kind: [eid for (k, eid), op in ops.items() if k == kind and op == "upsert"] for kind in ("workout", "analysis")}
+    queries = []
+    if upserted["workout"]:
+        queries.append(db.workouts.get_many(upserted["workout"], user_id))
+    if upserted["analysis"]:
+        queries.append(db.analyses.for_workouts(upserted["analysis"], user_id))
+    results = await db.gather(*queries)
+    if any(r.error for r in results):
+        logger.error("Supabase changed rows error: %s", next(r.error for r in results if r.error))
+        raise HTTPException(status_code=400, detail="Failed to retrieve changes")
+    fetched = iter(results)
+    # rows deleted after these log entries are left out; their tombstones follow
+    workouts = next(fetched).data if upserted["workout"] else []
+    analyses = next(fetched).data if upserted["analysis"] else []
+    return {
+        "version": rows[-1]["seq"] if rows else since,
+        "has_more": len(log.data) > limit,
+        "workouts": workouts,
+        "analyses": analyses,
+        "deleted": [{"kind": kind, "id": eid} for (kind, eid), op in ops.items() if op == "delete"],
+    }
+
+
+@router.get("/changes", response_model=schemas.ChangeFeed)
+async def workout_changes(request: Request, since: Optional[int] = Query(None, ge=0), user: User = Depends(get_current_user)):
+    """Workouts (with exercises) and analyses created, updated or deleted after version `since`.
+
+    Without `since`, or with a version this server does not know, returns
+    only the current version with `reset` set: load the data in full, then
+    sync from that version. Answers If-None-Match with 304 while nothing
+    changed.
+    """
+    async def build():
+        return dump_json(schemas.ChangeFeed, await fetch_changes(user.id, since)), {}
+
+    return await cached_response(request, user.id, build)
+
+
+@router.get("/changes/stream")
+async def workout_changes_stream(request: Request, since: int = Query(..., ge=0), user: User = Depends(get_current_user)):
+    """Server-sent `changes` events, each a /workouts/changes body, whenever the user's data changes.
+
+    Writes handled by this process are pushed at once; writes on other
+    workers are picked up every CHANGES_POLL_SECONDS, which also sends a
+    keep-alive comment.
+    """
+    async def events():
+        version = since
+        wake = changes.notifier.subscribe(user.id)
+        try:
+            while not await request.is_disconnected():
+                wake.clear()
+                feed = await fetch_changes(user.id, version)
+                if feed.get("reset") or feed["version"] != version:
+                    version = feed["version"]
+                    yield b"event: changes\ndata: " + dump_json(schemas.ChangeFeed, feed) + b"\n\n"
+                    if feed["has_more"]:
+                        continue
+                try:
+                    await asyncio.wait_for(wake.wait(), CHANGES_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            changes.notifier.unsubscribe(user.id, wake)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/records", response_model=List[schemas.ExerciseRecord])
+async def personal_records(request: Request, user: User = Depends(get_current_user)):
+    """Best weight, best estimated 1RM (Epley), total volume and last session per exercise."""
+    async def build():
+        res = await db.records.for_user(user.id)
+        if res.error:
+            logger.error("Supabase records error: %s", res.error)
+            raise HTTPException(status_code=400, detail="Failed to retrieve records")
+        return dump_json(schemas.ExerciseRecord, res.data), {}
+
+    return await cached_response(request, user.id, build)
+
+
+@router.get("/progression/{exercise}", response_model=schemas.Progression)
+async def exercise_progression(exercise: str, request: Request, user: User = Depends(get_current_user)):
+    """Per-session best weight, estimated 1RM and volume for one exercise, oldest first."""
+    async def build():
+        res = await db.records.progression(user.id, exercise)
+        if res.error:
+            logger.error("Supabase progression error: %s", res.error)
+            raise HTTPException(status_code=400, detail="Failed to retrieve progression")
+        if not res.data:
+            raise HTTPException(status_code=404, detail="No sessions for this exercise")
+        return dump_json(schemas.Progression, {"exercise": records.exercise_key(exercise), "points": res.data}), {}
+
+    return await cached_response(request, user.id, build)
 
 
 @router.get("/{workout_id}", response_model=schemas.Workout)
-def get_workout(workout_id: str, user: User = Depends(get_current_user)):
-    res = (
-        supabase.table("workouts").select("*, exercises(*)").eq("id", workout_id).eq("user_id", user.id)
-    ).execute()
-    if res.error:
-        logger = logging.getLogger(__name__)
-        logger.error("Supabase get workout error: %s", res.error)
-        raise HTTPException(status_code=400, detail="Failed to retrieve workout")
-    if not res.data:
-        raise HTTPException(status_code=404, detail="Workout not found")
-    return res.data[0]
+async def get_workout(workout_id: str, request: Request, user: User = Depends(get_current_user)):
+    async def build():
+        res = await db.workouts.get(workout_id, user.id)
+        if res.error:
+            logger.error("Supabase get workout error: %s", res.error)
+            raise HTTPException(status_code=400, detail="Failed to retrieve workout")
+        if not res.data:
+            raise HTTPException(status_code=404, detail="Workout not found")
+        return dump_json(schemas.Workout, res.data[0]), {}
+
+    return await cached_response(request, user.id, build)
 
 
 @router.delete("/{workout_id}", status_code=204)
-def delete_workout(workout_id: str, user: User = Depends(get_current_user)):
-    res = (
-        supabase.table("workouts").delete().eq("id", workout_id).eq("user_id", user.id).execute()
-    )
+async def delete_workout(workout_id: str, user: User = Depends(get_current_user)):
+    res = await db.workouts.delete(workout_id, user.id)
     if res.error:
-        logger = logging.getLogger(__name__)
         logger.error("Supabase delete workout error: %s", res.error)
         raise HTTPException(status_code=400, detail="Failed to delete workout")
     if not res.data:
         raise HTTPException(status_code=404, detail="Workout not found or already deleted")
+    # its analysis goes too (a cascade in Postgres and SQLite), so clients drop both
+    await run_in_threadpool(changes.record, user.id, "analysis", "delete", [workout_id])
+    await run_in_threadpool(changes.record, user.id, "workout", "delete", [workout_id])
+    try:
+        await run_in_threadpool(records.remove_workout, user.id, workout_id)
+    except records.RecordsError:
+        logger.exception("Records index update failed for user %s", user.id)
+    # after the records, so a read in between cannot cache old ones under the new version
+    response_cache.invalidate(user.id)
     return Response(status_code=204)
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "1024"))
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", str(24 * 3600)))
+# also look up / store the hash on ai_analyses.input_hash (needs that column)
+AI_CACHE_PERSIST = os.getenv("AI_CACHE_PERSIST", "").lower() in ("1", "true", "yes")
+
+
+def payload_key(payload: Any, prompt_version: str) -> str:
+    """Canonical content hash of a model input and the prompt version that renders it."""
+    if isinstance(payload, dict) and isinstance(payload.get("exercises"), list):
+        payload = {**payload, "exercises": sorted(payload["exercises"], key=lambda e: str(e.get("id")))}
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{prompt_version}\n{canonical}".encode()).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe LRU with per-entry TTL that coalesces concurrent misses.
+
+    While one caller computes a key, later callers for the same key wait on
+    its result instead of issuing their own model call. Failures are not cached.
+    """
+
+    def __init__(self, maxsize: int = AI_CACHE_SIZE, ttl: float = AI_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._ainflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._set(key, value)
+
+    def _set(self, key: str, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def record_hit(self, n: int = 1):
+        """Count hits served outside aget_or_compute (e.g. from stored analyses)."""
+        with self._lock:
+            self.hits += n
+
+    def record_miss(self, n: int = 1):
+        with self._lock:
+            self.misses += n
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for `key`, or `await compute()`; concurrent callers await one task."""
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            fut = self._ainflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                fut = self._ainflight[key] = asyncio.ensure_future(self._afill(key, compute))
+        return await asyncio.shield(fut)
+
+    async def _afill(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._ainflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "size": len(self._data),
+                "inflight": len(self._ainflight),
+            }
+
+
+analysis_cache = TTLCache()
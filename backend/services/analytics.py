@@ -0,0 +1,73 @@
+import datetime
+from typing import Dict, List
+
+BUCKETS = ("day", "week", "month")
+
+
+def _bucket_start(day: str, bucket: str) -> str:
+    """ISO start of the day/week (Monday)/month containing `day`."""
+    d = datetime.date.fromisoformat(day[:10])
+    if bucket == "week":
+        d -= datetime.timedelta(days=d.weekday())
+    elif bucket == "month":
+        d = d.replace(day=1)
+    return d.isoformat()
+
+
+def compute_stats(workouts: List[dict], analyses: List[dict], bucket: str = "week") -> Dict[str, list]:
+    """Aggregate chart data for the dashboard.
+
+    `workouts` are rows with `id`, `date` and embedded `exercises`
+    (`sets`, `reps`, `weight_kg`, `muscle_group`); `analyses` are rows with
+    `workout_id` and `overall_score`. One pass over the exercises; bucket
+    starts are computed once per distinct date. Rows must carry every
+    selected key, as PostgREST projections do.
+    """
+    starts: Dict[str, str] = {}
+    period_of: Dict[str, str] = {}
+    volume: Dict[str, float] = {}
+    sessions: Dict[str, int] = {}
+    # muscle group -> [volume, exercises]; a missing group is reported as ""
+    groups: Dict[str, list] = {}
+    for w in workouts:
+        day = w.get("date")
+        if not day:
+            continue
+        day = str(day)
+        period = starts.get(day)
+        if period is None:
+            period = starts[day] = _bucket_start(day, bucket)
+        period_of[w["id"]] = period
+        total = 0.0
+        for ex in w.get("exercises") or ():
+            v = (ex["sets"] or 0) * (ex["reps"] or 0) * (ex["weight_kg"] or 0)
+            total += v
+            name = ex["muscle_group"] or ""
+            entry = groups.get(name)
+            if entry is None:
+                groups[name] = [v, 1]
+            else:
+                entry[0] += v
+                entry[1] += 1
+        volume[period] = volume.get(period, 0.0) + total
+        sessions[period] = sessions.get(period, 0) + 1
+
+    volume_series = [{"period": p, "volume": float(volume[p]), "workouts": sessions[p]} for p in sorted(volume)]
+    muscle_groups = [
+        {"muscle_group": g, "volume": float(groups[g][0]), "exercises": groups[g][1]} for g in sorted(groups)
+    ]
+
+    scores: Dict[str, list] = {}
+    for a in analyses:
+        period = period_of.get(a.get("workout_id"))
+        score = a.get("overall_score")
+        if period is None or score is None:
+            continue
+        entry = scores.get(period)
+        if entry is None:
+            scores[period] = [score, 1]
+        else:
+            entry[0] += score
+            entry[1] += 1
+    score_trend = [{"period": p, "overall_score": round(t / c, 2)} for p, (t, c) in sorted(scores.items())]
+    return {"volume": volume_series, "muscle_groups": muscle_groups, "score_trend": score_trend}
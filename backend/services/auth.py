@@ -1,11 +1,28 @@
 import os
-from typing import Optional
-from jose import jwt, JWTError, ExpiredSignatureError
-from fastapi import HTTPException, Header
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from fastapi import HTTPException, Header, Request
 from pydantic import BaseModel
 
+from .registry import registry
+
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 ALGORITHM = "HS256"  # Supabase default
+# verified tokens kept so repeat requests skip the HMAC check
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+# upper bound for tokens without an exp claim
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+
+
+def _load_jose():
+    # jose.jwt pulls in the crypto backends; only needed once a secret is configured
+    import jose.jwt
+    return jose
+
+
+registry.register("jose", _load_jose, warm=bool(SUPABASE_JWT_SECRET))
 
 
 class User(BaseModel):
@@ -13,6 +30,43 @@ class User(BaseModel):
     email: Optional[str] = None
 
 
+class TokenCache:
+    """Bounded LRU of verified tokens; an entry is dropped once its token's exp passes."""
+
+    def __init__(self, maxsize: int = AUTH_TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[User]:
+        with self._lock:
+            entry = self._data.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[token]
+                return None
+            self._data.move_to_end(token)
+            return entry[1]
+
+    def put(self, token: str, user: User, exp: Optional[float]):
+        expires = time.time() + AUTH_TOKEN_CACHE_TTL
+        if exp is not None:
+            expires = min(expires, float(exp))
+        with self._lock:
+            self._data[token] = (expires, user)
+            self._data.move_to_end(token)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+token_cache = TokenCache()
+
+
 def decode_token(authorization: str) -> User | None:
     """Return User object or None if dummy or unconfigured."""
     scheme, _, token = authorization.partition(" ")
@@ -22,23 +76,35 @@ def decode_token(authorization: str) -> User | None:
         if token == "dummy":
             return User(id="guest", email="guest@local")
         return User(id=token)
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    jose = registry.get("jose")
     try:
-        payload = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=[ALGORITHM])
+        payload = jose.jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         email = payload.get("email")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token payload")
-        return User(id=user_id, email=email)
-    except ExpiredSignatureError:
+        user = User(id=user_id, email=email)
+        token_cache.put(token, user, payload.get("exp"))
+        return user
+    except jose.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except JWTError:
+    except jose.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-def get_current_user(authorization: Optional[str] = Header(None)) -> User:
+def get_current_user(request: Request, authorization: Optional[str] = Header(None)) -> User:
+    # another dependency on this request already decoded the header;
+    # the request log also reads the user from here
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
     user = decode_token(authorization)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
+    request.state.user = user
     return user
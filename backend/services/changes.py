@@ -0,0 +1,124 @@
+"""Per-user change log behind delta sync (GET /workouts/changes).
+
+Every write appends one row per touched entity to `workout_changes`:
+(user_id, seq, kind, entity_id, op). `seq` is the user's version, numbered
+1, 2, 3... per user; (user_id, seq) is unique, so two workers that pick
+the same number collide and the loser reads the latest number again.
+
+kind is "workout" (exercises are part of their workout and travel with it)
+or "analysis" (keyed by workout id); op is "upsert" or "delete". Deleting
+a workout logs a tombstone for its analysis as well as for the workout.
+"""
+import os
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from .supabase_client import supabase
+
+CHANGES_TABLE = "workout_changes"
+# attempts to claim the next sequence numbers when another worker races us
+CHANGES_WRITE_ATTEMPTS = int(os.getenv("CHANGES_WRITE_ATTEMPTS", "5"))
+
+logger = logging.getLogger(__name__)
+
+# a fixed set of locks serialising one user's writers within this process
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _user_lock(user_id: str) -> threading.Lock:
+    return _locks[hash(user_id) % len(_locks)]
+
+
+class ChangesError(Exception):
+    pass
+
+
+def latest_version(user_id: str) -> int:
+    res = supabase.table(CHANGES_TABLE).select("seq").eq("user_id", user_id).order("seq", desc=True).limit(1).execute()
+    if res.error:
+        raise ChangesError(f"read version: {res.error}")
+    return res.data[0]["seq"] if res.data else 0
+
+
+def record(user_id: str, kind: str, op: str, entity_ids: List[str]) -> Optional[int]:
+    """Log `op` on each entity and wake this process's open streams; returns the new version.
+
+    Call it before invalidating the response cache, so a cached change feed
+    never misses the write. Failures are logged, not raised: the data
+    write itself has already succeeded.
+    """
+    if not entity_ids:
+        return None
+    try:
+        with _user_lock(user_id):
+            for _ in range(CHANGES_WRITE_ATTEMPTS):
+                base = latest_version(user_id)
+                rows = [
+                    {"user_id": user_id, "seq": base + i, "kind": kind, "entity_id": entity_id, "op": op}
+                    for i, entity_id in enumerate(entity_ids, 1)
+                ]
+                res = supabase.table(CHANGES_TABLE).insert(rows).execute()
+                if not res.error:
+                    break
+                # most likely another worker took these numbers
+                logger.warning("Change log write for user %s failed, retrying: %s", user_id, res.error)
+            else:
+                raise ChangesError(f"insert changes: {res.error}")
+    except ChangesError:
+        logger.exception("Change log update failed for user %s", user_id)
+        return None
+    notifier.notify(user_id)
+    return rows[-1]["seq"]
+
+
+def collapse(rows: List[dict]) -> Dict[tuple, str]:
+    """(kind, entity_id) -> last op, in order of each entity's last change."""
+    last: Dict[tuple, str] = {}
+    for row in rows:
+        key = (row["kind"], row["entity_id"])
+        last.pop(key, None)
+        last[key] = row["op"]
+    return last
+
+
+class ChangeNotifier:
+    """Wakes a user's open change streams in this process when a change is recorded.
+
+    Changes made by other workers are only seen by the streams' periodic poll.
+    """
+
+    def __init__(self):
+        # user_id -> {event: loop the stream waits on}
+        self._waiters: Dict[str, dict] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: str) -> asyncio.Event:
+        event = asyncio.Event()
+        with self._lock:
+            self._waiters[user_id][event] = asyncio.get_running_loop()
+        return event
+
+    def unsubscribe(self, user_id: str, event: asyncio.Event):
+        with self._lock:
+            waiters = self._waiters.get(user_id)
+            if waiters is not None:
+                waiters.pop(event, None)
+                if not waiters:
+                    del self._waiters[user_id]
+
+    def notify(self, user_id: str):
+        # record() runs on the event loop or in a threadpool thread
+        with self._lock:
+            events = list(self._waiters.get(user_id, {}).items())
+        for event, loop in events:
+            loop.call_soon_threadsafe(event.set)
+
+    def streams(self) -> int:
+        with self._lock:
+            return sum(len(w) for w in self._waiters.values())
+
+
+notifier = ChangeNotifier()
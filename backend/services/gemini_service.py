@@ -1,72 +1,374 @@
 import os
 import json
+import asyncio
 import logging
-from google import generativeai
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import httpx
 
 GEMINI_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_KEY:
-    generativeai.configure(api_key=GEMINI_KEY)
-else:
-    # no key -- analysis will be stubbed
-    pass
 
 MODEL = "gemini-1.5-flash"
+# bump whenever a prompt template changes so cached analyses are not reused
+PROMPT_VERSION = "2"
+
+# async REST transport; point GEMINI_API_BASE at a local fake for load tests
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+# deadline for one model operation, retries and the strict-prompt retry included
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+# cap on a single model request within that deadline
+GEMINI_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("GEMINI_ATTEMPT_TIMEOUT_SECONDS", "15"))
+# extra attempts after a timeout, connection error, 429 or 5xx, with jittered exponential backoff
+GEMINI_RETRIES = int(os.getenv("GEMINI_RETRIES", "2"))
+GEMINI_BACKOFF_SECONDS = float(os.getenv("GEMINI_BACKOFF_SECONDS", "0.5"))
+GEMINI_BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "8"))
+# consecutive failed requests that open the circuit, and how long it stays open
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+# send a second, identical request when the first has not answered after this long (0 = off)
+GEMINI_HEDGE_AFTER_SECONDS = float(os.getenv("GEMINI_HEDGE_AFTER_SECONDS", "0"))
+# cap on model calls in flight across the whole process
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_ENABLED = bool(GEMINI_KEY or os.getenv("GEMINI_API_BASE"))
+# workouts packed into one model call by the batch analysis
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "10"))
 
 logger = logging.getLogger(__name__)
 
 
 from ..models.schemas import AIResponse
+from .ai_cache import analysis_cache, payload_key
+from .metrics import time_gemini
+from .registry import registry
+from .resilience import CircuitBreaker, CircuitOpen, ResilientCaller, deadline
+from .prompt_encoding import encode_history, encode_workout
 
-def analyze_workout(workout_payload: dict) -> dict:
-    """Send workout data to Gemini and parse the expected JSON response."""
-    prompt_template = (
-        "You are an expert personal fitness coach. Analyze this workout and respond ONLY with valid JSON matching this exact schema: "
-        "{ summary: string, strengths: string[], improvements: string[], next_session_tips: string, overall_score: number between 1 and 10 }. "
-        "Workout data: {workout_json}"
-    )
-    prompt = prompt_template.replace("{workout_json}", json.dumps(workout_payload))
-
-    if not GEMINI_KEY:
-        # return dummy analysis
-        return {
-            "summary": "No AI key configured",
-            "strengths": [],
-            "improvements": [],
-            "next_session_tips": "",
-            "overall_score": 5,
-        }
-    for attempt in range(2):
+ANALYSIS_PROMPT = (
+    "You are an expert personal fitness coach. Analyze this workout and respond ONLY with valid JSON matching this exact schema: "
+    "{ summary: string, strengths: string[], improvements: string[], next_session_tips: string, overall_score: number between 1 and 10 }. "
+    "Workout (pipe-separated table, exercises indented under their session):\n{workout}"
+)
+STRICT_ANALYSIS_PROMPT = (
+    "You are an expert personal fitness coach. Respond ONLY with valid JSON exactly matching schema below. "
+    "Do not include any additional text. Schema: { summary: string, strengths: string[], improvements: string[], next_session_tips: string, overall_score: number between 1 and 10 }. "
+    "Workout (pipe-separated table, exercises indented under their session):\n{workout}"
+)
+BATCH_ANALYSIS_PROMPT = (
+    "You are an expert personal fitness coach. Analyze each workout below on its own and respond ONLY with a JSON object "
+    "mapping the id on each workout's `## id` line to an analysis matching this exact schema: "
+    "{ summary: string, strengths: string[], improvements: string[], next_session_tips: string, overall_score: number between 1 and 10 }. "
+    "Workouts (pipe-separated tables, exercises indented under their session):\n{workouts}"
+)
+STRICT_BATCH_ANALYSIS_PROMPT = (
+    "You are an expert personal fitness coach. Respond ONLY with a valid JSON object with exactly one key per workout id below "
+    "(the `## id` lines), each mapped to an object exactly matching the schema below. Do not include any additional text. "
+    "Schema: { summary: string, strengths: string[], improvements: string[], next_session_tips: string, overall_score: number between 1 and 10 }. "
+    "Workouts (pipe-separated tables, exercises indented under their session):\n{workouts}"
+)
+SUMMARY_PROMPT = (
+    "You are a personal fitness coach. Given the following last 7 days of workouts (including exercises), write a concise weekly progress narrative. "
+    "Workout history (pipe-separated table, exercises indented under their session):\n{history}"
+)
+DUMMY_ANALYSIS = {
+    "summary": "No AI key configured",
+    "strengths": [],
+    "improvements": [],
+    "next_session_tips": "",
+    "overall_score": 5,
+}
+DUMMY_SUMMARY = "No AI key configured, unable to generate summary."
+
+
+def _parse_analysis(text: str) -> dict:
+    # parse JSON out of text
+    result = json.loads(text)
+    # validate
+    AIResponse(**result)
+    return result
+
+
+def analysis_prompt(workout_payload: dict, strict: bool = False) -> str:
+    template = STRICT_ANALYSIS_PROMPT if strict else ANALYSIS_PROMPT
+    return template.replace("{workout}", encode_workout(workout_payload))
+
+
+def batch_analysis_prompt(workout_payloads: List[dict], strict: bool = False) -> str:
+    # short positional ids cost fewer tokens than uuids and are hard to garble
+    template = STRICT_BATCH_ANALYSIS_PROMPT if strict else BATCH_ANALYSIS_PROMPT
+    blocks = "\n".join(f"## w{i}\n{encode_workout(p)}" for i, p in enumerate(workout_payloads, 1))
+    return template.replace("{workouts}", blocks)
+
+
+def _parse_batch(text: str, count: int) -> Dict[int, dict]:
+    """Valid analyses by position in the batch; malformed or missing items are left out."""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    parsed = {}
+    for i in range(count):
+        item = data.get(f"w{i + 1}")
         try:
-            resp = generativeai.responses.create(
-                model=MODEL,
-                input=prompt,
+            AIResponse(**item)
+        except (TypeError, ValueError):
+            continue
+        parsed[i] = item
+    return parsed
+
+
+def degraded_summary(workouts_payload: list) -> str:
+    """A plain weekly summary computed locally, served while the model is unavailable."""
+    exercises = [ex for w in workouts_payload for ex in (w.get("exercises") or [])]
+    volume = sum((ex.get("sets") or 0) * (ex.get("reps") or 0) * (ex.get("weight_kg") or 0) for ex in exercises)
+    groups = sorted({ex["muscle_group"] for ex in exercises if ex.get("muscle_group")})
+    text = (
+        f"AI coaching is temporarily unavailable. This week: {len(workouts_payload)} sessions, "
+        f"{len(exercises)} exercises, {volume:,.0f} kg total volume"
+    )
+    return text + (f" ({', '.join(groups)})." if groups else ".")
+
+
+def summary_prompt(workouts_payload: list) -> str:
+    return SUMMARY_PROMPT.replace("{history}", encode_history(workouts_payload))
+
+
+def _transient(e: BaseException) -> bool:
+    # timeouts are always retried; these are the other errors worth another attempt
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+# one breaker for every model call, REST and streaming
+breaker = CircuitBreaker("gemini", GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET_SECONDS)
+caller = ResilientCaller(
+    "gemini", _transient, GEMINI_ATTEMPT_TIMEOUT_SECONDS, GEMINI_RETRIES,
+    GEMINI_BACKOFF_SECONDS, GEMINI_BACKOFF_MAX_SECONDS, breaker, GEMINI_HEDGE_AFTER_SECONDS,
+)
+
+
+def analysis_key(workout_payload: dict) -> str:
+    return payload_key(workout_payload, f"{MODEL}:{PROMPT_VERSION}")
+
+
+# --- async API -------------------------------------------------------------
+# Model calls go over httpx, so slow generations wait on the event loop
+# rather than holding Starlette threadpool workers.
+
+_client: Optional[httpx.AsyncClient] = None
+# in-process transport (e.g. over benchmarks/fake_gemini.py) instead of the network
+_transport: Optional[httpx.AsyncBaseTransport] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_inflight: Dict[str, "asyncio.Future[Any]"] = {}
+_client_lock = threading.Lock()
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.AsyncClient(
+                    base_url=GEMINI_API_BASE,
+                    transport=_transport,
+                    headers={"x-goog-api-key": GEMINI_KEY or ""},
+                    limits=httpx.Limits(max_connections=GEMINI_MAX_CONCURRENCY, max_keepalive_connections=GEMINI_MAX_CONCURRENCY),
+                )
+    return _client
+
+
+# building the client loads the TLS trust store and the HTTP/2 modules (~200 ms);
+# warm-up does that in the threadpool instead of the first AI request on the event loop
+registry.register("gemini_http", _get_client, warm=GEMINI_ENABLED)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def use_transport(transport: Optional[httpx.AsyncBaseTransport]):
+    """Send the async model calls through `transport`, e.g. httpx.ASGITransport(fake_gemini.make_app())."""
+    global _transport
+    await aclose()
+    _transport = transport
+
+
+async def generate(prompt: str, timeout: Optional[float] = None) -> str:
+    """One generateContent answer, through the retrying, circuit-breaking `caller`.
+
+    Each request holds a slot of the global semaphore. `timeout` (default
+    GEMINI_TIMEOUT_SECONDS, or the enclosing deadline if sooner) bounds the
+    whole call: slot waits, requests, backoff sleeps and hedges. Raises
+    asyncio.TimeoutError past it and CircuitOpen while the model is
+    considered down.
+    """
+    async def attempt(limit: float) -> str:
+        async with _get_semaphore():
+            resp = await _get_client().post(
+                f"/models/{MODEL}:generateContent",
+                json={"contents": [{"parts": [{"text": prompt}]}]},
+                timeout=limit,
             )
-            text = resp.output[0].content[0].text
-            # parse JSON out of text
-            result = json.loads(text)
-            # validate
-            AIResponse(**result)
-            return result
-        except Exception as e:
-            logger.exception("Error parsing or validating Gemini response, attempt %s", attempt)
-            if attempt == 0:
-                # tighten prompt
-                prompt = (
-                    "You are an expert personal fitness coach. Respond ONLY with valid JSON exactly matching schema below. "
-                    "Do not include any additional text. Schema: { summary: string, strengths: string[], improvements: string[], next_session_tips: string, overall_score: number between 1 and 10 }. "
-                    "Workout data: {workout_json}"
-                ).replace("{workout_json}", json.dumps(workout_payload))
-                continue
-            # if validation still fails, propagate
-            raise
-
-
-def weekly_summary(workouts_payload: list) -> str:
-    prompt = (
-        "You are a personal fitness coach. Given the following last 7 days of workouts (including exercises), write a concise weekly progress narrative. "
-        "Workout history: {history}"
-    ).replace("{history}", json.dumps(workouts_payload))
-    if not GEMINI_KEY:
-        return "No AI key configured, unable to generate summary."
-    resp = generativeai.responses.create(model=MODEL, input=prompt)
-    return resp.output[0].content[0].text
+            resp.raise_for_status()
+            return resp.json()["candidates"][0]["content"]["parts"][0]["text"]
+
+    with deadline(timeout or GEMINI_TIMEOUT_SECONDS), time_gemini("generate"):
+        return await caller.call(attempt)
+
+
+async def coalesce(key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """Run factory() once for concurrent callers sharing `key`; all of them get its result."""
+    fut = _inflight.get(key)
+    if fut is not None:
+        return await asyncio.shield(fut)
+    fut = asyncio.ensure_future(factory())
+    _inflight[key] = fut
+    fut.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(fut)
+
+
+async def analyze_workout_async(workout_payload: dict) -> dict:
+    if not GEMINI_ENABLED:
+        return dict(DUMMY_ANALYSIS)
+    prompt = analysis_prompt(workout_payload)
+    # one deadline for both prompts
+    with deadline(GEMINI_TIMEOUT_SECONDS):
+        for attempt in range(2):
+            try:
+                return _parse_analysis(await generate(prompt))
+            except (ValueError, TypeError):
+                logger.exception("Error parsing or validating Gemini response, attempt %s", attempt)
+                if attempt == 0:
+                    # tighten prompt
+                    prompt = analysis_prompt(workout_payload, strict=True)
+                    continue
+                raise
+
+
+async def analyze_workout_cached_async(workout_payload: dict, key: Optional[str] = None) -> dict:
+    key = key or analysis_key(workout_payload)
+    return await analysis_cache.aget_or_compute(key, lambda: analyze_workout_async(workout_payload))
+
+
+async def _analyze_chunk(payloads: List[dict]) -> List[Optional[dict]]:
+    """One model call for the chunk, then one strict retry of only the items that came back malformed."""
+    results: List[Optional[dict]] = [None] * len(payloads)
+    pending = list(range(len(payloads)))
+    with deadline(GEMINI_TIMEOUT_SECONDS):
+        for attempt in range(2):
+            prompt = batch_analysis_prompt([payloads[i] for i in pending], strict=attempt > 0)
+            parsed = _parse_batch(await generate(prompt), len(pending))
+            for j, item in parsed.items():
+                results[pending[j]] = item
+            pending = [i for j, i in enumerate(pending) if j not in parsed]
+            if not pending:
+                break
+            logger.warning("Batch analysis: %s of %s items malformed, attempt %s", len(pending), len(payloads), attempt)
+    return results
+
+
+async def analyze_workouts_async(workout_payloads: List[dict], keys: Optional[List[str]] = None) -> List[Optional[dict]]:
+    """Analyses for many workouts, AI_BATCH_SIZE workouts per model call, in input order.
+
+    Each item goes through analysis_cache on its own. None marks a workout
+    the model did not return a valid analysis for, or whose call failed.
+    """
+    if not GEMINI_ENABLED:
+        return [dict(DUMMY_ANALYSIS) for _ in workout_payloads]
+    keys = keys or [analysis_key(p) for p in workout_payloads]
+    results = [analysis_cache.get(k) for k in keys]
+    todo = [i for i, r in enumerate(results) if r is None]
+    analysis_cache.record_hit(len(results) - len(todo))
+    analysis_cache.record_miss(len(todo))
+    chunks = [todo[i:i + AI_BATCH_SIZE] for i in range(0, len(todo), AI_BATCH_SIZE)]
+    outcomes = await asyncio.gather(
+        *(_analyze_chunk([workout_payloads[i] for i in chunk]) for chunk in chunks), return_exceptions=True
+    )
+    for chunk, out in zip(chunks, outcomes):
+        if isinstance(out, CircuitOpen):
+            logger.warning("Batch analysis skipped for %s workouts: %s", len(chunk), out)
+            continue
+        if isinstance(out, BaseException):
+            logger.error("Batch analysis call failed for %s workouts: %r", len(chunk), out)
+            continue
+        for i, item in zip(chunk, out):
+            if item is not None:
+                analysis_cache.set(keys[i], item)
+                results[i] = item
+    return results
+
+
+async def weekly_summary_async(workouts_payload: list) -> str:
+    if not GEMINI_ENABLED:
+        return DUMMY_SUMMARY
+    prompt = summary_prompt(workouts_payload)
+    key = payload_key(prompt, f"summary:{MODEL}:{PROMPT_VERSION}")
+    return await coalesce(key, lambda: generate(prompt))
+
+
+async def stream_generate(prompt: str) -> AsyncIterator[str]:
+    """Yield text chunks from streamGenerateContent as the model produces them.
+
+    Holds a concurrency slot for the whole stream; GEMINI_TIMEOUT_SECONDS
+    bounds the wait for a slot and every gap between chunks. Goes through
+    the circuit breaker but is not retried: text may already have reached
+    the client.
+    """
+    breaker.before_call()
+    try:
+        await asyncio.wait_for(_get_semaphore().acquire(), GEMINI_TIMEOUT_SECONDS)
+    except BaseException:
+        breaker.abandoned()
+        raise
+    try:
+        with time_gemini("stream"):
+            async with _get_client().stream(
+                "POST",
+                f"/models/{MODEL}:streamGenerateContent",
+                params={"alt": "sse"},
+                json={"contents": [{"parts": [{"text": prompt}]}]},
+                timeout=GEMINI_TIMEOUT_SECONDS,
+            ) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = json.loads(line[5:])
+                    for part in chunk["candidates"][0]["content"]["parts"]:
+                        if part.get("text"):
+                            yield part["text"]
+    except Exception as e:
+        if isinstance(e, asyncio.TimeoutError) or _transient(e):
+            breaker.failure()
+        else:
+            breaker.success()
+        raise
+    except BaseException:
+        # client went away mid-stream
+        breaker.abandoned()
+        raise
+    else:
+        breaker.success()
+    finally:
+        _get_semaphore().release()
+
+
+async def weekly_summary_stream(workouts_payload: list) -> AsyncIterator[str]:
+    if not GEMINI_ENABLED:
+        yield DUMMY_SUMMARY
+        return
+    prompt = summary_prompt(workouts_payload)
+    async for text in stream_generate(prompt):
+        yield text
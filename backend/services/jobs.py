@@ -0,0 +1,276 @@
+import os
+import json
+import uuid
+import asyncio
+import logging
+import sqlite3
+import datetime
+import itertools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "4"))
+AI_JOB_QUEUE_SIZE = int(os.getenv("AI_JOB_QUEUE_SIZE", "100"))
+# "memory" keeps job state in-process, "sqlite" persists it to AI_JOB_DB
+AI_JOB_BACKEND = os.getenv("AI_JOB_BACKEND", "memory")
+AI_JOB_DB = os.getenv("AI_JOB_DB", "jobs.sqlite3")
+# finished jobs are kept this long for pollers, then deleted
+AI_JOB_TTL_SECONDS = float(os.getenv("AI_JOB_TTL_SECONDS", "3600"))
+# queued or running jobs untouched this long belong to a process that died; marked failed
+AI_JOB_STALE_SECONDS = float(os.getenv("AI_JOB_STALE_SECONDS", "900"))
+AI_JOB_PRUNE_SECONDS = float(os.getenv("AI_JOB_PRUNE_SECONDS", "300"))
+
+FINISHED = ("done", "failed")
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat()
+
+
+def _ago(seconds: float) -> str:
+    return (datetime.datetime.utcnow() - datetime.timedelta(seconds=seconds)).isoformat()
+
+
+STALE_ERROR = "Interrupted before it finished, retry the analysis"
+
+
+class MemoryJobStore:
+    # only touches memory, so it is called on the event loop
+    blocking = False
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, updated_at=_now())
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def prune(self, finished_before: str, stale_before: str) -> int:
+        """Delete finished jobs last updated before `finished_before` and fail unfinished ones idle since `stale_before`."""
+        now = _now()
+        with self._lock:
+            expired = [k for k, j in self._jobs.items() if j["status"] in FINISHED and j["updated_at"] < finished_before]
+            for k in expired:
+                del self._jobs[k]
+            for job in self._jobs.values():
+                if job["status"] not in FINISHED and job["updated_at"] < stale_before:
+                    job.update(status="failed", error=STALE_ERROR, updated_at=now)
+        return len(expired)
+
+
+class SQLiteJobStore:
+    """Job state in a local SQLite file so every worker process on the host can poll it."""
+
+    # file I/O, so calls go through the threadpool
+    blocking = True
+
+    def __init__(self, path: str = AI_JOB_DB):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_jobs ("
+            "id TEXT PRIMARY KEY, user_id TEXT, kind TEXT, target TEXT, priority INTEGER, status TEXT, "
+            "result TEXT, error TEXT, created_at TEXT, updated_at TEXT)"
+        )
+        self._lock = threading.Lock()
+
+    def create(self, job: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ai_jobs VALUES (:id, :user_id, :kind, :target, :priority, :status, NULL, NULL, :created_at, :updated_at)",
+                job,
+            )
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = _now()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], default=str)
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE ai_jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM ai_jobs WHERE id = ?", (job_id,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            job = dict(zip([c[0] for c in cur.description], row))
+        if job["result"]:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def prune(self, finished_before: str, stale_before: str) -> int:
+        now = _now()
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM ai_jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (finished_before,)
+            )
+            # rows left queued or running by a process that died or restarted
+            self._conn.execute(
+                "UPDATE ai_jobs SET status = 'failed', error = ?, updated_at = ? "
+                "WHERE status IN ('queued', 'running') AND updated_at < ?",
+                (STALE_ERROR, now, stale_before),
+            )
+        return cur.rowcount
+
+
+class JobQueue:
+    """Bounded priority queue drained by a fixed pool of asyncio workers.
+
+    Lower priority numbers run first; equal priorities run in submission
+    order. When the queue is full `submit` raises QueueFull so callers can
+    shed load instead of piling up work.
+
+    The queue itself lives in this process: jobs still queued or running
+    when it stops are marked failed by `prune` once they go stale, which
+    also runs at startup. Finished jobs are deleted after AI_JOB_TTL_SECONDS.
+    """
+
+    def __init__(self, store=None, workers: int = AI_JOB_WORKERS, maxsize: int = AI_JOB_QUEUE_SIZE):
+        self.store = store or (SQLiteJobStore() if AI_JOB_BACKEND == "sqlite" else MemoryJobStore())
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: list = []
+        self._seq = itertools.count()
+        self._changed: Dict[str, asyncio.Event] = {}
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue(self.maxsize)
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.ensure_future(self._pruner()))
+
+    async def start(self):
+        """Start the workers and clean up after an earlier run; called from the app's lifespan."""
+        self._start()
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _call(self, method: str, *args, **kwargs):
+        fn = getattr(self.store, method)
+        if self.store.blocking:
+            return await run_in_threadpool(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def prune(self) -> int:
+        return await self._call("prune", _ago(AI_JOB_TTL_SECONDS), _ago(AI_JOB_STALE_SECONDS))
+
+    async def _pruner(self):
+        while True:
+            try:
+                removed = await self.prune()
+                if removed:
+                    logger.info("Pruned %s finished AI jobs", removed)
+            except Exception:
+                logger.exception("AI job pruning failed")
+            await asyncio.sleep(AI_JOB_PRUNE_SECONDS)
+
+    async def submit(self, user_id: str, kind: str, target: str, run: Callable[[], Awaitable[Any]], priority: int = 5) -> dict:
+        self._start()
+        if self._queue.full():
+            raise QueueFull()
+        now = _now()
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "kind": kind,
+            "target": target,
+            "priority": priority,
+            "status": "queued",
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self._call("create", job)
+        try:
+            self._queue.put_nowait((priority, next(self._seq), job["id"], run))
+        except asyncio.QueueFull:
+            # filled up while the row was written
+            await self._call("update", job["id"], status="failed", error="Queue full")
+            raise QueueFull()
+        self._changed[job["id"]] = asyncio.Event()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self._call("get", job_id)
+
+    async def wait_for_change(self, job_id: str, timeout: float):
+        """Sleep until the job changes state in this process, or `timeout` elapses."""
+        event = self._changed.get(job_id)
+        if event is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        event.clear()
+
+    def _notify(self, job_id: str, finished: bool):
+        event = self._changed.get(job_id)
+        if event is not None:
+            event.set()
+            if finished:
+                # waiters already woken keep their reference
+                del self._changed[job_id]
+
+    async def _set(self, job_id: str, **fields):
+        await self._call("update", job_id, **fields)
+        self._notify(job_id, fields.get("status") in FINISHED)
+
+    async def _run(self, job_id: str, run: Callable[[], Awaitable[Any]]):
+        await self._set(job_id, status="running")
+        try:
+            result = await run()
+        except Exception as e:
+            logger.exception("AI job %s failed", job_id)
+            detail = getattr(e, "detail", None) or "AI service failed"
+            await self._set(job_id, status="failed", error=str(detail))
+            return
+        await self._set(job_id, status="done", result=result)
+
+    async def _worker(self):
+        while True:
+            _, _, job_id, run = await self._queue.get()
+            try:
+                await self._run(job_id, run)
+            except Exception:
+                # the store failed to record a state change; keep serving the queue
+                logger.exception("AI job %s: could not update its state", job_id)
+                try:
+                    await self._call("update", job_id, status="failed", error="Job state could not be saved")
+                except Exception:
+                    # left for prune to fail once it goes stale
+                    pass
+                self._notify(job_id, True)
+            finally:
+                self._queue.task_done()
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+job_queue = JobQueue()
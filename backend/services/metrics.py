@@ -0,0 +1,202 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# latency buckets in seconds, shared by every histogram
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by a fixed tuple of label values."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts (+Inf last), sum, count
+                series = self._series[labels] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for labels, counts, total, count in items:
+            base = _labels(self.labelnames, labels)
+            sep = "," if base else ""
+            running = 0
+            for bound, c in zip(BUCKETS + (float("inf"),), counts):
+                running += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {running}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from a callback at scrape time, or set with inc/dec."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float] = None, type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.type = type
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def render(self) -> List[str]:
+        value = self.fn() if self.fn else self.value
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", f"{self.name} {value}"]
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template, method and status.", ("route", "method", "status")
+)
+supabase_duration = Histogram(
+    "supabase_operation_duration_seconds", "Supabase query latency by table and operation.", ("table", "operation")
+)
+gemini_duration = Histogram(
+    "gemini_call_duration_seconds", "Gemini call latency by operation and outcome.", ("operation", "outcome")
+)
+requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+
+_histograms = [http_request_duration, supabase_duration, gemini_duration]
+_gauges: List[Gauge] = [requests_in_flight]
+
+
+def register_gauge(name: str, help: str, fn: Callable[[], float], type: str = "gauge"):
+    """Expose a value read at scrape time; use type="counter" for monotonically increasing ones."""
+    _gauges.append(Gauge(name, help, fn, type))
+
+
+@contextmanager
+def time_gemini(operation: str):
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except BaseException as e:
+        if e.__class__.__name__ in ("TimeoutError", "CancelledError"):
+            outcome = "timeout"
+        raise
+    finally:
+        gemini_duration.observe(time.perf_counter() - t0, operation, outcome)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _histograms + _gauges:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency and in-flight count.
+
+    Unlike BaseHTTPMiddleware it does not wrap the request or response
+    bodies; it only times the call and reads the status from the start message.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.dec()
+            route = scope.get("route")
+            # label by template, never by raw path, to keep cardinality bounded
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - t0, path, scope["method"], str(status))
+
+
+class InstrumentedClient:
+    """Wraps a supabase client (real or fake) so every execute() is timed per table and operation."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def table(self, name):
+        return _InstrumentedQuery(self._client.table(name), name, "select")
+
+
+_OPS = {"insert": "insert", "upsert": "upsert", "delete": "delete", "update": "update"}
+
+
+class _InstrumentedQuery:
+    def __init__(self, query, table: str, op: str):
+        self._query = query
+        self._table = table
+        self._op = op
+
+    def execute(self):
+        with supabase_duration.time(self._table, self._op):
+            return self._query.execute()
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+        op = _OPS.get(name, self._op)
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _InstrumentedQuery(result, self._table, op)
+            return result
+
+        return chained
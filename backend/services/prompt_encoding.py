@@ -0,0 +1,121 @@
+import os
+import math
+from collections import Counter
+from typing import Iterable, List, Optional
+
+# rough upper bound on prompt size for workout data, in tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# Gemini averages about four characters per token on English text
+CHARS_PER_TOKEN = 4
+# tokens kept back for the line summarising sessions that did not fit
+SUMMARY_RESERVE = 60
+
+WORKOUT_HEADER = "date | title | minutes | notes"
+EXERCISE_HEADER = "  exercise | muscle group | sets x reps | kg"
+LEGEND = f"{WORKOUT_HEADER}\n{EXERCISE_HEADER}"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# the legend and the summary line are sent whatever the budget
+MIN_PROMPT_TOKEN_BUDGET = estimate_tokens(LEGEND) + SUMMARY_RESERVE
+if PROMPT_TOKEN_BUDGET < MIN_PROMPT_TOKEN_BUDGET:
+    raise ValueError(f"PROMPT_TOKEN_BUDGET must be at least {MIN_PROMPT_TOKEN_BUDGET}, got {PROMPT_TOKEN_BUDGET}")
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    # keep user text on one line and out of the column separator
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def _row(*cells) -> str:
+    cells = [_cell(c) for c in cells]
+    while cells and not cells[-1]:
+        cells.pop()
+    return " | ".join(cells)
+
+
+def _exercise_line(ex: dict) -> str:
+    sets, reps = ex.get("sets"), ex.get("reps")
+    scheme = f"{sets or '?'}x{reps or '?'}" if sets or reps else None
+    return "  " + _row(ex.get("name"), ex.get("muscle_group"), scheme, ex.get("weight_kg"))
+
+
+def _workout_lines(workout: dict) -> List[str]:
+    head = _row(str(workout.get("date") or "")[:10], workout.get("title"), workout.get("duration_minutes"), workout.get("notes"))
+    return [head] + [_exercise_line(ex) for ex in workout.get("exercises") or []]
+
+
+def _fit(lines: List[str], budget: int) -> str:
+    """Join the lines, dropping trailing exercises (with a marker) until they fit in budget."""
+    text = "\n".join(lines)
+    if estimate_tokens(text) <= budget:
+        return text
+    keep = len(lines) - 1
+    while keep > 1:
+        keep -= 1
+        text = "\n".join(lines[:keep] + [f"  ... {len(lines) - keep} more exercises"])
+        if estimate_tokens(text) <= budget:
+            return text
+    return lines[0][: max(budget, 0) * CHARS_PER_TOKEN]
+
+
+def _volume(workout: dict) -> float:
+    return sum(
+        (ex.get("sets") or 0) * (ex.get("reps") or 0) * (ex.get("weight_kg") or 0) for ex in workout.get("exercises") or []
+    )
+
+
+def summarize_sessions(workouts: List[dict]) -> str:
+    """One line standing in for sessions that did not fit in the budget."""
+    dates = sorted(str(w.get("date") or "")[:10] for w in workouts)
+    groups = Counter(
+        ex.get("muscle_group") for w in workouts for ex in w.get("exercises") or [] if ex.get("muscle_group")
+    )
+    minutes = sum(w.get("duration_minutes") or 0 for w in workouts)
+    top = ", ".join(f"{g} {n}" for g, n in groups.most_common(5))
+    line = f"earlier: {len(workouts)} sessions {dates[0]}..{dates[-1]}, {minutes} min, volume {round(sum(map(_volume, workouts)))} kg"
+    return line + (f", exercises by group: {top}" if top else "")
+
+
+def encode_workout(workout: dict, budget: Optional[int] = None) -> str:
+    """Compact table of one workout: no ids, timestamps or empty fields."""
+    budget = budget or PROMPT_TOKEN_BUDGET
+    return LEGEND + "\n" + _fit(_workout_lines(workout), budget - estimate_tokens(LEGEND))
+
+
+def encode_history(workouts: Iterable[dict], budget: Optional[int] = None) -> str:
+    """Compact table of a workout history, oldest first, within `budget` tokens.
+
+    The most recent sessions are kept in full; once the budget runs out the
+    older ones are collapsed into a single summary line.
+    """
+    budget = (budget or PROMPT_TOKEN_BUDGET) - estimate_tokens(LEGEND)
+    ordered = sorted(workouts, key=lambda w: str(w.get("date") or ""), reverse=True)
+    if not ordered:
+        return "no workouts"
+    blocks: List[str] = []
+    used = 0
+    for i, workout in enumerate(ordered):
+        block = "\n".join(_workout_lines(workout))
+        cost = estimate_tokens(block) + 1
+        rest = budget - used - (SUMMARY_RESERVE if i < len(ordered) - 1 else 0)
+        if cost > rest:
+            if not blocks:
+                # a single oversized session is trimmed rather than dropped
+                block = _fit(_workout_lines(workout), rest)
+                blocks.append(block)
+                i += 1
+            older = ordered[i:]
+            if older:
+                blocks.append(summarize_sessions(older))
+            break
+        blocks.append(block)
+        used += cost
+    return LEGEND + "\n" + "\n".join(reversed(blocks))
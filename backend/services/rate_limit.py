@@ -0,0 +1,177 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Tuple
+from fastapi import Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from .auth import get_current_user, User
+
+# "memory" limits each process on its own; "sqlite" shares buckets between
+# every worker process on the host through RATE_LIMIT_DB
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "ratelimit.sqlite3")
+GUEST_RATE_LIMIT = os.getenv("GUEST_RATE_LIMIT", "10/minute")
+# per user, across every route that calls the model
+AI_RATE_LIMIT = os.getenv("AI_RATE_LIMIT", "20/minute")
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+# buckets idle this long are full again for any supported period and can be dropped
+IDLE_SECONDS = PERIODS["day"]
+PRUNE_EVERY = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+class Limit:
+    """A token bucket: `capacity` requests in a burst, refilled evenly over `period` seconds."""
+
+    def __init__(self, capacity: int, period: float):
+        if capacity < 1 or period <= 0:
+            raise ValueError("A rate limit needs a capacity of at least 1 and a positive period")
+        self.capacity = capacity
+        self.rate = capacity / period
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        # "10/minute", "100/hour"
+        count, _, period = spec.partition("/")
+        try:
+            return cls(int(count), PERIODS[period.strip().rstrip("s")])
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid rate limit {spec!r}")
+
+    def __repr__(self):
+        return f"Limit(capacity={self.capacity}, rate={self.rate:.4g}/s)"
+
+
+class MemoryBackend:
+    # take() only touches memory, so it runs on the event loop
+    blocking = False
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def _prune(self, now: float):
+        idle = [k for k, (_, updated) in self._buckets.items() if now - updated > IDLE_SECONDS]
+        for k in idle:
+            del self._buckets[k]
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        """Spend `cost` tokens; returns (allowed, tokens left or, if refused, seconds until allowed)."""
+        now = time.monotonic()
+        with self._lock:
+            self._calls += 1
+            if self._calls % PRUNE_EVERY == 0:
+                self._prune(now)
+            tokens, updated = self._buckets.get(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return False, (cost - tokens) / limit.rate
+            self._buckets[key] = (tokens - cost, now)
+            return True, tokens - cost
+
+
+class SQLiteBackend:
+    """Buckets in a WAL-mode SQLite file, updated with one atomic upsert per request."""
+
+    # take() may wait up to the busy timeout on another process's write
+    blocking = True
+
+    # refill and spend in a single statement, so concurrent processes never
+    # read-modify-write the same bucket; no row comes back when refused
+    TAKE = (
+        "INSERT INTO rate_buckets (key, tokens, updated) VALUES (:key, :capacity - :cost, :now) "
+        "ON CONFLICT(key) DO UPDATE SET "
+        "tokens = MIN(:capacity, tokens + (:now - updated) * :rate) - :cost, updated = :now "
+        "WHERE MIN(:capacity, tokens + (:now - updated) * :rate) >= :cost "
+        "RETURNING tokens"
+    )
+
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=1.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        # wall clock, since the buckets are shared between processes
+        params = {"key": key, "capacity": limit.capacity, "rate": limit.rate, "cost": cost, "now": time.time()}
+        with self._lock:
+            self._calls += 1
+            if self._calls % PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (params["now"] - IDLE_SECONDS,))
+            row = self._conn.execute(self.TAKE, params).fetchone()
+            if row is not None:
+                return True, row[0]
+            tokens, updated = self._conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+        tokens = min(limit.capacity, tokens + (params["now"] - updated) * limit.rate)
+        return False, (cost - tokens) / limit.rate
+
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend or (SQLiteBackend() if RATE_LIMIT_BACKEND == "sqlite" else MemoryBackend())
+        self.rejected = 0
+        self.errors = 0
+
+    def hit(self, scope: str, identity: str, limit: Limit, cost: float = 1):
+        """Raise 429 with Retry-After once `identity` has used up its bucket for `scope`.
+
+        Fails open: when the shared bucket store is unavailable (e.g. the
+        SQLite file stays locked past its busy timeout) the request is let
+        through and the error logged, rather than failing it with a 500.
+        """
+        try:
+            allowed, value = self.backend.take(f"{scope}:{identity}", limit, cost)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning("Rate limit check for %s skipped, bucket store unavailable: %s", scope, e)
+            return
+        if not allowed:
+            self.rejected += 1
+            retry_after = max(1, int(value + 0.999))
+            raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": str(retry_after)})
+
+    async def ahit(self, scope: str, identity: str, limit: Limit, cost: float = 1):
+        """hit() for async callers; a blocking backend runs in the threadpool."""
+        if self.backend.blocking:
+            await run_in_threadpool(self.hit, scope, identity, limit, cost)
+        else:
+            self.hit(scope, identity, limit, cost)
+
+
+rate_limiter = RateLimiter()
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def limit_per_ip(scope: str, spec: str):
+    """Route dependency limiting each client address to `spec` (e.g. "10/minute")."""
+    limit = Limit.parse(spec)
+
+    async def dependency(request: Request):
+        await rate_limiter.ahit(scope, client_ip(request), limit)
+
+    return dependency
+
+
+def limit_per_user(scope: str, spec: str):
+    """Route dependency limiting each authenticated user to `spec`."""
+    limit = Limit.parse(spec)
+
+    async def dependency(user: User = Depends(get_current_user)):
+        await rate_limiter.ahit(scope, user.id, limit)
+
+    return dependency
@@ -0,0 +1,265 @@
+"""Personal records and per-exercise progression, kept up to date on every write.
+
+Two tables back it, both keyed by `record_key` ("<user_id>:<exercise>",
+exercise names compared case- and space-insensitively):
+
+- exercise_progress: one row per exercise per workout (best set weight,
+  best estimated 1RM and volume of that session);
+- exercise_records: one row per exercise per user (max weight, best
+  estimated 1RM, total volume, sessions, last performed date).
+
+Inserted workouts are merged into the stored records incrementally. A
+delete subtracts the workout's session from each record and only reads an
+exercise's progress history again when the deleted session held one of
+its bests (max weight, best 1RM or the last performed date).
+
+Records carry a `revision`: every write is conditional on the revision it
+read (or on the unique record_key for a new record). A writer that lost
+to another worker recomputes that record from exercise_progress instead,
+so concurrent workers never overwrite or double-count each other's
+sessions. `rebuild` reconstructs both tables from workouts and exercises.
+"""
+import os
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from .supabase_client import supabase
+from .response_cache import response_cache
+
+PROGRESS_TABLE = "exercise_progress"
+RECORDS_TABLE = "exercise_records"
+# attempts to write a record while writers in other workers keep changing it
+RECORDS_WRITE_ATTEMPTS = int(os.getenv("RECORDS_WRITE_ATTEMPTS", "5"))
+
+logger = logging.getLogger(__name__)
+
+# a fixed set of locks serialising one user's writers within this process
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _user_lock(user_id: str) -> threading.Lock:
+    return _locks[hash(user_id) % len(_locks)]
+
+
+class RecordsError(Exception):
+    pass
+
+
+def exercise_key(name: str) -> str:
+    return " ".join(str(name or "").lower().split())
+
+
+def record_key(user_id: str, exercise: str) -> str:
+    return f"{user_id}:{exercise}"
+
+
+def estimated_1rm(weight_kg, reps) -> Optional[float]:
+    """Epley estimate; None without a weight and at least one rep."""
+    if not weight_kg or not reps:
+        return None
+    return round(weight_kg if reps == 1 else weight_kg * (1 + reps / 30), 2)
+
+
+def _max(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def _check(res, what: str):
+    if res.error:
+        raise RecordsError(f"{what}: {res.error}")
+    return res.data
+
+
+def progress_rows(user_id: str, workout: dict) -> List[dict]:
+    """One row per distinct exercise in the workout, aggregated over its sets."""
+    rows: Dict[str, dict] = {}
+    for ex in workout.get("exercises") or []:
+        key = exercise_key(ex.get("name"))
+        if not key:
+            continue
+        weight, sets, reps = ex.get("weight_kg"), ex.get("sets"), ex.get("reps")
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {
+                "record_key": record_key(user_id, key),
+                "user_id": user_id,
+                "workout_id": workout["id"],
+                "exercise": key,
+                "name": ex.get("name"),
+                "date": str(workout.get("date") or "")[:10] or None,
+                "max_weight_kg": None,
+                "best_e1rm": None,
+                "volume": 0.0,
+            }
+        row["max_weight_kg"] = _max(row["max_weight_kg"], weight)
+        row["best_e1rm"] = _max(row["best_e1rm"], estimated_1rm(weight, reps))
+        row["volume"] += (sets or 0) * (reps or 0) * (weight or 0)
+    return list(rows.values())
+
+
+def _merge(record: Optional[dict], progress: dict) -> dict:
+    record = dict(record or {
+        "record_key": progress["record_key"],
+        "user_id": progress["user_id"],
+        "exercise": progress["exercise"],
+        "max_weight_kg": None,
+        "best_e1rm": None,
+        "total_volume": 0.0,
+        "sessions": 0,
+        "last_performed": None,
+    })
+    record["name"] = progress["name"] if (progress["date"] or "") >= (record.get("last_performed") or "") else record.get("name")
+    record["max_weight_kg"] = _max(record["max_weight_kg"], progress["max_weight_kg"])
+    record["best_e1rm"] = _max(record["best_e1rm"], progress["best_e1rm"])
+    record["total_volume"] = round((record["total_volume"] or 0) + progress["volume"], 3)
+    record["sessions"] = (record["sessions"] or 0) + 1
+    record["last_performed"] = _max(record["last_performed"], progress["date"])
+    return record
+
+
+def _records_from(progress: Iterable[dict]) -> Dict[str, dict]:
+    records: Dict[str, dict] = {}
+    for row in sorted(progress, key=lambda r: r.get("date") or ""):
+        records[row["record_key"]] = _merge(records.get(row["record_key"]), row)
+    return records
+
+
+def _unmerge(record: dict, progress: dict) -> Optional[dict]:
+    """`record` without the session in `progress`, or None when that needs the full history."""
+    if (record["sessions"] or 0) <= 1 or progress["date"] == record["last_performed"]:
+        return None
+    for col in ("max_weight_kg", "best_e1rm"):
+        if progress[col] is not None and progress[col] >= (record[col] or 0):
+            return None
+    record = dict(record)
+    record["total_volume"] = round((record["total_volume"] or 0) - progress["volume"], 3)
+    record["sessions"] -= 1
+    return record
+
+
+def _read_records(keys: List[str]) -> Dict[str, dict]:
+    rows = _check(supabase.table(RECORDS_TABLE).select("*").in_("record_key", keys).execute(), "read records")
+    return {r["record_key"]: r for r in rows}
+
+
+def _write(current: Optional[dict], record: Optional[dict]) -> bool:
+    """Replace `current` (None: no stored row) with `record` (None: delete); False if another writer got there first."""
+    table = supabase.table(RECORDS_TABLE)
+    if current is None:
+        if record is None:
+            return True
+        # the unique record_key rejects a record another worker inserted meanwhile
+        return not table.insert({**record, "revision": 1}).execute().error
+    if record is None:
+        q = table.delete()
+    else:
+        values = {k: v for k, v in record.items() if k not in ("id", "created_at")}
+        q = table.update({**values, "revision": (current.get("revision") or 0) + 1})
+    res = q.eq("record_key", current["record_key"]).eq("revision", current.get("revision")).execute()
+    return bool(_check(res, "write records"))
+
+
+def _group(progress: List[dict]) -> Dict[str, List[dict]]:
+    grouped: Dict[str, List[dict]] = {}
+    for row in sorted(progress, key=lambda r: r["date"] or ""):
+        grouped.setdefault(row["record_key"], []).append(row)
+    return grouped
+
+
+def _recompute(user_id: str, keys: List[str]):
+    """Rewrite the records for `keys` from their progress rows.
+
+    The revision is read before the progress, so a write based on progress
+    that another worker has changed since fails and is retried.
+    """
+    for _ in range(RECORDS_WRITE_ATTEMPTS):
+        current = _read_records(keys)
+        progress = _check(
+            supabase.table(PROGRESS_TABLE).select("*").eq("user_id", user_id).in_("record_key", keys).execute(),
+            "read progress",
+        )
+        fresh = _records_from(progress)
+        keys = [k for k in keys if not _write(current.get(k), fresh.get(k))]
+        if not keys:
+            return
+    raise RecordsError(f"write records: {len(keys)} records still changing after {RECORDS_WRITE_ATTEMPTS} attempts")
+
+
+def apply_workouts(user_id: str, workouts: List[dict]):
+    """Merge newly inserted workouts (rows with embedded exercises) into the index.
+
+    The records are read before the progress rows are inserted: a record
+    that changes in between (another worker merged or recomputed it) fails
+    the conditional write, and only then is that exercise recomputed from
+    its history, which counts the new rows exactly once.
+    """
+    progress = [row for w in workouts for row in progress_rows(user_id, w)]
+    if not progress:
+        return
+    grouped = _group(progress)
+    with _user_lock(user_id):
+        current = _read_records(list(grouped))
+        _check(supabase.table(PROGRESS_TABLE).insert(progress).execute(), "insert progress")
+        lost = []
+        for key, rows in grouped.items():
+            record = current.get(key)
+            for row in rows:
+                record = _merge(record, row)
+            if not _write(current.get(key), record):
+                lost.append(key)
+        if lost:
+            _recompute(user_id, lost)
+
+
+def remove_workout(user_id: str, workout_id: str):
+    """Drop a deleted workout's progress rows and take its sessions out of the records.
+
+    A session is subtracted from its record unless it held one of the
+    record's bests or the record changed meanwhile; only those exercises are
+    recomputed from their history.
+    """
+    with _user_lock(user_id):
+        progress = supabase.table(PROGRESS_TABLE).select("*").eq("workout_id", workout_id).eq("user_id", user_id)
+        touched = _check(progress.execute(), "read progress")
+        if not touched:
+            return
+        current = _read_records(list({row["record_key"] for row in touched}))
+        removed = _check(
+            supabase.table(PROGRESS_TABLE).delete().eq("workout_id", workout_id).eq("user_id", user_id).execute(),
+            "delete progress",
+        )
+        stale = []
+        for key, rows in _group(removed).items():
+            record = current.get(key)
+            for row in rows:
+                record = record and _unmerge(record, row)
+            if record is None or not _write(current.get(key), record):
+                stale.append(key)
+        if stale:
+            _recompute(user_id, stale)
+
+
+def rebuild(user_id: str, page_size: int = 500) -> int:
+    """Recreate a user's index from the workouts and exercises tables; returns the exercise count."""
+    progress: List[dict] = []
+    after = None
+    while True:
+        q = supabase.table("workouts").select("*, exercises(*)").eq("user_id", user_id)
+        if after:
+            q = q.or_(f"date.lt.{after[0]},and(date.eq.{after[0]},id.lt.{after[1]})")
+        page = _check(q.order("date", desc=True).order("id", desc=True).limit(page_size).execute(), "read workouts")
+        for w in page:
+            progress.extend(progress_rows(user_id, w))
+        if len(page) < page_size:
+            break
+        after = (page[-1]["date"], page[-1]["id"])
+    records = _records_from(progress)
+    _check(supabase.table(PROGRESS_TABLE).delete().eq("user_id", user_id).execute(), "clear progress")
+    _check(supabase.table(RECORDS_TABLE).delete().eq("user_id", user_id).execute(), "clear records")
+    if progress:
+        _check(supabase.table(PROGRESS_TABLE).insert(progress).execute(), "insert progress")
+        _check(supabase.table(RECORDS_TABLE).insert([{**r, "revision": 1} for r in records.values()]).execute(), "insert records")
+    response_cache.invalidate(user_id)
+    return len(records)
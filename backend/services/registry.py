@@ -0,0 +1,119 @@
+"""Process-wide services that are expensive to build: SDK clients and heavy imports.
+
+A service is registered with a factory and built on first `get`, or ahead
+of traffic by `warm_up()`, which the app's lifespan starts in the
+background, then moves everything allocated so far out of the cyclic
+GC's reach. `lazy(name)` returns a stand-in that builds the service on
+first attribute access, so modules keep exporting e.g. `supabase` without
+paying for it at import time.
+"""
+import gc
+import time
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    def __init__(self):
+        # name -> (factory, build during warm-up)
+        self._factories: Dict[str, tuple] = {}
+        self._instances: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._seconds: Dict[str, float] = {}
+        # one lock per service, so a slow import never holds up another service
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+        self.warmed = False
+
+    def register(self, name: str, factory: Callable[[], Any], warm: bool = True):
+        """Add a service; `warm=False` leaves it to its first use (e.g. when it is not configured)."""
+        self._factories[name] = (factory, warm)
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            lock = self._locks[name]
+        with lock:
+            if name in self._instances:
+                return self._instances[name]
+            factory, _ = self._factories[name]
+            t0 = time.perf_counter()
+            try:
+                instance = factory()
+            except Exception as e:
+                self._errors[name] = repr(e)
+                raise
+            self._seconds[name] = time.perf_counter() - t0
+            self._errors.pop(name, None)
+            self._instances[name] = instance
+            logger.info("Initialized %s in %.0f ms", name, self._seconds[name] * 1000)
+            return instance
+
+    def lazy(self, name: str) -> "LazyService":
+        return LazyService(self, name)
+
+    async def warm_up(self):
+        """Build every warm service not built yet, off the event loop; failures are logged and left to first use."""
+        for name, (_, warm) in list(self._factories.items()):
+            if warm and name not in self._instances:
+                try:
+                    await run_in_threadpool(self.get, name)
+                except Exception:
+                    logger.exception("Warm-up of %s failed", name)
+        # modules, routes and clients live as long as the process; frozen, they are
+        # no longer walked by every full collection (~50 ms on the event loop)
+        gc.freeze()
+        self.warmed = True
+
+    def ready(self) -> bool:
+        return self.warmed and not self._errors
+
+    def status(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "initialized": name in self._instances,
+                "seconds": round(self._seconds[name], 4) if name in self._seconds else None,
+                "error": self._errors.get(name),
+            }
+            for name in self._factories
+        }
+
+
+class LazyService:
+    """Forwards attribute access to a registry service, building it on first use."""
+
+    __slots__ = ("_registry", "_name", "_target")
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_target", None)
+
+    def _resolve(self) -> Any:
+        target = self._target
+        if target is None:
+            target = self._registry.get(self._name)
+            object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, attr: str):
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr: str, value):
+        setattr(self._resolve(), attr, value)
+
+    def __repr__(self):
+        state = "unbuilt" if self._target is None else repr(self._target)
+        return f"<lazy {self._name}: {state}>"
+
+
+registry = ServiceRegistry()
@@ -0,0 +1,354 @@
+"""Async data access: per-table repositories over a pooled connection.
+
+With SUPABASE_URL set, queries go straight to PostgREST on one shared
+httpx.AsyncClient (keep-alive, HTTP/2), so a database round trip waits on
+the event loop instead of holding a threadpool thread, and independent
+queries can run together with `gather`. Without it the same queries run on
+the local client from supabase_client (the in-memory fake or SQLite), which
+stays the drop-in for tests and dummy mode.
+
+Queries use the supabase-py chain (`db.table("x").select().eq()...`), but
+`execute()` is awaited and returns the usual Result.
+"""
+import re
+import asyncio
+import os
+import threading
+from typing import Any, List, Optional, Tuple
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from .supabase_client import SUPABASE_SERVICE_KEY, SUPABASE_URL, FakeSupabase, Result, _resolve_value, supabase
+from .metrics import supabase_duration
+from .records import PROGRESS_TABLE, RECORDS_TABLE, exercise_key, record_key
+from .changes import CHANGES_TABLE
+from .registry import registry
+
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+# rows per request for reads that need every matching row; at most PostgREST's max-rows
+READ_PAGE_SIZE = int(os.getenv("READ_PAGE_SIZE", "1000"))
+
+FILTER_OPS = ("eq", "neq", "gt", "gte", "lt", "lte")
+
+
+class AsyncQuery:
+    """A recorded query chain, compiled and run by the backend on `await execute()`."""
+
+    def __init__(self, backend, table: str):
+        self.backend = backend
+        self.table = table
+        self.op = "select"
+        self.calls: List[Tuple[str, tuple, dict]] = []
+
+    def _add(self, name, *args, **kwargs):
+        self.calls.append((name, args, kwargs))
+        return self
+
+    def select(self, what="*"):
+        return self._add("select", what)
+
+    def insert(self, data):
+        self.op = "insert"
+        return self._add("insert", data)
+
+    def upsert(self, data, on_conflict=None):
+        self.op = "upsert"
+        return self._add("upsert", data, on_conflict=on_conflict)
+
+    def delete(self):
+        self.op = "delete"
+        return self._add("delete")
+
+    def eq(self, field, value):
+        return self._add("eq", field, value)
+
+    def neq(self, field, value):
+        return self._add("neq", field, value)
+
+    def in_(self, field, values):
+        return self._add("in_", field, list(values))
+
+    def gte(self, field, value):
+        return self._add("gte", field, value)
+
+    def gt(self, field, value):
+        return self._add("gt", field, value)
+
+    def lt(self, field, value):
+        return self._add("lt", field, value)
+
+    def lte(self, field, value):
+        return self._add("lte", field, value)
+
+    def or_(self, filters: str):
+        return self._add("or_", filters)
+
+    def order(self, field, desc=False):
+        return self._add("order", field, desc=desc)
+
+    def limit(self, size: int):
+        return self._add("limit", size)
+
+    async def execute(self) -> Result:
+        with supabase_duration.time(self.table, self.op):
+            return await self.backend.run(self)
+
+
+class LocalBackend:
+    """Replays the chain on a synchronous client (FakeSupabase or SQLiteSupabase)."""
+
+    def __init__(self, client):
+        self.client = client
+        # the fake only touches memory, so it runs inline; SQLite does file I/O
+        self.inline = isinstance(client, FakeSupabase)
+
+    async def run(self, query: AsyncQuery) -> Result:
+        q = self.client.table(query.table)
+        for name, args, kwargs in query.calls:
+            q = getattr(q, name)(*args, **kwargs)
+        if self.inline:
+            return q.execute()
+        return await run_in_threadpool(q.execute)
+
+    async def aclose(self):
+        pass
+
+
+def _literal(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(_resolve_value(value))
+
+
+def _quoted(value) -> str:
+    # inside in.(...) commas and parentheses are syntax, so every value is quoted
+    return '"' + _literal(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class PostgrestBackend:
+    """Sends each query as one PostgREST request on a pooled HTTP/2 client."""
+
+    def __init__(self, url: str, key: str, pool_size: int = SUPABASE_POOL_SIZE, timeout: float = SUPABASE_TIMEOUT_SECONDS, transport=None):
+        self.base_url = url.rstrip("/") + "/rest/v1"
+        self.key = key
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.AsyncClient(
+                        base_url=self.base_url,
+                        http2=self.transport is None,
+                        transport=self.transport,
+                        headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+                        limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                        timeout=self.timeout,
+                    )
+        return self._client
+
+    def build(self, query: AsyncQuery) -> Tuple[str, list, Any, dict]:
+        """(method, query params, JSON body, headers) for the recorded chain."""
+        method, body, select = "GET", None, None
+        params: list = []
+        order: List[str] = []
+        prefer: List[str] = []
+        for name, args, kwargs in query.calls:
+            if name == "select":
+                select = re.sub(r"\s+", "", args[0])
+            elif name in ("insert", "upsert"):
+                method, body = "POST", args[0]
+                prefer.append("return=representation")
+                if name == "upsert":
+                    prefer.append("resolution=merge-duplicates")
+                    if kwargs.get("on_conflict"):
+                        params.append(("on_conflict", kwargs["on_conflict"]))
+            elif name == "delete":
+                method = "DELETE"
+                prefer.append("return=representation")
+            elif name in FILTER_OPS:
+                field, value = args
+                op = ("is" if name == "eq" else "not.is") if value is None else name
+                params.append((field, f"{op}.{_literal(value)}"))
+            elif name == "in_":
+                field, values = args
+                params.append((field, "in.(" + ",".join(_quoted(v) for v in values) + ")"))
+            elif name == "or_":
+                params.append(("or", f"({args[0]})"))
+            elif name == "order":
+                order.append(f"{args[0]}.{'desc' if kwargs.get('desc') else 'asc'}")
+            elif name == "limit":
+                params.append(("limit", str(args[0])))
+        if order:
+            params.append(("order", ",".join(order)))
+        if method == "GET" or select:
+            params.append(("select", select or "*"))
+        headers = {"Prefer": ",".join(prefer)} if prefer else {}
+        return method, params, body, headers
+
+    async def run(self, query: AsyncQuery) -> Result:
+        method, params, body, headers = self.build(query)
+        try:
+            resp = await self.client().request(method, f"/{query.table}", params=params, json=body, headers=headers)
+        except httpx.HTTPError as e:
+            return Result([], error=f"{type(e).__name__}: {e}")
+        if resp.status_code >= 400:
+            try:
+                error = resp.json().get("message") or resp.text
+            except ValueError:
+                error = resp.text
+            return Result([], error=error)
+        return Result(resp.json() if resp.content else [])
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class WorkoutRepository:
+    def __init__(self, db: "AsyncDatabase"):
+        self.db = db
+
+    @staticmethod
+    def page_query(q, user_id: str, after: Optional[Tuple[str, str]], limit: int, columns: str = "*, exercises(*)"):
+        """Keyset page ordered by (date, id) descending, starting after (date, id); sync or async chain."""
+        q = q.select(columns).eq("user_id", user_id)
+        if after:
+            day, wid = after
+            q = q.or_(f"date.lt.{day},and(date.eq.{day},id.lt.{wid})")
+        return q.order("date", desc=True).order("id", desc=True).limit(limit)
+
+    async def page(self, user_id: str, after: Optional[Tuple[str, str]], limit: int) -> Result:
+        return await self.page_query(self.db.table("workouts"), user_id, after, limit).execute()
+
+    async def get(self, workout_id: str, user_id: Optional[str] = None) -> Result:
+        """The workout with its exercises; any owner when user_id is None (the caller checks)."""
+        q = self.db.table("workouts").select("*, exercises(*)").eq("id", workout_id)
+        if user_id is not None:
+            q = q.eq("user_id", user_id)
+        return await q.execute()
+
+    async def get_many(self, workout_ids: List[str], user_id: str) -> Result:
+        return await self.db.table("workouts").select("*, exercises(*)").in_("id", workout_ids).eq("user_id", user_id).execute()
+
+    async def in_range(self, user_id: str, start=None, end=None, columns: str = "*, exercises(*)") -> Result:
+        """Every workout dated within [start, end], newest first.
+
+        Read in keyset pages of READ_PAGE_SIZE, so PostgREST's max-rows cap
+        cannot silently truncate a long history. `columns` must include
+        `id` and `date`.
+        """
+        rows: List[dict] = []
+        after = None
+        while True:
+            q = self.page_query(self.db.table("workouts"), user_id, after, READ_PAGE_SIZE, columns)
+            if start:
+                q = q.gte("date", start)
+            if end:
+                q = q.lte("date", end)
+            res = await q.execute()
+            if res.error:
+                return res
+            rows.extend(res.data)
+            if len(res.data) < READ_PAGE_SIZE:
+                return Result(rows)
+            after = (res.data[-1]["date"], res.data[-1]["id"])
+
+    async def delete(self, workout_id: str, user_id: str) -> Result:
+        return await self.db.table("workouts").delete().eq("id", workout_id).eq("user_id", user_id).execute()
+
+
+class AnalysisRepository:
+    def __init__(self, db: "AsyncDatabase"):
+        self.db = db
+
+    async def for_workout(self, workout_id: str, user_id: str) -> Result:
+        return await self.db.table("ai_analyses").select("*").eq("workout_id", workout_id).eq("user_id", user_id).execute()
+
+    async def for_workouts(self, workout_ids: List[str], user_id: str) -> Result:
+        return await self.db.table("ai_analyses").select("*").in_("workout_id", workout_ids).eq("user_id", user_id).execute()
+
+    async def scores(self, user_id: str) -> Result:
+        """workout_id and overall_score of every analysis, in keyset pages of READ_PAGE_SIZE."""
+        rows: List[dict] = []
+        after = None
+        while True:
+            q = self.db.table("ai_analyses").select("workout_id, overall_score").eq("user_id", user_id)
+            if after is not None:
+                q = q.gt("workout_id", after)
+            res = await q.order("workout_id").limit(READ_PAGE_SIZE).execute()
+            if res.error:
+                return res
+            rows.extend(res.data)
+            if len(res.data) < READ_PAGE_SIZE:
+                return Result(rows)
+            after = res.data[-1]["workout_id"]
+
+    async def upsert(self, rows) -> Result:
+        """One row or a list, written in a single request."""
+        return await self.db.table("ai_analyses").upsert(rows, on_conflict="workout_id").execute()
+
+
+class RecordRepository:
+    def __init__(self, db: "AsyncDatabase"):
+        self.db = db
+
+    async def for_user(self, user_id: str) -> Result:
+        return await self.db.table(RECORDS_TABLE).select("*").eq("user_id", user_id).order("exercise").execute()
+
+    async def progression(self, user_id: str, exercise: str) -> Result:
+        key = record_key(user_id, exercise_key(exercise))
+        return await self.db.table(PROGRESS_TABLE).select("*").eq("record_key", key).order("date").order("workout_id").execute()
+
+
+class ChangeRepository:
+    def __init__(self, db: "AsyncDatabase"):
+        self.db = db
+
+    async def since(self, user_id: str, version: int, limit: int) -> Result:
+        return await self.db.table(CHANGES_TABLE).select("*").eq("user_id", user_id).gt("seq", version).order("seq").limit(limit).execute()
+
+    async def latest(self, user_id: str) -> Result:
+        return await self.db.table(CHANGES_TABLE).select("seq").eq("user_id", user_id).order("seq", desc=True).limit(1).execute()
+
+
+class AsyncDatabase:
+    def __init__(self, backend):
+        self.backend = backend
+        self.workouts = WorkoutRepository(self)
+        self.analyses = AnalysisRepository(self)
+        self.records = RecordRepository(self)
+        self.changes = ChangeRepository(self)
+
+    def table(self, name: str) -> AsyncQuery:
+        return AsyncQuery(self.backend, name)
+
+    @staticmethod
+    async def gather(*calls) -> List[Result]:
+        """Run independent queries concurrently; results in argument order."""
+        return list(await asyncio.gather(*calls))
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+def _backend():
+    if SUPABASE_URL and SUPABASE_SERVICE_KEY:
+        return PostgrestBackend(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    # unwrap InstrumentedClient: AsyncQuery.execute records the timing itself
+    return LocalBackend(getattr(supabase, "_client", supabase))
+
+
+db = AsyncDatabase(_backend())
+# build the pooled client (TLS trust store, HTTP/2 modules) during warm-up, not on the first query
+if isinstance(db.backend, PostgrestBackend):
+    registry.register("postgrest", db.backend.client)
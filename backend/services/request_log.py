@@ -0,0 +1,147 @@
+"""Structured, sampled request logs written off the event loop.
+
+Each request becomes one JSON line on stderr. The middleware only builds a
+small dict and puts a log record on a bounded queue; JSON encoding and the
+write happen on a listener thread, so a slow stderr never blocks requests.
+When the queue is full, records are dropped and counted rather than waited on.
+
+2xx/3xx responses are logged with probability REQUEST_LOG_SAMPLE_RATE
+(the rate is written into each line so counts can be scaled back up);
+4xx/5xx responses and requests slower than REQUEST_LOG_SLOW_SECONDS are
+always logged.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1.0"))
+REQUEST_LOG_SLOW_SECONDS = float(os.getenv("REQUEST_LOG_SLOW_SECONDS", "1.0"))
+# records waiting for the writer thread before new ones are dropped
+REQUEST_LOG_QUEUE_SIZE = int(os.getenv("REQUEST_LOG_QUEUE_SIZE", "10000"))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the record's `fields`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full instead of raising."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # the message is formatted by the listener's handler; only resolve args here
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLog:
+    """Puts `name`'s records on a bounded queue drained by a writer thread into `stream` (stderr)."""
+
+    def __init__(self, name: str = "fittrack", stream=None, queue_size: int = REQUEST_LOG_QUEUE_SIZE):
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging.INFO)
+        self.handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.writer = logging.StreamHandler(stream)
+        self.writer.setFormatter(JsonFormatter())
+        self.listener = logging.handlers.QueueListener(self.handler.queue, self.writer)
+        self.logger.addHandler(self.handler)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def stop(self):
+        """Flush what is queued and stop the writer thread."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+class RequestLogMiddleware:
+    """Pure ASGI middleware emitting one structured record per sampled request.
+
+    The user id is read from request.state.user, set by get_current_user
+    once the route has authenticated the request; the token is never
+    decoded here.
+    """
+
+    def __init__(self, app, log: RequestLog, sample_rate: float = REQUEST_LOG_SAMPLE_RATE,
+                 slow_seconds: float = REQUEST_LOG_SLOW_SECONDS, rng=random.random):
+        self.app = app
+        self.logger = log.logger
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.rng = rng
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        size = 0
+        t0 = time.perf_counter()
+        first_byte = None
+
+        async def send_wrapper(message):
+            nonlocal status, size, first_byte
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                first_byte = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            forced = status >= 400 or elapsed >= self.slow_seconds
+            if forced or self.rng() < self.sample_rate:
+                self._emit(scope, status, elapsed, first_byte - t0 if first_byte else None, size, forced)
+
+    def _emit(self, scope, status: int, elapsed: float, ttfb, size: int, forced: bool):
+        level = logging.WARNING if status >= 500 else logging.INFO
+        if not self.logger.isEnabledFor(level):
+            return
+        user = scope.get("state", {}).get("user")
+        route = scope.get("route")
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 2),
+            "ttfb_ms": None if ttfb is None else round(ttfb * 1000, 2),
+            "bytes": size,
+            "user_id": getattr(user, "id", None),
+            "sample_rate": 1.0 if forced else self.sample_rate,
+        }
+        self.logger.log(level, "request", extra={"fields": fields})
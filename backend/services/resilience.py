@@ -0,0 +1,216 @@
+"""Deadlines, jittered backoff, a circuit breaker and hedging for calls to a remote dependency.
+
+`ResilientCaller.call(attempt)` runs `attempt(timeout)` until it succeeds,
+a permanent error is raised, the retries run out or the deadline passes.
+The deadline is a context variable: an outer `deadline(seconds)` scope
+(one model operation, say, including its parse retries) bounds every call
+made inside it, and a nested scope can only shorten it.
+"""
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class CircuitOpen(Exception):
+    """The dependency is failing; calls are refused until `retry_after` seconds pass."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Bound everything inside the block to `seconds` from now (or the enclosing deadline, if sooner)."""
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, None without one."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def backoff(attempt: int, base: float, cap: float, rng=random) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failed calls and refuses calls for `reset_seconds`.
+
+    Then one probe call at a time is let through (half-open): a success
+    closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, name: str, failures: int = 5, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self.clock() - self._opened_at >= self.reset_seconds else "open"
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go out now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = self.clock() - self._opened_at
+            if waited >= self.reset_seconds and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            raise CircuitOpen(self.name, max(self.reset_seconds - waited, 0.0))
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or self._consecutive >= self.failures:
+                self._opened_at = self.clock()
+            self._probing = False
+
+    def abandoned(self):
+        """A call let through ended without an outcome (cancelled); let another probe go."""
+        with self._lock:
+            self._probing = False
+
+
+class ResilientCaller:
+    """Retries, backoff, breaker and optional hedging around one kind of call.
+
+    `transient(exc)` decides which errors are worth another attempt and
+    count against the breaker; anything else is raised at once. With
+    `hedge_after` set, an attempt still running after that many seconds
+    is raced by a second, identical one and the first answer wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        transient: Callable[[BaseException], bool],
+        attempt_timeout: float,
+        retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_after: float = 0.0,
+        rng=None,
+    ):
+        self.name = name
+        self.transient = transient
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge_after = hedge_after
+        self.rng = rng or random.Random()
+        self.retried = 0
+        self.hedged = 0
+
+    def _timeout(self) -> float:
+        left = remaining()
+        if left is not None and left <= 0:
+            raise asyncio.TimeoutError(f"{self.name} deadline exceeded")
+        return self.attempt_timeout if left is None else min(self.attempt_timeout, left)
+
+    def _delay(self, attempt: int) -> Optional[float]:
+        """Backoff before the next attempt, or None when there is no time or attempt left for it."""
+        if attempt >= self.retries:
+            return None
+        delay = backoff(attempt, self.backoff_base, self.backoff_max, self.rng)
+        left = remaining()
+        if left is not None and delay >= left:
+            return None
+        self.retried += 1
+        return delay
+
+    def _retryable(self, e: BaseException) -> bool:
+        return isinstance(e, asyncio.TimeoutError) or self.transient(e)
+
+    async def _guarded(self, attempt: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        self.breaker.before_call()
+        try:
+            result = await asyncio.wait_for(attempt(timeout), timeout)
+        except asyncio.CancelledError:
+            # e.g. a hedge that lost the race: says nothing about the dependency
+            self.breaker.abandoned()
+            raise
+        except Exception as e:
+            if self._retryable(e):
+                self.breaker.failure()
+            else:
+                # a permanent error is still an answer
+                self.breaker.success()
+            raise
+        self.breaker.success()
+        return result
+
+    async def _hedged(self, attempt: Callable[[float], Awaitable[T]]) -> T:
+        tasks = [asyncio.ensure_future(self._guarded(attempt, self._timeout()))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            left = remaining()
+            if not done and (left is None or left > 0):
+                tasks.append(asyncio.ensure_future(self._guarded(attempt, self._timeout())))
+                self.hedged += 1
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # both failed: report the original attempt's error
+            raise tasks[0].exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, attempt: Callable[[float], Awaitable[T]]) -> T:
+        """Run `attempt(timeout)` with retries; raises CircuitOpen, asyncio.TimeoutError or the last error."""
+        for n in range(self.retries + 1):
+            try:
+                if self.hedge_after > 0:
+                    return await self._hedged(attempt)
+                return await self._guarded(attempt, self._timeout())
+            except CircuitOpen:
+                raise
+            except Exception as e:
+                if not self._retryable(e):
+                    raise
+                delay = self._delay(n)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
@@ -0,0 +1,142 @@
+import os
+import uuid
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+
+# "memory" versions are per process; "sqlite" shares them between workers on the host
+USER_VERSION_BACKEND = os.getenv("USER_VERSION_BACKEND", "memory")
+USER_VERSION_DB = os.getenv("USER_VERSION_DB", "versions.sqlite3")
+RESPONSE_CACHE_USERS = int(os.getenv("RESPONSE_CACHE_USERS", "1024"))
+RESPONSE_CACHE_ENTRIES_PER_USER = int(os.getenv("RESPONSE_CACHE_ENTRIES_PER_USER", "32"))
+
+# clients may keep the body but must revalidate before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+class MemoryVersions:
+    def __init__(self):
+        # a per-process prefix keeps two workers' counters from producing the same ETag
+        self._epoch = uuid.uuid4().hex[:8]
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> str:
+        return f"{self._epoch}.{self._versions.get(user_id, 0)}"
+
+    def bump(self, user_id: str):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+
+class SQLiteVersions:
+    def __init__(self, path: str = USER_VERSION_DB):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS user_versions (user_id TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM user_versions WHERE user_id = ?", (user_id,)).fetchone()
+        return str(row[0] if row else 0)
+
+    def bump(self, user_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO user_versions (user_id, version) VALUES (?, 1) "
+                "ON CONFLICT(user_id) DO UPDATE SET version = version + 1",
+                (user_id,),
+            )
+
+
+class ResponseCache:
+    """Serialized read responses per user, valid for one version of that user's data.
+
+    Bounded to RESPONSE_CACHE_USERS users (least recently used dropped
+    first) and RESPONSE_CACHE_ENTRIES_PER_USER responses each.
+    """
+
+    def __init__(self, versions=None, max_users: int = RESPONSE_CACHE_USERS, per_user: int = RESPONSE_CACHE_ENTRIES_PER_USER):
+        self.versions = versions or (SQLiteVersions() if USER_VERSION_BACKEND == "sqlite" else MemoryVersions())
+        self.max_users = max_users
+        self.per_user = per_user
+        self._users: "OrderedDict[str, Tuple[str, OrderedDict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def invalidate(self, user_id: str):
+        """Call after every write to a user's data."""
+        self.versions.bump(user_id)
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def get(self, user_id: str, version: str, key: str) -> Optional[Tuple[bytes, dict]]:
+        """Cached response, counted as a hit or a miss."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            responses = entry[1]
+            value = responses.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                responses.move_to_end(key)
+            return value
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def put(self, user_id: str, version: str, key: str, value: Tuple[bytes, dict]):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or entry[0] != version:
+                entry = self._users[user_id] = (version, OrderedDict())
+            self._users.move_to_end(user_id)
+            responses = entry[1]
+            responses[key] = value
+            responses.move_to_end(key)
+            while len(responses) > self.per_user:
+                responses.popitem(last=False)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(r) for _, r in self._users.values())
+            return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified, "users": len(self._users), "entries": entries}
+
+
+response_cache = ResponseCache()
+
+
+async def cached_response(request: Request, user_id: str, build: Callable[[], Awaitable[Tuple[bytes, dict]]]) -> Response:
+    """Serve a read endpoint with a strong ETag, 304 on If-None-Match and a per-user body cache.
+
+    `build` is an async function that queries and serializes the response,
+    returning (body, extra headers); it only runs when neither the client
+    nor the cache has the current version.
+    """
+    version = response_cache.versions.get(user_id)
+    key = f"{request.url.path}?{request.url.query}"
+    etag = '"' + hashlib.sha1(f"{user_id}|{version}|{key}".encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag in (t.strip() for t in request.headers.get("if-none-match", "").split(",")):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    cached = response_cache.get(user_id, version, key)
+    if cached is None:
+        cached = await build()
+        response_cache.put(user_id, version, key, cached)
+    body, extra = cached
+    return Response(body, media_type="application/json", headers={**extra, **headers})
@@ -0,0 +1,58 @@
+"""Response bodies as JSON bytes through precompiled pydantic TypeAdapters.
+
+`dump_json` validates the rows into the response model once and lets
+pydantic-core write the bytes; the output is the same as FastAPI's
+response_model encoding. With FAST_SERIALIZATION the rows are trusted as
+they come from the database and not validated at all: a TypedDict
+mirror of the model picks the declared fields and serializes them, so
+dates and timestamps keep the database's own formatting.
+"""
+import os
+import datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional, Union, get_args, get_origin
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "").lower() in ("1", "true", "yes")
+
+
+def _wire(tp):
+    """The annotation `tp` as it arrives in a database row."""
+    origin = get_origin(tp)
+    if origin is list:
+        return List[_wire(get_args(tp)[0])]
+    if origin is Union:
+        return Union[tuple(_wire(a) for a in get_args(tp))]
+    if isinstance(tp, type) and issubclass(tp, BaseModel):
+        return _row_type(tp)
+    if tp in (datetime.date, datetime.datetime):
+        # stored and returned as ISO strings
+        return Union[str, tp]
+    return tp
+
+
+@lru_cache(maxsize=None)
+def _row_type(model):
+    fields = {name: _wire(field.annotation) for name, field in model.model_fields.items()}
+    # total=False: a missing column is left out rather than failing the response
+    return TypedDict(f"{model.__name__}Row", fields, total=False)
+
+
+@lru_cache(maxsize=None)
+def _adapter(model, many: bool, trusted: bool) -> TypeAdapter:
+    tp = _row_type(model) if trusted else model
+    return TypeAdapter(List[tp] if many else tp)
+
+
+def dump_json(model, data, trusted: Optional[bool] = None) -> bytes:
+    """`data` (one row or a list of rows) encoded as response_model=model would be."""
+    if trusted is None:
+        trusted = FAST_SERIALIZATION
+    adapter = _adapter(model, isinstance(data, list), trusted)
+    return adapter.dump_json(data if trusted else adapter.validate_python(data))
+
+
+def dump_lines(model, rows: Iterable[dict], trusted: Optional[bool] = None) -> bytes:
+    """NDJSON: one encoded row per line."""
+    return b"".join(dump_json(model, row, trusted) + b"\n" for row in rows)
@@ -0,0 +1,392 @@
+"""Supabase table API on a local SQLite file.
+
+A persistent stand-in for the hosted database: the same chained query
+interface as FakeTable, but filters, ordering, limits and the
+`exercises(*)` embed are compiled to SQL and run by SQLite. The file is in
+WAL mode, so every worker process on the host shares one dataset.
+"""
+import re
+import json
+import uuid
+import sqlite3
+import datetime
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from .supabase_client import FakeAuth, Result, _parse_or, _parse_select, _resolve_value
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workouts (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT,
+    date TEXT,
+    duration_minutes INTEGER,
+    notes TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS workouts_user_date ON workouts (user_id, date, id);
+CREATE TABLE IF NOT EXISTS exercises (
+    id TEXT PRIMARY KEY,
+    workout_id TEXT NOT NULL REFERENCES workouts (id) ON DELETE CASCADE,
+    name TEXT,
+    sets INTEGER,
+    reps INTEGER,
+    weight_kg REAL,
+    muscle_group TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS exercises_workout ON exercises (workout_id);
+CREATE TABLE IF NOT EXISTS ai_analyses (
+    id TEXT PRIMARY KEY,
+    workout_id TEXT NOT NULL UNIQUE REFERENCES workouts (id) ON DELETE CASCADE,
+    user_id TEXT,
+    summary TEXT,
+    strengths TEXT,
+    improvements TEXT,
+    next_session_tips TEXT,
+    overall_score INTEGER,
+    input_hash TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS ai_analyses_user ON ai_analyses (user_id);
+CREATE TABLE IF NOT EXISTS exercise_records (
+    id TEXT PRIMARY KEY,
+    record_key TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    exercise TEXT,
+    name TEXT,
+    max_weight_kg REAL,
+    best_e1rm REAL,
+    total_volume REAL,
+    sessions INTEGER,
+    last_performed TEXT,
+    revision INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS exercise_records_user ON exercise_records (user_id, exercise);
+CREATE TABLE IF NOT EXISTS exercise_progress (
+    id TEXT PRIMARY KEY,
+    record_key TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    workout_id TEXT NOT NULL,
+    exercise TEXT,
+    name TEXT,
+    date TEXT,
+    max_weight_kg REAL,
+    best_e1rm REAL,
+    volume REAL,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS exercise_progress_key ON exercise_progress (record_key, date);
+CREATE INDEX IF NOT EXISTS exercise_progress_workout ON exercise_progress (workout_id);
+CREATE INDEX IF NOT EXISTS exercise_progress_user ON exercise_progress (user_id);
+CREATE TABLE IF NOT EXISTS workout_changes (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    created_at TEXT,
+    UNIQUE (user_id, seq)
+);
+"""
+
+# list columns stored as JSON text
+JSON_COLUMNS = {"ai_analyses": ("strengths", "improvements")}
+# (parent table, embedded table) -> foreign key on the embedded table
+EMBEDS = {("workouts", "exercises"): "workout_id"}
+# comparison operators of the filter methods
+SQL_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def _ident(name: str) -> str:
+    # column and table names are interpolated, so only plain identifiers pass
+    if not _IDENT.fullmatch(name):
+        raise ValueError(f"Invalid identifier {name!r}")
+    return f'"{name}"'
+
+
+def _condition(op: str, field: str, value, params: list) -> str:
+    col = _ident(field)
+    if op == "in":
+        values = list(value)
+        params.extend(values)
+        return f"{col} IN ({', '.join('?' * len(values))})" if values else "0"
+    if op == "is" or (value is None and op in ("eq", "neq")):
+        return f"{col} IS {'NOT ' if op == 'neq' else ''}NULL"
+    params.append(value)
+    return f"{col} {SQL_OPS[op]} ?"
+
+
+def _logic(op: str, conds: List[tuple], params: list) -> str:
+    """SQL for a parsed or_() expression: nested and/or groups of conditions."""
+    parts = [_logic(o, v, params) if o in ("and", "or") else _condition(o, f, v, params) for o, f, v in conds]
+    return "(" + f" {op.upper()} ".join(parts) + ")"
+
+
+def _where(filters: List[tuple], params: list) -> str:
+    parts = [_logic(op, value, params) if op == "or" else _condition(op, field, value, params) for op, field, value in filters]
+    return " WHERE " + " AND ".join(parts) if parts else ""
+
+
+class SQLiteTable:
+    def __init__(self, db: "SQLiteSupabase", name: str):
+        self.db = db
+        self.name = name
+        self._filters: List[tuple] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._select = "*"
+        self._delete = False
+        self._insert: Optional[List[dict]] = None
+        self._update: Optional[dict] = None
+        self._on_conflict: Optional[str] = None
+
+    def select(self, what="*"):
+        self._select = what
+        return self
+
+    def insert(self, data):
+        self._insert = data if isinstance(data, list) else [data]
+        return self
+
+    def upsert(self, data, on_conflict=None):
+        self._on_conflict = on_conflict
+        return self.insert(data)
+
+    def delete(self):
+        self._delete = True
+        return self
+
+    def update(self, values: dict):
+        self._update = values
+        return self
+
+    def eq(self, field, value):
+        self._filters.append(("eq", field, value))
+        return self
+
+    def in_(self, field, values):
+        self._filters.append(("in", field, list(values)))
+        return self
+
+    def gte(self, field, value):
+        self._filters.append(("gte", field, _resolve_value(value)))
+        return self
+
+    def gt(self, field, value):
+        self._filters.append(("gt", field, _resolve_value(value)))
+        return self
+
+    def lt(self, field, value):
+        self._filters.append(("lt", field, _resolve_value(value)))
+        return self
+
+    def lte(self, field, value):
+        self._filters.append(("lte", field, _resolve_value(value)))
+        return self
+
+    def or_(self, filters: str):
+        self._filters.append(("or", None, _parse_or(filters)))
+        return self
+
+    def order(self, field, desc=False):
+        self._order.append((field, desc))
+        return self
+
+    def limit(self, size: int):
+        self._limit = size
+        return self
+
+    def _tail(self, params: list) -> str:
+        sql = ""
+        if self._order:
+            # postgres defaults: NULLS LAST ascending, NULLS FIRST descending
+            sql += " ORDER BY " + ", ".join(
+                f"{_ident(f)} {'DESC NULLS FIRST' if desc else 'ASC NULLS LAST'}" for f, desc in self._order
+            )
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        return sql
+
+    def execute(self):
+        try:
+            if self._insert is not None:
+                return Result(self._write(self._insert))
+            if self._delete:
+                return Result(self._run_delete())
+            if self._update is not None:
+                return Result(self._run_update())
+            return Result(self._run_select())
+        except (sqlite3.Error, ValueError) as e:
+            return Result([], error=str(e))
+
+    def _run_select(self) -> List[dict]:
+        cols, embeds = _parse_select(self._select or "*")
+        table = _ident(self.name)
+        fields = [f"{table}.*"] if cols is None else [_ident(c) for c in cols]
+        for child, child_cols in embeds.items():
+            fk = EMBEDS.get((self.name, child))
+            if fk is None:
+                raise ValueError(f"Unknown embed {child!r} on {self.name!r}")
+            child_cols = child_cols or self.db.columns(child)
+            pairs = ", ".join(f"'{c}', c.{_ident(c)}" for c in child_cols)
+            # the join runs in SQL: one JSON array of child rows per parent row
+            fields.append(
+                f"(SELECT json_group_array(json_object({pairs})) FROM "
+                f"(SELECT * FROM {_ident(child)} WHERE {_ident(fk)} = {table}.id ORDER BY rowid) AS c) AS {_ident(child)}"
+            )
+        params: list = []
+        sql = f"SELECT {', '.join(fields)} FROM {table}" + _where(self._filters, params) + self._tail(params)
+        cur = self.db.conn().execute(sql, params)
+        names = [d[0] for d in cur.description]
+        rows = [dict(zip(names, r)) for r in cur.fetchall()]
+        for row in rows:
+            for child in embeds:
+                row[child] = [self.db.decode(child, r) for r in json.loads(row[child])]
+            self.db.decode(self.name, row)
+        return rows
+
+    def _run_delete(self) -> List[dict]:
+        params: list = []
+        where = _where(self._filters, params)
+        if self._order or self._limit is not None:
+            where = f" WHERE rowid IN (SELECT rowid FROM {_ident(self.name)}{where}{self._tail(params)})"
+        cur = self.db.conn().execute(f"DELETE FROM {_ident(self.name)}{where} RETURNING *", params)
+        names = [d[0] for d in cur.description]
+        return [self.db.decode(self.name, dict(zip(names, r))) for r in cur.fetchall()]
+
+    def _run_update(self) -> List[dict]:
+        if not self._update:
+            return []
+        cols = list(self._update)
+        self.db.ensure_columns(self.name, cols)
+        json_cols = JSON_COLUMNS.get(self.name, ())
+        params = [json.dumps(v) if c in json_cols and v is not None else v for c, v in self._update.items()]
+        sets = ", ".join(f"{_ident(c)} = ?" for c in cols)
+        where = _where(self._filters, params)
+        cur = self.db.conn().execute(f"UPDATE {_ident(self.name)} SET {sets}{where} RETURNING *", params)
+        names = [d[0] for d in cur.description]
+        return [self.db.decode(self.name, dict(zip(names, r))) for r in cur.fetchall()]
+
+    def _write(self, rows: List[dict]) -> List[dict]:
+        now = datetime.datetime.utcnow().isoformat()
+        prepared = []
+        for row in rows:
+            new = dict(row)
+            new.setdefault("id", str(uuid.uuid4()))
+            new.setdefault("created_at", now)
+            prepared.append(new)
+        if not prepared:
+            return []
+        cols = list(dict.fromkeys(c for row in prepared for c in row))
+        self.db.ensure_columns(self.name, cols)
+        json_cols = JSON_COLUMNS.get(self.name, ())
+        values = [
+            [json.dumps(row.get(c)) if c in json_cols and row.get(c) is not None else row.get(c) for c in cols]
+            for row in prepared
+        ]
+        col_sql = ", ".join(_ident(c) for c in cols)
+        sql = f"INSERT INTO {_ident(self.name)} ({col_sql}) VALUES ({', '.join('?' * len(cols))})"
+        if self._on_conflict:
+            self.db.ensure_unique(self.name, self._on_conflict)
+            # keep the existing row's id and created_at, overwrite the rest
+            updates = ", ".join(f"{_ident(c)} = excluded.{_ident(c)}" for c in cols if c not in ("id", "created_at", self._on_conflict))
+            sql += f" ON CONFLICT ({_ident(self._on_conflict)}) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING")
+            sql += " RETURNING *"
+            with self.db.transaction() as conn:
+                out = []
+                for vals in values:
+                    cur = conn.execute(sql, vals)
+                    names = [d[0] for d in cur.description]
+                    out.extend(self.db.decode(self.name, dict(zip(names, r))) for r in cur.fetchall())
+            return out
+        with self.db.transaction() as conn:
+            conn.executemany(sql, values)
+        table_cols = self.db.columns(self.name)
+        return [{c: row.get(c) for c in table_cols} for row in prepared]
+
+
+class SQLiteSupabase:
+    def __init__(self, path: str):
+        self.path = path
+        self.auth = FakeAuth()
+        self._local = threading.local()
+        self._columns: Dict[str, List[str]] = {}
+        self._unique: set = set()
+        self._schema_lock = threading.Lock()
+        conn = self.conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def conn(self) -> sqlite3.Connection:
+        # one connection per thread; WAL lets readers run while another connection writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit; multi-row writes open their own transaction
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def table(self, name: str) -> SQLiteTable:
+        return SQLiteTable(self, name)
+
+    def columns(self, table: str) -> List[str]:
+        cols = self._columns.get(table)
+        if cols is None:
+            cols = [r[1] for r in self.conn().execute(f"PRAGMA table_info({_ident(table)})")]
+            self._columns[table] = cols
+        return cols
+
+    def ensure_columns(self, table: str, cols: List[str]):
+        """Create the table or add columns on first use, as schemaless as the in-memory fake."""
+        known = self.columns(table)
+        missing = [c for c in cols if c not in known]
+        if not missing:
+            return
+        with self._schema_lock:
+            conn = self.conn()
+            if not known:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {_ident(table)} (id TEXT PRIMARY KEY)")
+            for col in missing:
+                if col == "id":
+                    continue
+                try:
+                    conn.execute(f"ALTER TABLE {_ident(table)} ADD COLUMN {_ident(col)}")
+                except sqlite3.OperationalError:
+                    # added meanwhile by another worker
+                    pass
+            self._columns.pop(table, None)
+
+    def ensure_unique(self, table: str, col: str):
+        if (table, col) in self._unique:
+            return
+        self.conn().execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {_ident(f'{table}_{col}_key')} ON {_ident(table)} ({_ident(col)})"
+        )
+        self._unique.add((table, col))
+
+    def decode(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        for col in JSON_COLUMNS.get(table, ()):
+            if isinstance(row.get(col), str):
+                row[col] = json.loads(row[col])
+        return row
@@ -1,48 +1,228 @@
 import os
+import re
 import uuid
+import bisect
+import operator
 import datetime
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+# without SUPABASE_URL, a SQLite file here replaces the in-memory fake
+SUPABASE_SQLITE_PATH = os.getenv("SUPABASE_SQLITE_PATH")
+
+# columns that get a hash index (value -> ordered set of row ids) when a table has them
+HASH_INDEXED = ("user_id", "workout_id", "record_key")
+# columns that get a sorted (value, id) index for range scans and ordering
+SORTED_INDEXED = ("date",)
+
+_NOW_INTERVAL = re.compile(r"now\(\)\s*-\s*interval\s*'(\d+)\s*days?'", re.IGNORECASE)
+
+
+def _resolve_value(val):
+    """Translate postgres `now() - interval 'N days'` expressions into an ISO date."""
+    if isinstance(val, str) and "now()" in val:
+        m = _NOW_INTERVAL.search(val)
+        days = int(m.group(1)) if m else 0
+        return (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+    return val
+
+
+_COMPARE = {"eq": operator.eq, "neq": operator.ne, "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+def _parse_or(expr: str) -> List[tuple]:
+    """Parse a PostgREST logic string such as `date.lt.X,and(date.eq.X,id.lt.Y)`."""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(expr):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(expr[start:i])
+            start = i + 1
+    parts.append(expr[start:])
+    conds = []
+    for part in parts:
+        part = part.strip()
+        if part.startswith(("and(", "or(")) and part.endswith(")"):
+            typ, _, inner = part.partition("(")
+            conds.append((typ, None, _parse_or(inner[:-1])))
+        else:
+            field, op, val = part.split(".", 2)
+            conds.append((op, field, val))
+    return conds
+
+
+def _parse_select(what: str) -> Tuple[Optional[List[str]], Dict[str, Optional[List[str]]]]:
+    """Split `id, date, exercises(sets, reps)` into top-level columns and embeds; None means `*`."""
+    cols: List[str] = []
+    embeds: Dict[str, Optional[List[str]]] = {}
+    for item in re.finditer(r"(\w+|\*)\s*(?:\(([^)]*)\))?", what):
+        name, inner = item.group(1), item.group(2)
+        if inner is None:
+            cols.append(name)
+        else:
+            sub = [c.strip() for c in inner.split(",") if c.strip()]
+            embeds[name] = None if sub == ["*"] else sub
+    return (None if "*" in cols else cols), embeds
+
+
+def _sort_key(val):
+    # postgres default: NULLS LAST ascending, NULLS FIRST descending
+    return (1, 0) if val is None else (0, val)
+
+
+class Result:
+    def __init__(self, data, error=None):
+        self.data = data
+        self.error = error
+
+
+class TableStore:
+    """Array-backed rows with hash and sorted indexes.
+
+    Each row is stored as a tuple laid out by `columns`; rows are materialized
+    into fresh dicts on read so callers never mutate the stored data.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.RLock()
+        self.columns: List[str] = ["id"]
+        self.col_pos: Dict[str, int] = {"id": 0}
+        self.rows: Dict[str, tuple] = {}
+        self.hash_indexes: Dict[str, Dict[Any, Dict[str, None]]] = {}
+        self.sorted_indexes: Dict[str, List[Tuple[Any, str]]] = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _ensure_column(self, col: str):
+        if col in self.col_pos:
+            return
+        self.col_pos[col] = len(self.columns)
+        self.columns.append(col)
+        if col in HASH_INDEXED:
+            self.hash_indexes[col] = {}
+        elif col in SORTED_INDEXED:
+            self.sorted_indexes[col] = []
+
+    def get(self, tup: tuple, col: str):
+        pos = self.col_pos.get(col)
+        if pos is None or pos >= len(tup):
+            return None
+        return tup[pos]
+
+    def materialize(self, tup: tuple) -> Dict[str, Any]:
+        row = dict(zip(self.columns, tup))
+        if len(tup) < len(self.columns):
+            for col in self.columns[len(tup):]:
+                row[col] = None
+        return row
+
+    def add(self, row: Dict[str, Any]):
+        if not row.keys() <= self.col_pos.keys():
+            for col in row:
+                self._ensure_column(col)
+        # a fresh tuple spans every column, so positions can be used directly
+        tup = tuple(map(row.get, self.columns))
+        rid = row["id"]
+        self.rows[rid] = tup
+        for col, index in self.hash_indexes.items():
+            index.setdefault(tup[self.col_pos[col]], {})[rid] = None
+        for col, index in self.sorted_indexes.items():
+            val = tup[self.col_pos[col]]
+            if val is not None:
+                bisect.insort(index, (val, rid))
+
+    def remove(self, rid: str) -> Optional[Dict[str, Any]]:
+        tup = self.rows.pop(rid, None)
+        if tup is None:
+            return None
+        for col, index in self.hash_indexes.items():
+            val = self.get(tup, col)
+            bucket = index.get(val)
+            if bucket is not None:
+                bucket.pop(rid, None)
+                if not bucket:
+                    del index[val]
+        for col, index in self.sorted_indexes.items():
+            val = self.get(tup, col)
+            if val is not None:
+                i = bisect.bisect_left(index, (val, rid))
+                if i < len(index) and index[i] == (val, rid):
+                    del index[i]
+        return self.materialize(tup)
+
+    def ids_for(self, col: str, val) -> Optional[List[str]]:
+        """Row ids matching col == val via an index, or None when col is not indexed."""
+        if col == "id":
+            return [val] if val in self.rows else []
+        index = self.hash_indexes.get(col)
+        if index is not None:
+            return list(index.get(val, ()))
+        if col in HASH_INDEXED:
+            # indexed column that no row has set yet
+            return []
+        return None
+
+    def range_ids(self, col: str, lo=None) -> Optional[List[str]]:
+        index = self.sorted_indexes.get(col)
+        if index is None:
+            return None
+        start = 0 if lo is None else bisect.bisect_left(index, (lo,))
+        return [rid for _, rid in index[start:]]
+
 
-# simple in-memory dataset when no real Supabase is configured
 class FakeTable:
-    def __init__(self, store: List[Dict[str, Any]], parent: "FakeSupabase"):
+    def __init__(self, store: TableStore, parent: "FakeSupabase"):
         self.store = store
         self.parent = parent
         self._filters = []
-        self._order = None
+        self._order = []
+        self._limit = None
         self._select = "*"
         self._delete = False
         self._on_conflict = None
+        self._insert = None
+        self._update = None
 
     def insert(self, data):
-        rows = data if isinstance(data, list) else [data]
+        self._insert = data if isinstance(data, list) else [data]
+        return self
+
+    def _write(self, rows):
         added = []
-        for row in rows:
-            new = row.copy()
-            new.setdefault("id", str(uuid.uuid4()))
-            new.setdefault("created_at", datetime.datetime.utcnow().isoformat())
-            added.append(new)
-            # handle upsert conflict
-            if self._on_conflict:
-                key = self._on_conflict
-                existing = [r for r in self.store if r.get(key) == new.get(key)]
-                if existing:
-                    self.store.remove(existing[0])
-            self.store.append(new)
-        class Res:
-            pass
-        res = Res()
-        res.data = added
-        res.error = None
-        return res
+        with self.store.lock:
+            for row in rows:
+                new = row.copy()
+                new.setdefault("id", str(uuid.uuid4()))
+                new.setdefault("created_at", datetime.datetime.utcnow().isoformat())
+                # handle upsert conflict: keep the existing row identity, overwrite the rest
+                if self._on_conflict:
+                    key = self._on_conflict
+                    ids = self.store.ids_for(key, new.get(key))
+                    if ids is None:
+                        ids = [rid for rid, tup in self.store.rows.items() if self.store.get(tup, key) == new.get(key)]
+                    if ids:
+                        old = self.store.remove(ids[0])
+                        new["id"] = old["id"]
+                        new["created_at"] = old.get("created_at") or new["created_at"]
+                self.store.add(new)
+                added.append(new.copy())
+        return Result(added)
 
     def upsert(self, data, on_conflict=None):
         self._on_conflict = on_conflict
         return self.insert(data)
 
+    def update(self, values: dict):
+        self._update = values
+        return self
+
     def select(self, what="*"):
         self._select = what
         return self
@@ -51,49 +231,160 @@ class FakeTable:
         self._filters.append(("eq", field, value))
         return self
 
+    def in_(self, field, values):
+        self._filters.append(("in", field, set(values)))
+        return self
+
     def gte(self, field, value):
-        self._filters.append(("gte", field, value))
+        self._filters.append(("gte", field, _resolve_value(value)))
+        return self
+
+    def gt(self, field, value):
+        self._filters.append(("gt", field, _resolve_value(value)))
+        return self
+
+    def lt(self, field, value):
+        self._filters.append(("lt", field, _resolve_value(value)))
+        return self
+
+    def lte(self, field, value):
+        self._filters.append(("lte", field, _resolve_value(value)))
+        return self
+
+    def or_(self, filters: str):
+        self._filters.append(("or", None, _parse_or(filters)))
+        return self
+
+    def limit(self, size: int):
+        self._limit = size
         return self
 
     def order(self, field, desc=False):
-        self._order = (field, desc)
+        self._order.append((field, desc))
         return self
 
     def delete(self):
         self._delete = True
         return self
 
-    def execute(self):
-        data = list(self.store)
+    def _candidates(self) -> Tuple[List[str], Optional[str]]:
+        """Pick the cheapest index for the filters; returns (ids, column they are sorted by)."""
+        store = self.store
+        best = None
         for typ, field, val in self._filters:
             if typ == "eq":
-                data = [r for r in data if r.get(field) == val]
-            elif typ == "gte":
-                if isinstance(val, str) and "now()" in val:
-                    # ignore, just keep all
-                    continue
-                data = [r for r in data if r.get(field) >= val]
-        if self._delete:
-            removed = data[:]
-            for r in removed:
-                self.store.remove(r)
-            result = removed
-        else:
-            result = data
-        if self._order:
-            field, desc = self._order
-            result.sort(key=lambda r: r.get(field), reverse=desc)
-        # handle simple relationship for workouts->exercises
-        if self._select and "exercises(*)" in self._select:
-            if self.store is self.parent._data["workouts"]:
-                for r in result:
-                    r["exercises"] = [e for e in self.parent._data["exercises"] if e.get("workout_id") == r.get("id")]
-        class Res:
-            pass
-        res = Res()
-        res.data = result
-        res.error = None
-        return res
+                ids = store.ids_for(field, val)
+            elif typ == "in":
+                hits = [store.ids_for(field, v) for v in val]
+                ids = None if None in hits else [rid for hit in hits for rid in hit]
+            else:
+                continue
+            if ids is not None and (best is None or len(ids) < len(best)):
+                best = ids
+        if best is not None:
+            return best, None
+        for typ, field, val in self._filters:
+            if typ == "gte":
+                ids = store.range_ids(field, val)
+                if ids is not None:
+                    return ids, field
+        return list(store.rows), None
+
+    def _keyset_walk(self, ids: List[str]) -> Optional[List[tuple]]:
+        """Rows for `order(col, desc).order(id, desc).limit(n)` read backwards off col's sorted index.
+
+        The index is ordered by (col, id), so a page is the first `limit`
+        matching rows before the cursor: a keyset filter of the form
+        `col.lt.X,and(col.eq.X,id.lt.Y)` is bisected to, nothing is sorted.
+        None when the query has another shape, some row lacks col (nulls sort
+        first), or the filtered candidate set is cheaper to sort.
+        """
+        store = self.store
+        if self._limit is None or self._delete or self._update is not None or len(self._order) != 2 or self._order[1] != ("id", True):
+            return None
+        field, desc = self._order[0]
+        index = store.sorted_indexes.get(field)
+        if not desc or index is None or len(index) != len(store.rows):
+            return None
+        # walking skips rows of other users; sorting costs the candidates' count (times log)
+        if len(ids) * len(ids) < self._limit * len(index):
+            return None
+        hi = len(index)
+        for typ, _, val in self._filters:
+            if typ == "or" and len(val) == 2 and val[0][:2] == ("lt", field) and val[1][0] == "and":
+                inner = val[1][2]
+                if len(inner) == 2 and inner[0] == ("eq", field, val[0][2]) and inner[1][:2] == ("lt", "id"):
+                    hi = bisect.bisect_left(index, (val[0][2], inner[1][2]))
+        hits = []
+        for i in range(hi - 1, -1, -1):
+            tup = store.rows[index[i][1]]
+            if self._matches(tup):
+                hits.append(tup)
+                if len(hits) == self._limit:
+                    break
+        return hits
+
+    def _matches(self, tup, filters=None, any_of=False) -> bool:
+        get = self.store.get
+        for typ, field, val in self._filters if filters is None else filters:
+            if typ == "and":
+                ok = self._matches(tup, val)
+            elif typ == "or":
+                ok = self._matches(tup, val, any_of=True)
+            elif typ == "in":
+                ok = get(tup, field) in val
+            else:
+                cur = get(tup, field)
+                if typ == "eq":
+                    ok = cur == val
+                elif cur is None:
+                    ok = False
+                else:
+                    ok = _COMPARE[typ](cur, val)
+            if ok and any_of:
+                return True
+            if not ok and not any_of:
+                return False
+        return not any_of
+
+    def execute(self):
+        if self._insert is not None:
+            return self._write(self._insert)
+        store = self.store
+        with store.lock:
+            ids, ordered_by = self._candidates()
+            hits = self._keyset_walk(ids)
+            if hits is None:
+                hits = [tup for tup in (store.rows.get(rid) for rid in ids)
+                        if tup is not None and self._matches(tup)]
+                sort = self._order and not (len(self._order) == 1 and self._order[0] == (ordered_by, False))
+            else:
+                sort = False
+            if sort:
+                # stable multi-key sort, least significant key first
+                for field, desc in reversed(self._order):
+                    pos = store.col_pos.get(field)
+                    hits.sort(key=lambda t: _sort_key(t[pos] if pos is not None and pos < len(t) else None), reverse=desc)
+            if self._limit is not None:
+                hits = hits[: self._limit]
+            if self._delete:
+                result = [store.remove(tup[0]) for tup in hits]
+            elif self._update is not None:
+                result = []
+                for tup in hits:
+                    row = {**store.remove(tup[0]), **self._update}
+                    store.add(row)
+                    result.append(row.copy())
+            else:
+                result = [store.materialize(tup) for tup in hits]
+        cols, embeds = _parse_select(self._select or "*")
+        # handle simple relationship for workouts->exercises through the workout_id index
+        if "exercises" in embeds and store.name == "workouts":
+            self.parent._embed_exercises(result, embeds["exercises"])
+        if cols is not None:
+            keep = cols + list(embeds)
+            result = [{k: r.get(k) for k in keep} for r in result]
+        return Result(result)
 
 
 class FakeAuth:
@@ -129,17 +420,42 @@ class FakeAuth:
 class FakeSupabase:
     def __init__(self):
         self.auth = FakeAuth()
-        self._data = {"workouts": [], "exercises": [], "ai_analyses": []}
+        self._tables: Dict[str, TableStore] = {}
+        for name in ("workouts", "exercises", "ai_analyses"):
+            self._tables[name] = TableStore(name)
 
     def table(self, name):
-        if name not in self._data:
-            self._data[name] = []
-        return FakeTable(self._data[name], self)
+        if name not in self._tables:
+            self._tables[name] = TableStore(name)
+        return FakeTable(self._tables[name], self)
+
+    def _embed_exercises(self, workouts: List[Dict[str, Any]], cols: Optional[List[str]] = None):
+        store = self._tables["exercises"]
+        with store.lock:
+            for w in workouts:
+                ids = store.ids_for("workout_id", w.get("id")) or []
+                if cols is None:
+                    w["exercises"] = [store.materialize(store.rows[rid]) for rid in ids]
+                else:
+                    w["exercises"] = [{c: store.get(store.rows[rid], c) for c in cols} for rid in ids]
+
+
+from .metrics import InstrumentedClient
+from .registry import registry
+
+
+def _create_client():
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        if SUPABASE_SQLITE_PATH:
+            # persistent local mode shared by every worker process
+            from .sqlite_supabase import SQLiteSupabase
+            return InstrumentedClient(SQLiteSupabase(SUPABASE_SQLITE_PATH))
+        # fall back to fake in-memory implementation
+        return InstrumentedClient(FakeSupabase())
+    # the supabase package is a heavy import: built on first use or during warm-up
+    from supabase import create_client
+    return InstrumentedClient(create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY))
 
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
-    # fall back to fake in-memory implementation
-    supabase = FakeSupabase()  # type: ignore
-else:
-    from supabase import create_client, Client
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+registry.register("supabase", _create_client)
+supabase = registry.lazy("supabase")
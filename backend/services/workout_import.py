@@ -0,0 +1,193 @@
+import os
+import csv
+import json
+import codecs
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from ..models import schemas
+
+# uploads to /workouts/import may be much larger than the global 1 MB body cap
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+# per-row errors returned in full; the rest are only counted
+IMPORT_MAX_ERRORS = 100
+
+CSV_WORKOUT_COLUMNS = ("date", "title", "duration_minutes", "notes")
+# csv column -> ExerciseCreate field
+CSV_EXERCISE_COLUMNS = {
+    "exercise": "name",
+    "name": "name",
+    "sets": "sets",
+    "reps": "reps",
+    "weight_kg": "weight_kg",
+    "muscle_group": "muscle_group",
+}
+
+
+class ImportTooLarge(Exception):
+    pass
+
+
+class ImportErrors:
+    def __init__(self, limit: int = IMPORT_MAX_ERRORS):
+        self.limit = limit
+        self.items: List[dict] = []
+        self.count = 0
+
+    def add(self, line: int, error: str):
+        self.count += 1
+        if len(self.items) < self.limit:
+            self.items.append({"line": line, "error": error})
+
+
+def _describe(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+
+
+async def iter_line_batches(chunks: AsyncIterator[bytes], max_bytes: int = IMPORT_MAX_BYTES) -> AsyncIterator[List[Tuple[int, str]]]:
+    """Decode an upload chunk by chunk into numbered lines, never holding more than one partial line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    size = 0
+    lineno = 0
+    pending = ""
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise ImportTooLarge()
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        if lines:
+            yield [(lineno + i, line.rstrip("\r")) for i, line in enumerate(lines, 1)]
+            lineno += len(lines)
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield [(lineno + 1, pending.rstrip("\r"))]
+
+
+class JsonlParser:
+    """One WorkoutCreate object (with nested exercises) per line."""
+
+    def __init__(self, errors: ImportErrors):
+        self.errors = errors
+
+    def feed(self, lines: List[Tuple[int, str]]) -> List[Tuple[int, schemas.WorkoutCreate]]:
+        out = []
+        for lineno, line in lines:
+            if not line.strip():
+                continue
+            try:
+                out.append((lineno, schemas.WorkoutCreate(**json.loads(line))))
+            except ValidationError as e:
+                self.errors.add(lineno, _describe(e))
+            except (ValueError, TypeError):
+                self.errors.add(lineno, "not a JSON object")
+        return out
+
+    def close(self) -> List[Tuple[int, schemas.WorkoutCreate]]:
+        return []
+
+
+class CsvParser:
+    """One exercise per row; consecutive rows with the same date and title form one workout.
+
+    Columns: date, title, duration_minutes, notes, exercise (or name), sets,
+    reps, weight_kg, muscle_group. A row without an exercise name records a
+    workout with no exercises. Invalid exercise rows are reported and skipped.
+    """
+
+    def __init__(self, errors: ImportErrors):
+        self.errors = errors
+        self.header: Optional[List[str]] = None
+        self.pending: Optional[dict] = None
+        # a quoted field spanning lines: (first line number, text so far)
+        self.partial: Optional[Tuple[int, str]] = None
+
+    def _records(self, lines: List[Tuple[int, str]]):
+        for lineno, line in lines:
+            if self.partial is not None:
+                start, text = self.partial
+                line = text + "\n" + line
+                self.partial = None
+            else:
+                start = lineno
+            if '"' not in line:
+                yield start, line.split(",")
+            elif line.count('"') % 2:
+                # odd quote count: the record continues on the next line
+                self.partial = (start, line)
+            else:
+                yield start, next(csv.reader([line]), [])
+
+    def _finish(self, out: list):
+        pending, self.pending = self.pending, None
+        if pending is None:
+            return
+        try:
+            out.append((pending["line"], schemas.WorkoutCreate(**pending["fields"], exercises=pending["exercises"])))
+        except ValidationError as e:
+            self.errors.add(pending["line"], _describe(e))
+
+    def _set_header(self, lineno: int, row: List[str]):
+        self.header = [h.strip().lower() for h in row]
+        if "title" not in self.header:
+            self.errors.add(lineno, "header must include a title column")
+        # (field, column position) pairs, resolved once
+        self.workout_pos = [(c, self.header.index(c)) for c in CSV_WORKOUT_COLUMNS if c in self.header]
+        self.exercise_pos = [(CSV_EXERCISE_COLUMNS[h], i) for i, h in enumerate(self.header) if h in CSV_EXERCISE_COLUMNS]
+
+    def _row(self, lineno: int, row: List[str], out: list):
+        if not "".join(row).strip():
+            return
+        if self.header is None:
+            self._set_header(lineno, row)
+            return
+        if "title" not in self.header:
+            return
+        width = len(row)
+        fields = {c: (row[i].strip() or None) if i < width else None for c, i in self.workout_pos}
+        key = (fields.get("date"), fields["title"])
+        if self.pending is None or self.pending["key"] != key:
+            self._finish(out)
+            self.pending = {"key": key, "line": lineno, "fields": fields, "exercises": []}
+        exercise = {}
+        for field, i in self.exercise_pos:
+            value = row[i].strip() if i < width else ""
+            if value:
+                exercise[field] = value
+        if not exercise:
+            return
+        try:
+            self.pending["exercises"].append(schemas.ExerciseCreate(**exercise))
+        except ValidationError as e:
+            self.errors.add(lineno, _describe(e))
+
+    def feed(self, lines: List[Tuple[int, str]]) -> List[Tuple[int, schemas.WorkoutCreate]]:
+        out: list = []
+        for lineno, row in self._records(lines):
+            self._row(lineno, row, out)
+        return out
+
+    def close(self) -> List[Tuple[int, schemas.WorkoutCreate]]:
+        out: list = []
+        if self.partial is not None:
+            start, text = self.partial
+            self.partial = None
+            self._row(start, next(csv.reader([text]), []), out)
+        self._finish(out)
+        return out
+
+
+PARSERS = {"csv": CsvParser, "jsonl": JsonlParser}
+
+
+async def parse_upload(
+    chunks: AsyncIterator[bytes], fmt: str, errors: ImportErrors, max_bytes: int = IMPORT_MAX_BYTES
+) -> AsyncIterator[List[Tuple[int, schemas.WorkoutCreate]]]:
+    """Validated (line, workout) pairs, one list per received chunk.
+
+    Parsing runs on the threadpool so a large upload does not stall the event loop.
+    """
+    parser = PARSERS[fmt](errors)
+    async for lines in iter_line_batches(chunks, max_bytes):
+        yield await run_in_threadpool(parser.feed, lines)
+    yield parser.close()
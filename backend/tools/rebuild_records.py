@@ -0,0 +1,62 @@
+"""Rebuild the personal-records index from the workouts and exercises tables.
+
+Use after a failed index update (logged as "Records index update failed"),
+after writing workouts outside the API, or once when first deploying the
+index. Uses the same SUPABASE_* / SUPABASE_SQLITE_PATH settings as the server.
+
+Run from the repository root:  python -m backend.tools.rebuild_records [--user ID ...]
+Without --user, every user who has workouts is rebuilt.
+"""
+import sys
+import time
+import argparse
+from typing import Iterator
+
+from ..services import records
+from ..services.supabase_client import supabase
+
+
+def user_ids() -> Iterator[str]:
+    """Every user id in workouts, in order: a keyset walk over user_id, one indexed lookup per user.
+
+    Never reads the whole table, and is not cut short by a server-side row cap.
+    """
+    after = None
+    while True:
+        q = supabase.table("workouts").select("user_id")
+        if after is not None:
+            q = q.gt("user_id", after)
+        res = q.order("user_id").limit(1).execute()
+        if res.error:
+            raise records.RecordsError(f"list users: {res.error}")
+        if not res.data:
+            return
+        after = res.data[0]["user_id"]
+        yield after
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user", action="append", dest="users", help="user id to rebuild (repeatable)")
+    args = parser.parse_args(argv)
+
+    users = iter(args.users or user_ids())
+    while True:
+        try:
+            user_id = next(users, None)
+        except records.RecordsError as e:
+            print(f"failed to list users: {e}", file=sys.stderr)
+            return 1
+        if user_id is None:
+            return 0
+        t0 = time.perf_counter()
+        try:
+            count = records.rebuild(user_id)
+        except records.RecordsError as e:
+            print(f"{user_id}: failed: {e}", file=sys.stderr)
+            return 1
+        print(f"{user_id}: {count} exercises in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
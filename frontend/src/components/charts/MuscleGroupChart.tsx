@@ -1,9 +1,9 @@
 import React from "react";
-import { Workout } from "../../types";
+import { MuscleGroupVolume } from "../../types";
 import { ResponsiveContainer, PieChart, Pie, Cell, Tooltip, Legend } from "recharts";
 
 interface Props {
-  data: Workout[];
+  data: MuscleGroupVolume[];
 }
 
 const COLORS = ["#22c55e", "#6366f1", "#f59e0b", "#f43f5e", "#06b6d4"];
@@ -12,13 +12,7 @@ const MuscleGroupChart: React.FC<Props> = ({ data }) => {
   if (!data || data.length === 0) {
     return <p className="text-neutral-light">No muscle group data</p>;
   }
-  const counts: Record<string, number> = {};
-  data.forEach((w) => {
-    (w.exercises || []).forEach((ex) => {
-      counts[ex.muscle_group || ""] = (counts[ex.muscle_group || ""] || 0) + 1;
-    });
-  });
-  const chartData = Object.entries(counts).map(([key, value]) => ({ name: key, value }));
+  const chartData = data.map((g) => ({ name: g.muscle_group, value: g.exercises }));
   return (
     <ResponsiveContainer width="100%" height={200}>
       <PieChart>
@@ -1,18 +1,18 @@
 import React from "react";
-import { Workout } from "../../types";
+import { ScorePoint } from "../../types";
 import { ResponsiveContainer, LineChart, Line, XAxis, Tooltip, ReferenceLine } from "recharts";
 
 interface Props {
-  data: Workout[];
+  data: ScorePoint[];
 }
 
 const ProgressLineChart: React.FC<Props> = ({ data }) => {
   if (!data || data.length === 0) {
     return <p className="text-neutral-light">No progress data</p>;
   }
-  const chartData = data.map((w) => ({
-    date: w.date,
-    score: w.ai_analysis?.overall_score || 0,
+  const chartData = data.map((p) => ({
+    date: p.period,
+    score: p.overall_score,
   }));
   return (
     <ResponsiveContainer width="100%" height={250}>
@@ -1,5 +1,5 @@
 import React from "react";
-import { Workout } from "../../types";
+import { VolumePoint } from "../../types";
 import {
   ResponsiveContainer,
   BarChart,
@@ -9,20 +9,16 @@ import {
 } from "recharts";
 
 interface Props {
-  data: Workout[];
+  data: VolumePoint[];
 }
 
 const WeeklyVolumeChart: React.FC<Props> = ({ data }) => {
   if (!data || data.length === 0) {
     return <p className="text-neutral-light">No volume data</p>;
   }
-  const formatted = data.map((w) => ({
-    name: new Date(w.date).toLocaleDateString("en-US", { weekday: "short" }),
-    volume:
-      w.exercises?.reduce(
-        (sum, ex) => sum + (ex.weight_kg || 0) * (ex.reps || 0) * (ex.sets || 0),
-        0
-      ) || 0,
+  const formatted = data.map((p) => ({
+    name: new Date(p.period).toLocaleDateString("en-US", { month: "short", day: "numeric" }),
+    volume: Math.round(p.volume),
   }));
   return (
     <ResponsiveContainer width="100%" height={200}>
@@ -1,6 +1,7 @@
 import axios from "axios";
 import { supabase } from "./supabaseClient";
 import { toast } from "react-hot-toast";
+import { ChangeFeed } from "../types";
 // navigation helper for redirection
 
 const api = axios.create({
@@ -35,4 +36,36 @@ api.interceptors.response.use(
   }
 );
 
+/**
+ * Follow /workouts/changes/stream from `since`, calling `onFeed` with every
+ * change feed the server pushes, until `signal` aborts. Uses fetch rather
+ * than EventSource so the Authorization header can be sent.
+ */
+export async function streamChanges(
+  since: number,
+  onFeed: (feed: ChangeFeed) => void,
+  signal: AbortSignal
+): Promise<void> {
+  const session = supabase.auth.session();
+  const res = await fetch(`${api.defaults.baseURL}/workouts/changes/stream?since=${since}`, {
+    headers: session?.access_token ? { Authorization: `Bearer ${session.access_token}` } : {},
+    signal,
+  });
+  if (!res.ok || !res.body) throw new Error(`change stream failed: ${res.status}`);
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += value;
+    let end;
+    while ((end = buffer.indexOf("\n\n")) >= 0) {
+      const event = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      const data = event.split("\n").find((line) => line.startsWith("data: "));
+      if (data) onFeed(JSON.parse(data.slice(6)));
+    }
+  }
+}
+
 export default api;
@@ -1,7 +1,7 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { useAuthStore } from "../store/useAuthStore";
 import { supabase } from "../lib/supabaseClient";
-import api from "../lib/api";
+import api, { streamChanges } from "../lib/api";
 import WorkoutList from "../components/WorkoutList";
 import AIInsightCard from "../components/AIInsightCard";
 import WorkoutForm from "../components/WorkoutForm";
@@ -10,7 +10,21 @@ import MuscleGroupChart from "../components/charts/MuscleGroupChart";
 import ProgressLineChart from "../components/charts/ProgressLineChart";
 import { useNavigate } from "react-router-dom";
 import { toast } from "react-hot-toast";
-import { Workout } from "../types";
+import { ChangeFeed, DashboardStats, Workout } from "../types";
+
+// apply a /workouts/changes feed to the loaded list, newest first
+const mergeFeed = (current: Workout[], feed: ChangeFeed): Workout[] => {
+  const gone = new Set(feed.deleted.filter((t) => t.kind === "workout").map((t) => t.id));
+  const byId = new Map(current.filter((w) => !gone.has(w.id)).map((w) => [w.id, w]));
+  for (const w of feed.workouts) byId.set(w.id, { ...byId.get(w.id), ...w });
+  for (const a of feed.analyses) {
+    const w = byId.get(a.workout_id);
+    if (w) byId.set(w.id, { ...w, ai_analysis: a });
+  }
+  return Array.from(byId.values()).sort((a, b) =>
+    a.date === b.date ? b.id.localeCompare(a.id) : b.date.localeCompare(a.date)
+  );
+};
 
 const DashboardPage: React.FC = () => {
   const { user, signOut, isGuest } = useAuthStore();
@@ -18,12 +32,20 @@ const DashboardPage: React.FC = () => {
   const [workouts, setWorkouts] = useState<Workout[]>([]);
   const [workoutsLoading, setWorkoutsLoading] = useState(false);
   const [workoutsError, setWorkoutsError] = useState<string | null>(null);
+  // X-Next-Cursor of the last loaded page; null once every page is loaded
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // change feed version the loaded workouts are current to
+  const versionRef = useRef<number | null>(null);
+  const [synced, setSynced] = useState(false);
 
   const [aiSummary, setAiSummary] = useState<string>("");
   const [summaryLoading, setSummaryLoading] = useState(false);
   const [summaryError, setSummaryError] = useState<string | null>(null);
 
   const [stats, setStats] = useState<Record<string, number>>({});
+  const [chartStats, setChartStats] = useState<DashboardStats | null>(null);
+  const [workoutsThisMonth, setWorkoutsThisMonth] = useState<number | null>(null);
   const [showForm, setShowForm] = useState(false);
   const [aiModalData, setAiModalData] = useState<Workout | null>(null);
 
@@ -37,8 +59,13 @@ const DashboardPage: React.FC = () => {
     setWorkoutsLoading(true);
     setWorkoutsError(null);
     try {
-      const res = await api.get("/workouts");
+      // take the version first: changes made meanwhile are replayed, never lost
+      const changes = await api.get<ChangeFeed>("/workouts/changes");
+      const res = await api.get<Workout[]>("/workouts");
       setWorkouts(res.data);
+      setNextCursor((res.headers["x-next-cursor"] as string | undefined) ?? null);
+      versionRef.current = changes.data.version;
+      setSynced(true);
     } catch (e: unknown) {
       console.error(e);
       const err = e as any;
@@ -49,6 +76,50 @@ const DashboardPage: React.FC = () => {
     }
   }, [workoutsError]);
 
+  const loadMoreWorkouts = React.useCallback(async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await api.get<Workout[]>("/workouts", { params: { cursor: nextCursor } });
+      // the change feed may already have added some of these
+      setWorkouts((current) => {
+        const loaded = new Set(current.map((w) => w.id));
+        return [...current, ...res.data.filter((w) => !loaded.has(w.id))];
+      });
+      setNextCursor((res.headers["x-next-cursor"] as string | undefined) ?? null);
+    } catch (e: unknown) {
+      console.error(e);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [nextCursor]);
+
+  const applyFeed = React.useCallback(
+    (feed: ChangeFeed) => {
+      if (feed.reset) {
+        fetchWorkouts();
+        return;
+      }
+      setWorkouts((current) => mergeFeed(current, feed));
+      versionRef.current = Math.max(versionRef.current ?? 0, feed.version);
+    },
+    [fetchWorkouts]
+  );
+
+  // fetch only what changed since the loaded version
+  const syncWorkouts = React.useCallback(async () => {
+    if (versionRef.current === null) return fetchWorkouts();
+    try {
+      for (;;) {
+        const res = await api.get<ChangeFeed>("/workouts/changes", { params: { since: versionRef.current } });
+        applyFeed(res.data);
+        if (!res.data.has_more || res.data.reset) break;
+      }
+    } catch (e: unknown) {
+      console.error(e);
+    }
+  }, [fetchWorkouts, applyFeed]);
+
   const fetchWeeklySummary = React.useCallback(async () => {
     setSummaryLoading(true);
     setSummaryError(null);
@@ -65,10 +136,36 @@ const DashboardPage: React.FC = () => {
     }
   }, [summaryError]);
 
+  const fetchStats = React.useCallback(async () => {
+    const now = new Date();
+    const monthStart = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, "0")}-01`;
+    try {
+      const [weekly, month] = await Promise.all([
+        api.get<DashboardStats>("/stats", { params: { bucket: "week" } }),
+        api.get<DashboardStats>("/stats", { params: { bucket: "month", start: monthStart } }),
+      ]);
+      setChartStats(weekly.data);
+      setWorkoutsThisMonth(month.data.volume.reduce((n, p) => n + p.workouts, 0));
+    } catch (e: unknown) {
+      console.error(e);
+    }
+  }, []);
+
   useEffect(() => {
     fetchWorkouts();
+    fetchStats();
     fetchWeeklySummary();
-  }, [fetchWorkouts, fetchWeeklySummary]);
+  }, [fetchWorkouts, fetchStats, fetchWeeklySummary]);
+
+  // live updates from writes made in other tabs and devices
+  useEffect(() => {
+    if (!synced || versionRef.current === null) return;
+    const controller = new AbortController();
+    streamChanges(versionRef.current, applyFeed, controller.signal).catch((e) => {
+      if (!controller.signal.aborted) console.error(e);
+    });
+    return () => controller.abort();
+  }, [synced, applyFeed]);
   const greeting = () => {
     const hour = new Date().getHours();
     if (hour < 12) return "morning";
@@ -80,16 +177,6 @@ const DashboardPage: React.FC = () => {
     setShowForm(true);
   };
 
-  const statsDerived = () => {
-    // derive sample stats from workouts
-    return {
-      totalThisMonth: workouts.length,
-      totalVolumeThisWeek: 0,
-      streak: 0,
-      avgDuration: 0,
-    };
-  };
-
   return (
     <div className="flex h-screen bg-neutral-darkest text-neutral-lightest">
       {/* sidebar */}
@@ -165,7 +252,7 @@ const DashboardPage: React.FC = () => {
         <div className="grid grid-cols-1 md:grid-cols-4 gap-4 mb-6">
           <div className="bg-neutral-dark border border-neutral-medium p-4">
             <h3 className="text-semantic-success text-3xl font-heading">
-              {statsDerived().totalThisMonth}
+              {workoutsThisMonth ?? "–"}
             </h3>
             <p>Total workouts this month</p>
           </div>
@@ -185,14 +272,14 @@ const DashboardPage: React.FC = () => {
         {/* charts section */}
         <div className="grid grid-cols-1 lg:grid-cols-2 gap-4 mb-6">
           <div className="bg-neutral-dark border border-neutral-medium p-4">
-            <WeeklyVolumeChart data={workouts} />
+            <WeeklyVolumeChart data={chartStats?.volume || []} />
           </div>
           <div className="bg-neutral-dark border border-neutral-medium p-4">
-            <MuscleGroupChart data={workouts} />
+            <MuscleGroupChart data={chartStats?.muscle_groups || []} />
           </div>
         </div>
         <div className="bg-neutral-dark border border-neutral-medium p-4 mb-6">
-          <ProgressLineChart data={workouts} />
+          <ProgressLineChart data={chartStats?.score_trend || []} />
         </div>
         <div className="bg-neutral-dark border-l-4 border-secondary-bright p-4 mb-6">
           <div className="flex items-center space-x-2">
@@ -210,11 +297,20 @@ const DashboardPage: React.FC = () => {
           </button>
         </div>
         <WorkoutList
-          workouts={workouts.slice(0, 5)}
+          workouts={workouts}
           onAnalyze={(item) => setAiModalData(item)}
         />
+        {nextCursor && (
+          <button
+            onClick={loadMoreWorkouts}
+            disabled={loadingMore}
+            className="mt-4 border border-neutral-medium px-3 py-1 rounded"
+          >
+            {loadingMore ? "Loading…" : "Load more"}
+          </button>
+        )}
       </div>
-      {showForm && <WorkoutForm onClose={() => { setShowForm(false); fetchWorkouts(); }} />}
+      {showForm && <WorkoutForm onClose={() => { setShowForm(false); syncWorkouts(); fetchStats(); }} />}
       {aiModalData && (
         <AIInsightCard
           workout={aiModalData}
@@ -32,6 +32,32 @@ export interface AIAnalysis {
   created_at: string;
 }
 
+export interface VolumePoint {
+  period: string; // ISO date, start of the bucket
+  volume: number;
+  workouts: number;
+}
+
+export interface MuscleGroupVolume {
+  muscle_group: string;
+  volume: number;
+  exercises: number;
+}
+
+export interface ScorePoint {
+  period: string;
+  overall_score: number;
+}
+
+export interface DashboardStats {
+  start?: string;
+  end?: string;
+  bucket: "day" | "week" | "month";
+  volume: VolumePoint[];
+  muscle_groups: MuscleGroupVolume[];
+  score_trend: ScorePoint[];
+}
+
 export interface SessionResponse {
   access_token: string;
   expires_in: number;
@@ -39,3 +65,17 @@ export interface SessionResponse {
   token_type: string;
   user: { id: string; email?: string };
 }
+
+export interface Tombstone {
+  kind: "workout" | "analysis";
+  id: string;
+}
+
+export interface ChangeFeed {
+  version: number;
+  reset: boolean;
+  has_more: boolean;
+  workouts: Workout[];
+  analyses: AIAnalysis[];
+  deleted: Tombstone[];
+}